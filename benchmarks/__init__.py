@@ -0,0 +1 @@
+"""Benchmarks for the mataconnect data agent."""
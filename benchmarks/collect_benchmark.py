@@ -0,0 +1,176 @@
+"""Collection throughput benchmark: single, sharded and repeated (cached) queries.
+
+google_scraper_agent gets a scripted stand-in model that answers after a
+simulated latency per call, and Google Search is replaced by a local
+stand-in that returns a deterministic, overlapping sample of synthetic
+communities per query. The scenarios run collector.collect_communities in
+turn on one fresh database and report the unique communities found per
+minute:
+
+    python -m benchmarks.collect_benchmark --latency 0.5
+    python -m benchmarks.collect_benchmark --shard-by sector --concurrency 4 --json collect.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .synthetic import synthetic_basic_community
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.llm_calls = 0
+
+    def add_llm_call(self) -> None:
+        with self.lock:
+            self.llm_calls += 1
+
+
+STATS = _Stats()
+
+
+def make_search_web(pool: int):
+    """Stand-in for Google Search: the same query always finds the same communities of the pool."""
+
+    def search_web(query: str, results: int = 10) -> Dict[str, Any]:
+        """Search the web and return matching community pages."""
+        rng = random.Random(hashlib.sha256(query.encode("utf-8")).hexdigest())
+        hits = []
+        for seed in rng.sample(range(pool), results):
+            community = synthetic_basic_community(seed)
+            hits.append({"title": community["name"], "url": community["url"], "snippet": query})
+        return {"results": hits}
+
+    return search_web
+
+
+def _scripted_scraper_model(latency: float, results: int):
+    from google.adk.models.base_llm import BaseLlm
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    def turn(request) -> List[types.Part]:
+        last = request.contents[-1]
+        for part in last.parts or []:
+            if part.function_response and part.function_response.name == "search_web":
+                hits = (part.function_response.response or {}).get("results", [])
+                communities = [{"name": hit["title"], "url": hit["url"]} for hit in hits]
+                return [types.Part(text=json.dumps({"communities": communities}))]
+        query = next(part.text for part in last.parts if part.text)
+        return [
+            types.Part(
+                function_call=types.FunctionCall(name="search_web", args={"query": query, "results": results})
+            )
+        ]
+
+    class ScriptedScraperLlm(BaseLlm):
+        model: str = "scripted-scraper"
+
+        async def generate_content_async(self, llm_request, stream: bool = False):
+            STATS.add_llm_call()
+            await asyncio.sleep(latency)
+            yield LlmResponse(
+                content=types.Content(role="model", parts=turn(llm_request)),
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=0, total_token_count=0
+                ),
+            )
+
+    return ScriptedScraperLlm()
+
+
+async def _scenario(name: str, scraper, query: str, **kwargs) -> Dict[str, Any]:
+    from mataconnect_data_agent.collector import collect_communities
+
+    calls_before = STATS.llm_calls
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = await collect_communities(query, agent=scraper, **kwargs)
+    wall = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "queries": stats["queries"],
+        "cache_hits": stats["cache_hits"],
+        "llm_calls": STATS.llm_calls - calls_before,
+        "found": stats["found"],
+        "unique": stats["unique"],
+        "inserted": stats.get("inserted", 0),
+        "wall_seconds": round(wall, 3),
+        "unique_per_minute": round(stats["unique"] * 60 / wall, 1),
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    from mataconnect_data_agent.shared_libraries.database import init_db
+    from mataconnect_data_agent.sub_agents.google_scraper import google_scraper_agent
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    scraper = google_scraper_agent.clone(
+        update={
+            "model": _scripted_scraper_model(args.latency, args.results),
+            "tools": [make_search_web(args.pool)],
+        }
+    )
+    query = "all women communities in united kingdom"
+    results = [
+        await _scenario("single", scraper, query, use_cache=False, concurrency=args.concurrency),
+        await _scenario(
+            "sharded", scraper, query, shard_by=args.shard_by, use_cache=True, concurrency=args.concurrency
+        ),
+        await _scenario(
+            "sharded_repeat", scraper, query, shard_by=args.shard_by, use_cache=True, concurrency=args.concurrency
+        ),
+    ]
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shard-by", default="city", help="Shard dimension for the sharded scenarios")
+    parser.add_argument("--concurrency", type=int, default=8, help="Searches running at once")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per scripted model call")
+    parser.add_argument("--results", type=int, default=10, help="Search results per query")
+    parser.add_argument("--pool", type=int, default=400, help="Distinct communities the search can find")
+    parser.add_argument("--db", default=".benchmarks/collect.db", help="Database file, recreated on every run")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(args.db + suffix).unlink(missing_ok=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+    results = {
+        "meta": {
+            "benchmark": "collect",
+            "shard_by": args.shard_by,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": asyncio.run(run(args)),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,337 @@
+"""Benchmark the database tools and search paths on synthetic data.
+
+Builds (or reuses) a SQLite database with `--rows` basic and enriched
+communities, then times each tool call and reports mean, median and p95
+latency in milliseconds:
+
+    python -m benchmarks.db_benchmark --rows 10000
+    python -m benchmarks.db_benchmark --rows 100000 --json results.json
+    python -m benchmarks.db_benchmark --rows 100000 --baseline results.json
+
+With `--baseline`, medians slower than the baseline by more than
+`--tolerance` are reported and the command exits with status 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from .synthetic import synthetic_basic_community, synthetic_enriched_community
+
+FILL_CHUNK_SIZE = 5000
+PENDING_SHARE = 0.1  # Share of basic communities left waiting for enrichment
+DEFAULT_EMBEDDED = 20000  # Communities with an embedding for similarity search
+
+SEARCH_QUERIES = ["mentorship", "women in tech london", "career*", "leadership network", "hackathon"]
+BROWSE_FILTERS = [
+    {},
+    {"city": "London"},
+    {"tags": ["tech"], "pricing_model": "free"},
+    {"is_virtual": True, "event_types": ["workshop"]},
+]
+
+
+def _configure(args) -> None:
+    """Point the agent's database and vector index at the benchmark files."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ["VECTOR_INDEX_DIR"] = f"{args.db}.vectors"
+    os.environ["EMBEDDER"] = "hashing"
+    os.environ.setdefault("VECTOR_INDEX_SYNC_SECONDS", "3600")
+
+
+def build_database(rows: int, embedded: int) -> Dict[str, Any]:
+    """Fill an empty database with `rows` synthetic basic and enriched communities."""
+    from sqlalchemy import insert, text
+
+    from mataconnect_data_agent.shared_libraries.changes import backfill_changes
+    from mataconnect_data_agent.shared_libraries.database import (
+        BasicCommunityDB,
+        CommunityDB,
+        ENRICHMENT_DONE,
+        ENRICHMENT_PENDING,
+        EnrichmentTaskDB,
+        init_db,
+        write_engine,
+    )
+    from mataconnect_data_agent.shared_libraries.database_tool import _prepare_enriched_data
+    from mataconnect_data_agent.shared_libraries.embeddings import (
+        HashingEmbedder,
+        community_embedding_text,
+        embedding_hash,
+    )
+    from mataconnect_data_agent.shared_libraries.facets import replace_community_facets
+    from mataconnect_data_agent.shared_libraries.fulltext import rebuild_fulltext_index
+    from mataconnect_data_agent.shared_libraries.urls import canonicalize_url, registered_domain
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    embedder = HashingEmbedder()
+    enriched_rows = int(rows * (1 - PENDING_SHARE))
+    base_time = datetime(2025, 1, 1)
+
+    with write_engine.begin() as connection:
+        # Index the text in one pass at the end instead of row by row
+        for trigger in ("insert", "update", "delete"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS communities_fts_{trigger}"))
+
+        for start in range(0, rows, FILL_CHUNK_SIZE):
+            seeds = range(start, min(start + FILL_CHUNK_SIZE, rows))
+            basic, tasks, communities = [], [], []
+            for seed in seeds:
+                community = synthetic_basic_community(seed)
+                created_at = base_time + timedelta(seconds=seed)
+                basic.append({"id": seed + 1, **community, "source": "synthetic", "created_at": created_at})
+                enriched = seed < enriched_rows
+                tasks.append(
+                    {
+                        "basic_community_id": seed + 1,
+                        "status": ENRICHMENT_DONE if enriched else ENRICHMENT_PENDING,
+                        "attempts": 1 if enriched else 0,
+                        "community_id": seed + 1 if enriched else None,
+                        "updated_at": created_at,
+                    }
+                )
+                if enriched:
+                    data, _ = _prepare_enriched_data(synthetic_enriched_community(seed))
+                    data.update(id=seed + 1, created_at=created_at, updated_at=created_at, is_active=True)
+                    communities.append(data)
+
+            for row in basic:
+                row["canonical_url"] = canonicalize_url(row["url"])
+                row["registered_domain"] = registered_domain(row["url"])
+            connection.execute(insert(BasicCommunityDB.__table__), basic)
+            connection.execute(insert(EnrichmentTaskDB.__table__), tasks)
+            if communities:
+                with_embedding = [row for row in communities if row["id"] <= embedded]
+                if with_embedding:
+                    texts = [
+                        community_embedding_text(SimpleNamespace(**row)) for row in with_embedding
+                    ]
+                    for row, text_, vector in zip(with_embedding, texts, embedder.embed(texts)):
+                        row.update(
+                            embedding=[round(float(x), 6) for x in vector],
+                            embedding_hash=embedding_hash(text_, embedder.model),
+                            embedded_at=row["updated_at"],
+                        )
+                # Rows in one multi-row INSERT must share the same columns
+                for group in (with_embedding, [row for row in communities if row["id"] > embedded]):
+                    if group:
+                        connection.execute(insert(CommunityDB.__table__), group)
+                replace_community_facets(connection, {row["id"]: row for row in communities})
+            print(f"  filled {seeds.stop}/{rows} communities", file=sys.stderr)
+
+        backfill_changes(connection)
+
+    rebuild_fulltext_index()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Recreates the full-text triggers dropped above
+        init_db()
+    return {"rows": rows, "enriched": enriched_rows, "embedded": min(embedded, enriched_rows),
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+def _time(fn: Callable[[int], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "n": repeat,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    """Time every tool and search path against the benchmark database."""
+    from mataconnect_data_agent.shared_libraries import search_tool
+    from mataconnect_data_agent.shared_libraries.changes import get_community_changes
+    from mataconnect_data_agent.shared_libraries.database_tool import (
+        get_communities_to_enrich,
+        mark_enrichment_failed,
+        save_community_info_to_db,
+        save_enriched_communities_to_db,
+        save_enriched_community_to_db,
+    )
+
+    run_id = int(time.time())
+    # New communities get seeds beyond the generated ones, unique per run
+    next_seed = args.rows + (run_id % 100000) * 1000
+    repeat = args.repeat
+    claimed: List[int] = []
+
+    def new_seed(i: int, offset: int) -> int:
+        return next_seed + offset * 100 + i + 50
+
+    def save_info(i):
+        seeds = [new_seed(i, 0) * 10 + k for k in range(10)]
+        communities = [synthetic_basic_community(seed) for seed in seeds]
+        # Two already stored communities exercise deduplication
+        communities += [synthetic_basic_community(k) for k in range(2)]
+        save_community_info_to_db({"communities": communities}, source="benchmark")
+
+    def get_to_enrich(i):
+        page = get_communities_to_enrich(limit=25)
+        claimed.extend(community["handle"] for community in page["communities"])
+
+    def save_enriched(i):
+        save_enriched_community_to_db(synthetic_enriched_community(new_seed(i, 1)))
+
+    def update_enriched(i):
+        save_enriched_community_to_db(synthetic_enriched_community(i % 1000))
+
+    def save_enriched_batch(i):
+        save_enriched_communities_to_db(
+            [synthetic_enriched_community(new_seed(i, 2) * 100 + k) for k in range(100)]
+        )
+
+    def mark_failed(i):
+        if claimed:
+            mark_enrichment_failed(claimed.pop(), "benchmark")
+
+    results: Dict[str, Any] = {}
+    operations = [
+        ("save_community_info_to_db[10+2dup]", save_info),
+        ("get_communities_to_enrich[25]", get_to_enrich),
+        ("save_enriched_community_to_db[insert]", save_enriched),
+        ("save_enriched_community_to_db[update]", update_enriched),
+        ("save_enriched_communities_to_db[100]", save_enriched_batch),
+        ("mark_enrichment_failed", mark_failed),
+        (
+            "search_communities",
+            lambda i: search_tool.search_communities(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]),
+        ),
+        (
+            "search_communities[filtered]",
+            lambda i: search_tool.search_communities(
+                SEARCH_QUERIES[i % len(SEARCH_QUERIES)], filters={"city": "London"}
+            ),
+        ),
+        (
+            "browse_communities",
+            lambda i: search_tool.browse_communities(BROWSE_FILTERS[i % len(BROWSE_FILTERS)]),
+        ),
+        (
+            "search_similar_communities[query]",
+            lambda i: search_tool.search_similar_communities(
+                query=SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+            ),
+        ),
+        (
+            "search_similar_communities[community_id]",
+            lambda i: search_tool.search_similar_communities(community_id=(i % 100) + 1),
+        ),
+        ("get_community_changes[500]", lambda i: get_community_changes(after_seq=i * 500)),
+    ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The first similarity search loads the vector index from the embeddings
+        started = time.perf_counter()
+        search_tool.search_similar_communities(community_id=1)
+        results["vector_index_load"] = {"seconds": round(time.perf_counter() - started, 3)}
+
+        for name, fn in operations:
+            if args.only and not any(part in name for part in args.only):
+                continue
+            results[name] = _time(fn, repeat)
+            print(f"{name:<45} p50 {results[name]['p50_ms']:>9.2f} ms", file=sys.stderr)
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Operations whose median got slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, timing in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "p50_ms" not in timing or "p50_ms" not in previous:
+            continue
+        if timing["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {previous['p50_ms']:.2f} -> {timing['p50_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic communities, e.g. 10000, 100000 or 1000000")
+    parser.add_argument("--data-dir", default=".benchmarks", help="Where benchmark databases are kept")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate the database even if it exists")
+    parser.add_argument("--embedded", type=int, default=DEFAULT_EMBEDDED, help="Communities given an embedding")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per operation")
+    parser.add_argument("--only", nargs="*", help="Only run operations whose name contains one of these")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown over the baseline")
+    args = parser.parse_args(argv)
+
+    Path(args.data_dir).mkdir(parents=True, exist_ok=True)
+    args.db = str(Path(args.data_dir) / f"communities-{args.rows}.db")
+    _configure(args)
+
+    build = None
+    if args.rebuild or not Path(args.db).exists():
+        for suffix in ("", "-wal", "-shm"):
+            Path(args.db + suffix).unlink(missing_ok=True)
+        shutil.rmtree(f"{args.db}.vectors", ignore_errors=True)
+        print(f"Building {args.db}", file=sys.stderr)
+        build = build_database(args.rows, args.embedded)
+
+    results = {
+        "meta": {
+            "benchmark": "db",
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "revision": _git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "build": build,
+        "results": run(args),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,336 @@
+"""End-to-end benchmark of root_agent with a scripted model and local tools.
+
+Every agent in the tree gets a scripted stand-in model that makes the same
+tool calls a real model would (search, save, claim, enrich, save), and
+Google Search and website fetching are replaced by local stand-ins serving
+synthetic communities. What remains is the agent framework, the tools and
+the database, measured as turns, wall time and database time per community:
+
+    python -m benchmarks.e2e_benchmark --communities 50 --batch 10
+    python -m benchmarks.e2e_benchmark --communities 200 --sessions 4 --json e2e.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .synthetic import (
+    synthetic_basic_community,
+    synthetic_community_page,
+    synthetic_enriched_community,
+)
+
+SEED_PATTERN = re.compile(r"-(\d+)\.org")
+
+
+class _Stats:
+    """Counters shared by the scripted models and the database listeners."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.llm_calls: Counter = Counter()
+        self.prompt_tokens: Counter = Counter()
+        self.max_prompt_tokens: Counter = Counter()
+        self.db_seconds = 0.0
+        self.db_statements = 0
+
+    def add_llm_call(self, role: str, tokens: int) -> None:
+        with self.lock:
+            self.llm_calls[role] += 1
+            self.prompt_tokens[role] += tokens
+            self.max_prompt_tokens[role] = max(self.max_prompt_tokens[role], tokens)
+
+    def add_statement(self, seconds: float) -> None:
+        with self.lock:
+            self.db_seconds += seconds
+            self.db_statements += 1
+
+
+STATS = _Stats()
+_seeds = itertools.count(10_000_000)
+
+
+def search_web(query: str, results: int = 10) -> Dict[str, Any]:
+    """Stand-in for Google Search returning synthetic community pages."""
+    hits = []
+    for _ in range(results):
+        community = synthetic_basic_community(next(_seeds))
+        hits.append({"title": community["name"], "url": community["url"], "snippet": query})
+    return {"results": hits}
+
+
+def fetch_community_websites(urls: List[str]) -> Dict[str, Any]:
+    """Stand-in for the website fetcher, digesting synthetic pages without network access."""
+    from mataconnect_data_agent.shared_libraries.extraction import extract_page_digest
+    from mataconnect_data_agent.shared_libraries.web_tool import FETCH_TOOL_TOKEN_BUDGET
+
+    websites = []
+    for url in urls:
+        match = SEED_PATTERN.search(url)
+        page = synthetic_community_page(int(match.group(1)) if match else 0)
+        digest = extract_page_digest(page, url=url, token_budget=FETCH_TOOL_TOKEN_BUDGET)
+        websites.append(
+            {
+                "url": url,
+                "final_url": url,
+                "status": 200,
+                "error": None,
+                "title": digest.title,
+                "description": digest.description,
+                "language": digest.language,
+                "content": digest.text,
+                "emails": digest.emails,
+                "social_links": digest.social_links,
+                "links": digest.links,
+            }
+        )
+    return {"websites": websites}
+
+
+def _scripted_model(role: str, batch: int):
+    """Build a stand-in model that scripts the given agent's turns."""
+    from google.adk.models.base_llm import BaseLlm
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    from mataconnect_data_agent.shared_libraries.extraction import estimate_tokens
+
+    def call(name: str, **args) -> types.Part:
+        return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+    def reply(text: str) -> types.Part:
+        return types.Part(text=text)
+
+    def responses(request) -> Dict[str, List[Dict[str, Any]]]:
+        last = request.contents[-1] if request.contents else None
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        for part in (last.parts if last else None) or []:
+            if part.function_response:
+                found.setdefault(part.function_response.name, []).append(
+                    part.function_response.response or {}
+                )
+        return found
+
+    def agent_result(response: Dict[str, Any]) -> Any:
+        # AgentTool wraps the sub-agent's final text in {"result": ...}
+        result = response.get("result", response)
+        return json.loads(result) if isinstance(result, str) else result
+
+    def user_text(request) -> str:
+        for content in reversed(request.contents):
+            for part in content.parts or []:
+                if content.role == "user" and part.text:
+                    return part.text
+        return ""
+
+    def root_turn(request) -> List[types.Part]:
+        done = responses(request)
+        if "google_scraper_agent" in done:
+            return [call("save_community_info_to_db", community_data=agent_result(done["google_scraper_agent"][0]))]
+        if "save_community_info_to_db" in done:
+            return [call("get_communities_to_enrich", limit=batch)]
+        if "get_communities_to_enrich" in done:
+            communities = done["get_communities_to_enrich"][0].get("communities", [])
+            if not communities:
+                return [reply("No communities left to enrich.")]
+            return [
+                call(
+                    "community_enricher_agent",
+                    request=json.dumps({"basic_community_id": c["handle"], "name": c["name"], "url": c["url"]}),
+                )
+                for c in communities
+            ]
+        if "community_enricher_agent" in done:
+            return [
+                call("save_enriched_community_to_db", enriched_data=agent_result(response))
+                for response in done["community_enricher_agent"]
+            ]
+        if "save_enriched_community_to_db" in done:
+            return [reply(f"Saved {len(done['save_enriched_community_to_db'])} enriched communities.")]
+        return [call("google_scraper_agent", request=f"Find {batch} women's communities in the UK")]
+
+    def scraper_turn(request) -> List[types.Part]:
+        done = responses(request)
+        if "search_web" in done:
+            results = done["search_web"][0].get("results", [])
+            communities = [{"name": hit["title"], "url": hit["url"]} for hit in results]
+            return [reply(json.dumps({"communities": communities}))]
+        return [call("search_web", query=user_text(request), results=batch)]
+
+    def enricher_turn(request) -> List[types.Part]:
+        task = json.loads(user_text(request))
+        if "fetch_community_websites" in responses(request):
+            match = SEED_PATTERN.search(task["url"])
+            enriched = synthetic_enriched_community(int(match.group(1)) if match else 0)
+            enriched.update(name=task["name"], website=task["url"], basic_community_id=task["basic_community_id"])
+            return [reply(json.dumps(enriched))]
+        return [call("fetch_community_websites", urls=[task["url"]])]
+
+    def prompt_text(request) -> str:
+        texts = [str(request.config.system_instruction or "")]
+        for content in request.contents:
+            for part in content.parts or []:
+                if part.text:
+                    texts.append(part.text)
+                elif part.function_call:
+                    texts.append(json.dumps(part.function_call.args, default=str))
+                elif part.function_response:
+                    texts.append(json.dumps(part.function_response.response, default=str))
+        return "\n".join(texts)
+
+    turns = {"root": root_turn, "scraper": scraper_turn, "enricher": enricher_turn}[role]
+
+    class ScriptedLlm(BaseLlm):
+        model: str = f"scripted-{role}"
+
+        async def generate_content_async(self, llm_request, stream: bool = False):
+            prompt_tokens = estimate_tokens(prompt_text(llm_request))
+            STATS.add_llm_call(role, prompt_tokens)
+            yield LlmResponse(
+                content=types.Content(role="model", parts=turns(llm_request)),
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=prompt_tokens, total_token_count=prompt_tokens
+                ),
+            )
+
+    return ScriptedLlm()
+
+
+def build_agent(batch: int):
+    """Clone root_agent with scripted models and local search and fetch tools."""
+    from google.adk.tools.agent_tool import AgentTool
+
+    from mataconnect_data_agent.agent import root_agent
+    from mataconnect_data_agent.sub_agents.community_enricher import community_enricher_agent
+    from mataconnect_data_agent.sub_agents.google_scraper import google_scraper_agent
+
+    scraper = google_scraper_agent.clone(
+        update={"model": _scripted_model("scraper", batch), "tools": [search_web]}
+    )
+    enricher = community_enricher_agent.clone(
+        update={"model": _scripted_model("enricher", batch), "tools": [fetch_community_websites]}
+    )
+    replacements = {scraper.name: AgentTool(agent=scraper), enricher.name: AgentTool(agent=enricher)}
+    tools = [
+        replacements.get(getattr(getattr(tool, "agent", None), "name", None), tool)
+        for tool in root_agent.tools
+    ]
+    return root_agent.clone(update={"model": _scripted_model("root", batch), "tools": tools})
+
+
+def _listen_to_database() -> None:
+    from sqlalchemy import event
+
+    from mataconnect_data_agent.shared_libraries.database import engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_benchmark_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        STATS.add_statement(time.perf_counter() - conn.info["_benchmark_started"].pop())
+
+
+async def _run_session(runner, agent_name: str, rounds: int, batch: int) -> int:
+    from google.genai import types
+
+    session = await runner.session_service.create_session(app_name=agent_name, user_id="benchmark")
+    saved = 0
+    for _ in range(rounds):
+        message = types.Content(role="user", parts=[types.Part(text=f"Collect and enrich {batch} communities")])
+        async for event in runner.run_async(user_id="benchmark", session_id=session.id, new_message=message):
+            for part in (event.content.parts if event.content else None) or []:
+                if part.function_response and part.function_response.name == "save_enriched_community_to_db":
+                    saved += 1
+    return saved
+
+
+async def run(args) -> Dict[str, Any]:
+    from google.adk.runners import InMemoryRunner
+
+    from mataconnect_data_agent.shared_libraries.database import init_db
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+    _listen_to_database()
+    agent = build_agent(args.batch)
+    runner = InMemoryRunner(agent=agent, app_name=agent.name)
+
+    rounds = max(1, args.communities // (args.batch * args.sessions))
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved = await asyncio.gather(
+            *(_run_session(runner, agent.name, rounds, args.batch) for _ in range(args.sessions))
+        )
+    wall = time.perf_counter() - started
+
+    communities = sum(saved)
+    llm_calls = sum(STATS.llm_calls.values())
+    prompt_tokens = sum(STATS.prompt_tokens.values())
+    per_community = max(communities, 1)
+    return {
+        "communities": communities,
+        "sessions": args.sessions,
+        "invocations": rounds * args.sessions,
+        "llm_calls": dict(STATS.llm_calls),
+        "turns": STATS.llm_calls["root"],
+        "prompt_tokens": dict(STATS.prompt_tokens),
+        "max_prompt_tokens": dict(STATS.max_prompt_tokens),
+        "wall_seconds": round(wall, 3),
+        "db_seconds": round(STATS.db_seconds, 3),
+        "db_statements": STATS.db_statements,
+        "per_community": {
+            "wall_ms": round(wall * 1000 / per_community, 3),
+            "db_ms": round(STATS.db_seconds * 1000 / per_community, 3),
+            "db_statements": round(STATS.db_statements / per_community, 2),
+            "llm_calls": round(llm_calls / per_community, 2),
+            "prompt_tokens": round(prompt_tokens / per_community),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--communities", type=int, default=50, help="Communities to collect and enrich")
+    parser.add_argument("--batch", type=int, default=10, help="Communities per root agent invocation")
+    parser.add_argument("--sessions", type=int, default=1, help="Concurrent agent sessions")
+    parser.add_argument("--db", default=".benchmarks/e2e.db", help="Database file, recreated on every run")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(args.db + suffix).unlink(missing_ok=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+    results = {
+        "meta": {
+            "benchmark": "e2e",
+            "batch": args.batch,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": asyncio.run(run(args)),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
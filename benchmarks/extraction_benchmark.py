@@ -0,0 +1,101 @@
+"""Benchmark the HTML-to-digest extraction stage.
+
+Reports bytes in, estimated tokens in and out, and parse time per page.
+
+    python -m benchmarks.extraction_benchmark                 # synthetic pages
+    python -m benchmarks.extraction_benchmark pages/*.html    # saved pages
+    python -m benchmarks.extraction_benchmark --fetch-cache .fetch_cache --json out.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from mataconnect_data_agent.shared_libraries.extraction import (
+    EXTRACT_TOKEN_BUDGET,
+    estimate_tokens,
+    extract_page_digest,
+)
+
+from .synthetic import synthetic_community_page
+
+
+def _pages(args) -> Iterator[Tuple[str, str]]:
+    """Yield (name, html) pairs from files, the fetch cache or synthetic pages."""
+    for path in args.paths:
+        path = Path(path)
+        files = sorted(path.rglob("*.htm*")) if path.is_dir() else [path]
+        for file in files:
+            yield str(file), file.read_text(encoding="utf-8", errors="replace")
+    if args.fetch_cache:
+        for file in sorted(Path(args.fetch_cache).rglob("*.body")):
+            yield file.name, file.read_text(encoding="utf-8", errors="replace")
+    if not args.paths and not args.fetch_cache:
+        for seed in range(args.synthetic):
+            yield f"synthetic-{seed}", synthetic_community_page(seed)
+
+
+def run(args) -> dict:
+    """Extract every page and return per-page measurements and a summary."""
+    pages = []
+    for name, html in _pages(args):
+        started = time.perf_counter()
+        digest = extract_page_digest(html, token_budget=args.token_budget)
+        parse_ms = (time.perf_counter() - started) * 1000
+        pages.append(
+            {
+                "page": name,
+                "bytes_in": digest.bytes_in,
+                "tokens_in": estimate_tokens(html),
+                "tokens_out": digest.tokens_out,
+                "parse_ms": round(parse_ms, 3),
+            }
+        )
+
+    if not pages:
+        return {"pages": [], "summary": {}}
+
+    parse_times = sorted(page["parse_ms"] for page in pages)
+    tokens_in = sum(page["tokens_in"] for page in pages)
+    tokens_out = sum(page["tokens_out"] for page in pages)
+    summary = {
+        "pages": len(pages),
+        "token_budget": args.token_budget,
+        "bytes_in": sum(page["bytes_in"] for page in pages),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "reduction": round(tokens_in / tokens_out, 1) if tokens_out else None,
+        "parse_ms_median": round(statistics.median(parse_times), 3),
+        "parse_ms_p95": round(parse_times[int(0.95 * (len(parse_times) - 1))], 3),
+        "parse_ms_total": round(sum(parse_times), 3),
+    }
+    return {"pages": pages, "summary": summary}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="HTML files or directories")
+    parser.add_argument("--fetch-cache", help="Benchmark pages stored by the fetcher cache")
+    parser.add_argument("--synthetic", type=int, default=50, help="Synthetic pages to use")
+    parser.add_argument("--token-budget", type=int, default=EXTRACT_TOKEN_BUDGET)
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    for page in results["pages"]:
+        print(
+            f"{page['page']:<40} {page['bytes_in']:>9} B  "
+            f"{page['tokens_in']:>8} -> {page['tokens_out']:>5} tokens  {page['parse_ms']:>8.2f} ms"
+        )
+    print(json.dumps(results["summary"], indent=2))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,132 @@
+"""Benchmark package import time of the entry points.
+
+Each entry point is imported in a fresh interpreter `--repeat` times and
+its median wall time reported. Database-only entry points must not load
+google-adk or google-genai; if one does, the command exits with status 1,
+as it does when a median is slower than `--baseline` by more than
+`--tolerance` or above `--max-ms`:
+
+    python -m benchmarks.import_benchmark --json imports.json
+    python -m benchmarks.import_benchmark --baseline imports.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .db_benchmark import compare
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Modules a database-only entry point must not import
+AGENT_MODULES = ["google.adk", "google.genai"]
+
+# Entry point name -> (import statement, whether it may load the agent modules)
+ENTRY_POINTS = {
+    "db_cli": ("import mataconnect_data_agent.db", False),
+    "database": ("import mataconnect_data_agent.shared_libraries.database", False),
+    "database_tool": ("import mataconnect_data_agent.shared_libraries.database_tool", False),
+    "export": ("import mataconnect_data_agent.shared_libraries.export", False),
+    "importer": ("import mataconnect_data_agent.shared_libraries.importer", False),
+    "changes": ("import mataconnect_data_agent.shared_libraries.changes", False),
+    "main": ("import main", False),
+    "root_agent": ("from mataconnect_data_agent import root_agent", True),
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+loaded = [name for name in {agent_modules!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "agent_modules": loaded}}))
+"""
+
+
+def measure(statement: str) -> Dict[str, Any]:
+    """Import time of `statement` in a fresh interpreter, and the agent modules it loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.getenv("PYTHONPATH")])))
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement, agent_modules=AGENT_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, (statement, agents_allowed) in ENTRY_POINTS.items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        samples = [measure(statement) for _ in range(args.repeat)]
+        timings = [sample["seconds"] * 1000 for sample in samples]
+        results[name] = {
+            "n": len(timings),
+            "p50_ms": round(statistics.median(timings), 1),
+            "min_ms": round(min(timings), 1),
+            "max_ms": round(max(timings), 1),
+            "agent_modules": samples[-1]["agent_modules"],
+            "agents_allowed": agents_allowed,
+        }
+    return results
+
+
+def check(results: Dict[str, Dict[str, Any]], max_ms: Optional[float]) -> List[str]:
+    """Entry points that load the agent modules or exceed the `max_ms` budget."""
+    problems = []
+    for name, result in results.items():
+        if result["agent_modules"] and not result["agents_allowed"]:
+            problems.append(f"{name}: imports {', '.join(result['agent_modules'])}")
+        if max_ms is not None and not result["agents_allowed"] and result["p50_ms"] > max_ms:
+            problems.append(f"{name}: p50 {result['p50_ms']:.1f} ms is over {max_ms:.1f} ms")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--only", nargs="*", help="Only run entry points whose name contains one of these")
+    parser.add_argument("--max-ms", type=float, help="Import budget of the database-only entry points")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown over the baseline")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "benchmark": "imports",
+            "repeat": args.repeat,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": run(args),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    problems = check(results["results"], args.max_ms)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems += compare(results, baseline, args.tolerance)
+    if problems:
+        print("Import time regressions:", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,160 @@
+"""Synthetic data for benchmarks."""
+
+import random
+
+SECTORS = [
+    "tech",
+    "finance",
+    "healthcare",
+    "entrepreneurship",
+    "marketing",
+    "education",
+    "law",
+    "engineering",
+]
+CITIES = ["London", "Manchester", "Birmingham", "Leeds", "Glasgow", "Bristol", "Cardiff"]
+# Content wrappers seen on real sites, some with boilerplate-like class names
+WRAPPER_CLASSES = [
+    "site-content",
+    "site-content has-sidebar",
+    "page-wrapper main-menu-open",
+    "container",
+]
+WORDS = (
+    "women community support network mentorship career growth leadership events "
+    "workshops members connect learn share skills confidence professional development "
+    "programme peer circle online meetup volunteers charity founders industry"
+).split()
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_community_page(seed: int) -> str:
+    """
+    Return a realistic community home page with the usual boilerplate.
+
+    Pages carry inline scripts and styles, a navigation menu, a cookie
+    banner, event listings, about/mission/contact sections and a footer,
+    in roughly the proportions seen on small organization websites. The
+    main content sits in a wrapper from WRAPPER_CLASSES.
+    """
+    rng = random.Random(seed)
+    sector = rng.choice(SECTORS)
+    city = rng.choice(CITIES)
+    name = f"Women in {sector.title()} {city} {seed}"
+    slug = f"women-in-{sector}-{city.lower()}-{seed}"
+
+    script = "".join(
+        f"function f{i}(a,b){{return a*{i}+b;}}var cfg{i}={{'k':'{rng.random()}'}};"
+        for i in range(rng.randint(400, 1200))
+    )
+    style = "".join(
+        f".c{i}{{margin:{i % 17}px;padding:{i % 9}px;color:#{i % 4096:03x};}}"
+        for i in range(rng.randint(200, 800))
+    )
+    menu = "".join(
+        f'<li class="menu-item"><a href="/{item}">{item.title()}</a></li>'
+        for item in ["home", "about-us", "events", "blog", "join", "donate", "contact"]
+    )
+    events = "".join(
+        f'<div class="event-card"><h3>{_sentence(rng, 4)}</h3><p>{_sentence(rng)}</p>'
+        f'<a class="btn" href="/events/{i}">Book now</a></div>'
+        for i in range(rng.randint(5, 25))
+    )
+    posts = "".join(
+        f"<article><h3>{_sentence(rng, 6)}</h3><p>{_sentence(rng, 40)}</p></article>"
+        for _ in range(rng.randint(3, 12))
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="en-GB"><head><meta charset="utf-8"><title>{name} | Home</title>
+<meta name="description" content="{name} is a {sector} community for women in {city}.">
+<style>{style}</style><script>{script}</script></head>
+<body><div id="cookie-consent" class="cookie-banner"><p>We use cookies to improve your experience.</p>
+<button>Accept all</button></div>
+<header><nav class="navbar"><ul>{menu}</ul></nav><h1>{name}</h1><p>{_sentence(rng, 8)}</p></header>
+<main><div class="{WRAPPER_CLASSES[seed % len(WRAPPER_CLASSES)]}">
+<section class="hero-banner"><h2>Welcome</h2><p>{_sentence(rng, 20)}</p></section>
+<section class="events"><h2>Upcoming events</h2>{events}</section>
+<section id="about"><h2>About us</h2><p>{_sentence(rng, 30)}</p><p>{_sentence(rng, 25)}</p></section>
+<section class="mission"><h2>Our mission</h2><p>{_sentence(rng, 20)}</p></section>
+<section class="shared-values"><h2>Our values</h2><p>{_sentence(rng, 15)}</p></section>
+<section class="sponsors-and-partners"><h2>Partners</h2><p>{_sentence(rng, 10)}</p></section>
+<section class="blog"><h2>Latest news</h2>{posts}</section>
+<aside class="sidebar"><div class="newsletter"><h3>Subscribe</h3><form><input name="email"></form></div></aside>
+</div></main>
+<footer><p>Founded in {rng.randint(1990, 2023)} in {city}. Contact us at hello@{slug}.org</p>
+<a href="https://www.linkedin.com/company/{slug}">LinkedIn</a>
+<a href="https://www.instagram.com/{slug}">Instagram</a>
+<a href="/contact-us">Contact</a></footer>
+<script>{script[: len(script) // 3]}</script></body></html>"""
+
+
+TOPICS = [
+    "career development",
+    "leadership",
+    "networking",
+    "mentorship",
+    "coding",
+    "investing",
+    "public speaking",
+    "wellbeing",
+    "fundraising",
+    "product management",
+]
+EVENT_TYPES = ["meetup", "workshop", "webinar", "conference", "mentoring circle", "hackathon", "social"]
+AUDIENCES = ["students", "professionals", "founders", "career changers", "returners"]
+PRICING = ["free", "paid", "freemium"]
+
+
+def synthetic_basic_community(seed: int) -> dict:
+    """Name and URL of a community as the scraper agent would find it."""
+    rng = random.Random(seed)
+    sector = rng.choice(SECTORS)
+    city = rng.choice(CITIES)
+    name = f"Women in {sector.title()} {city} {seed}"
+    return {"name": name, "url": f"https://www.women-in-{sector}-{city.lower()}-{seed}.org/"}
+
+
+def synthetic_enriched_community(seed: int) -> dict:
+    """
+    Return an enriched community with every EnrichedCommunity field filled.
+
+    List and dict fields vary in length like real enrichment output, so JSON
+    columns and facet tables get realistic sizes.
+    """
+    rng = random.Random(seed)
+    basic = synthetic_basic_community(seed)
+    sector = basic["name"].split()[2].lower()
+    city = basic["name"].split()[3]
+    slug = basic["url"].split("//www.")[1].rstrip("/").removesuffix(".org")
+    return {
+        "name": basic["name"],
+        "website": basic["url"],
+        "description": " ".join(_sentence(rng, rng.randint(10, 20)) for _ in range(rng.randint(2, 5))),
+        "tags": [sector] + rng.sample(TOPICS, rng.randint(1, 5)),
+        "focus_areas": ", ".join(rng.sample(TOPICS, rng.randint(2, 4))),
+        "country": "United Kingdom",
+        "city": city,
+        "language": "English",
+        "contact_email": f"hello@{slug}.org",
+        "is_virtual": rng.random() < 0.3,
+        "social_links": {
+            network: f"https://www.{network}.com/{slug}"
+            for network in rng.sample(["linkedin", "instagram", "twitter", "facebook"], rng.randint(1, 4))
+        },
+        "community_info": {
+            "members": rng.randint(20, 20000),
+            "events_per_year": rng.randint(1, 50),
+            "volunteer_led": rng.random() < 0.6,
+        },
+        "pricing_model": rng.choice(PRICING),
+        "topics_supported": rng.sample(TOPICS, rng.randint(1, 4)),
+        "audience_type": rng.choice(AUDIENCES),
+        "event_types": rng.sample(EVENT_TYPES, rng.randint(1, 3)),
+        "year_founded": rng.randint(1990, 2024),
+        "verified": rng.random() < 0.4,
+        "data_source": "synthetic",
+    }
@@ -1,3 +1,30 @@
-"""Mataconnect Data Agent - A Google ADK-based agent for community data collection."""
+"""Mataconnect Data Agent - A Google ADK-based agent for community data collection.
 
-from .agent import root_agent
+The agents are imported on first access, so database-only entry points
+(CLIs, cron jobs, workers) do not load google-adk or build the agents.
+"""
+
+import importlib
+from typing import Any
+
+# Lazily exported names and the modules defining them
+_LAZY_EXPORTS = {
+    "root_agent": ".agent",
+    "community_enricher_agent": ".sub_agents.community_enricher",
+    "community_batch_enricher_agent": ".sub_agents.community_enricher",
+    "google_scraper_agent": ".sub_agents.google_scraper",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY_EXPORTS])
@@ -3,10 +3,21 @@ from google.adk.tools.agent_tool import AgentTool
 
 from .sub_agents.google_scraper import google_scraper_agent
 from .sub_agents.community_enricher import community_enricher_agent
+from .collector import collect_and_save_communities
 from .shared_libraries.database_tool import (
     save_community_info_to_db,
     get_communities_to_enrich,
+    mark_enrichment_failed,
     save_enriched_community_to_db,
+    save_enriched_communities_to_db,
+)
+from .shared_libraries.context_compaction import compact_history
+from .shared_libraries.instrumentation import INSTRUMENTATION_ENABLED, instrument_agent
+from .shared_libraries.search_tool import (
+    browse_communities,
+    get_community_details,
+    search_communities,
+    search_similar_communities,
 )
 from . import prompt
 
@@ -18,11 +29,22 @@ communities_data_agent = LlmAgent(
     tools=[
         AgentTool(agent=google_scraper_agent),
         AgentTool(agent=community_enricher_agent),
+        collect_and_save_communities,
         save_community_info_to_db,
         get_communities_to_enrich,
         save_enriched_community_to_db,
+        save_enriched_communities_to_db,
+        mark_enrichment_failed,
+        search_communities,
+        search_similar_communities,
+        browse_communities,
+        get_community_details,
     ],
     instruction=prompt.COMMUNITIES_DATA_AGENT_INSTRUCTION,
+    before_model_callback=compact_history,
 )
 
 root_agent = communities_data_agent
+
+if INSTRUMENTATION_ENABLED:
+    instrument_agent(root_agent)
@@ -0,0 +1,270 @@
+"""Cached, sharded community collection with google_scraper_agent.
+
+One search for a broad query like "all women communities in united
+kingdom" only returns a handful of communities. With a shard dimension the
+query is expanded into sub-queries, one per city or sector, that run
+concurrently; their results are merged, deduplicated by canonical URL and
+saved with save_community_info_to_db. The communities found per query are
+cached (see search_cache.py), so repeating a query costs no model call or
+Google Search until the cache entry expires:
+
+    python -m mataconnect_data_agent.collector "all women communities in united kingdom"
+    python -m mataconnect_data_agent.collector "women communities in the UK" --shard-by city --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from google.adk.runners import InMemoryRunner
+
+from .shared_libraries.agent_calls import JSON_FENCE, run_agent
+from .shared_libraries.database_tool import save_community_info_to_db
+from .shared_libraries.enrichment_cache import prompt_hash
+from .shared_libraries.importer import validate_record
+from .shared_libraries.instrumentation import (
+    INSTRUMENTATION_ENABLED,
+    instrument_agent,
+    instrumentation_run,
+)
+from .shared_libraries.search_cache import SearchCache
+from .shared_libraries.urls import canonicalize_url
+from .sub_agents.google_scraper import google_scraper_agent
+
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "8"))
+SCRAPER_CALL_TIMEOUT_SECONDS = float(os.getenv("SCRAPER_CALL_TIMEOUT_SECONDS", "120"))
+
+APP_NAME = "mataconnect_collector"
+COLLECTOR_SOURCE = "google_scraper"
+
+# Values a broad query is expanded by, per shard dimension
+QUERY_SHARDS = {
+    "city": [
+        "London", "Manchester", "Birmingham", "Leeds", "Glasgow", "Edinburgh", "Bristol",
+        "Liverpool", "Cardiff", "Belfast", "Sheffield", "Newcastle", "Nottingham", "Leicester",
+        "Brighton", "Southampton", "Oxford", "Cambridge", "Aberdeen", "Swansea",
+    ],
+    "sector": [
+        "technology", "business and entrepreneurship", "health and wellbeing", "arts and culture",
+        "sport and fitness", "finance", "law", "science and engineering", "education",
+        "parenting", "faith", "LGBTQ+", "migrants and refugees", "careers and networking",
+        "charity and volunteering",
+    ],
+}
+
+
+class CollectionError(Exception):
+    """Raised when the scraper does not return a usable list of communities."""
+
+
+def expand_query(query: str, shard_by: Optional[str] = None) -> List[str]:
+    """The query followed by one sub-query per value of the shard dimension."""
+    if not shard_by:
+        return [query]
+    if shard_by not in QUERY_SHARDS:
+        raise ValueError(f"Unknown shard dimension {shard_by!r}, use one of {', '.join(QUERY_SHARDS)}")
+    return [query] + [f"{query} ({shard_by}: {value})" for value in QUERY_SHARDS[shard_by]]
+
+
+def scraper_prompt_hash(agent=google_scraper_agent) -> str:
+    """Hash the scraper's instruction and model, part of every search cache key."""
+    model = getattr(agent.model, "model", agent.model)
+    instruction = agent.instruction if isinstance(agent.instruction, str) else ""
+    return prompt_hash(instruction, str(model))
+
+
+def parse_collected_communities(text: str, source: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Parse the scraper's answer into valid communities.
+
+    Accepts a bare JSON object with a "communities" list, or one wrapped in
+    a markdown code fence. Returns the communities that pass the importer's
+    validation and how many were invalid.
+    """
+    fenced = JSON_FENCE.search(text or "")
+    candidate = fenced.group(1) if fenced else (text or "")
+    start, end = candidate.find("{"), candidate.rfind("}")
+    if start == -1 or end <= start:
+        raise CollectionError("Scraper response contains no JSON object")
+    try:
+        data = json.loads(candidate[start : end + 1])
+    except ValueError as e:
+        raise CollectionError(f"Scraper response is not valid JSON: {str(e)}")
+    records = data.get("communities") if isinstance(data, dict) else None
+    if not isinstance(records, list):
+        raise CollectionError("Scraper response has no communities list")
+
+    communities, invalid = [], 0
+    for record in records:
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("record is not an object")
+            record = {str(key).lower(): value for key, value in record.items()}
+            communities.append(validate_record(record, source))
+        except ValueError:
+            invalid += 1
+    return communities, invalid
+
+
+async def search_query(
+    runner: InMemoryRunner,
+    query: str,
+    source: str = COLLECTOR_SOURCE,
+    cache: Optional[SearchCache] = None,
+    request_hash: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Return the communities found for one query and whether they came from the cache.
+
+    Without a cache hit the runner's scraper is asked and its answer is
+    cached unless it found nothing, so one empty answer does not hide a
+    query until the entry expires. Raises CollectionError or
+    asyncio.TimeoutError when the search fails.
+    """
+    request_hash = request_hash or scraper_prompt_hash(runner.agent)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, query, request_hash)
+        if cached is not None:
+            return cached, True
+    text = await asyncio.wait_for(run_agent(runner, query), SCRAPER_CALL_TIMEOUT_SECONDS)
+    communities, _ = parse_collected_communities(text, source)
+    if cache is not None and communities:
+        await asyncio.to_thread(cache.put, query, request_hash, communities)
+    return communities, False
+
+
+def merge_communities(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Merge result lists, keeping the first community per canonical URL (or name without one)."""
+    merged, seen = [], set()
+    for communities in results:
+        for community in communities:
+            key = canonicalize_url(community.get("url")) or ("name", community["name"].lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(community)
+    return merged
+
+
+async def collect_communities(
+    query: str,
+    shard_by: Optional[str] = None,
+    source: str = COLLECTOR_SOURCE,
+    concurrency: int = SCRAPER_CONCURRENCY,
+    use_cache: bool = True,
+    save: bool = True,
+    agent=google_scraper_agent,
+    cache: Optional[SearchCache] = None,
+) -> Dict[str, Any]:
+    """
+    Search for `query`, sharded by `shard_by` when given, and save what is found.
+
+    Up to `concurrency` searches run at once; cached queries are answered
+    without a model call. Results are merged and deduplicated by canonical
+    URL before they are saved. Returns counts of queries, cache hits,
+    failed queries, communities found and unique, inserted and duplicate
+    communities, and the elapsed time.
+    """
+    if INSTRUMENTATION_ENABLED:
+        instrument_agent(agent, track_runs=False)
+    queries = expand_query(query, shard_by)
+    runner = InMemoryRunner(agent=agent, app_name=APP_NAME)
+    if use_cache and cache is None:
+        cache = SearchCache()
+    if not use_cache:
+        cache = None
+    request_hash = scraper_prompt_hash(agent)
+    limiter = asyncio.Semaphore(concurrency)
+    cache_hits = 0
+    failed = 0
+    started = time.perf_counter()
+
+    async def search(sub_query: str) -> List[Dict[str, Any]]:
+        nonlocal cache_hits, failed
+        async with limiter:
+            try:
+                communities, cached = await search_query(
+                    runner, sub_query, source, cache, request_hash
+                )
+            except Exception as e:
+                message = "Scraper call timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                print(f"Failed to search '{sub_query}': {message}")
+                failed += 1
+                return []
+        cache_hits += cached
+        return communities
+
+    results = await asyncio.gather(*(search(sub_query) for sub_query in queries))
+    merged = merge_communities(results)
+    stats = {
+        "queries": len(queries),
+        "cache_hits": cache_hits,
+        "failed_queries": failed,
+        "found": sum(len(communities) for communities in results),
+        "unique": len(merged),
+    }
+    if save and merged:
+        saved = await asyncio.to_thread(
+            save_community_info_to_db, {"communities": merged}, source
+        )
+        stats.update(inserted=saved["inserted"], duplicates=saved["duplicates"])
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Collected communities for '{query}': {stats}")
+    return stats
+
+
+async def collect_and_save_communities(query: str, shard_by: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Search Google for communities with google_scraper_agent and save them to the database.
+
+    Broad queries can be split into concurrent sub-queries with `shard_by`
+    "city" or "sector". Repeated queries are answered from a cache. Results
+    are deduplicated by canonical URL and saved like save_community_info_to_db.
+    Returns how many queries ran, how many were cached, and how many
+    communities were found, unique, inserted and skipped as duplicates.
+    """
+    try:
+        return await collect_communities(query, shard_by=shard_by)
+    except ValueError as e:
+        raise Exception(f"Failed to collect communities: {str(e)}")
+
+
+def run_collection(query: str, **kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around collect_communities, as one instrumentation run."""
+
+    async def collect():
+        with instrumentation_run(APP_NAME):
+            return await collect_communities(query, **kwargs)
+
+    return asyncio.run(collect())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Collect communities with cached, sharded searches.")
+    parser.add_argument("query", help="Search query, e.g. \"all women communities in united kingdom\"")
+    parser.add_argument("--shard-by", choices=sorted(QUERY_SHARDS), default=None)
+    parser.add_argument("--concurrency", type=int, default=SCRAPER_CONCURRENCY)
+    parser.add_argument("--source", default=COLLECTOR_SOURCE)
+    parser.add_argument("--no-cache", action="store_true", help="Always search, ignoring cached results")
+    parser.add_argument("--dry-run", action="store_true", help="Search without saving")
+    args = parser.parse_args(argv)
+
+    stats = run_collection(
+        args.query,
+        shard_by=args.shard_by,
+        source=args.source,
+        concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+        save=not args.dry_run,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+"""Headless database entry point.
+
+Creates or upgrades the schema and reports what the database holds without
+importing google-adk or building the agents, so deploy hooks, cron jobs and
+workers that only need the database start quickly:
+
+    python -m mataconnect_data_agent.db init
+    python -m mataconnect_data_agent.db stats
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+
+from .shared_libraries.database import (
+    BasicCommunityDB,
+    CommunityChangeDB,
+    CommunityDB,
+    engine,
+    init_db,
+    session_scope,
+)
+from .shared_libraries.enrichment_queue import get_enrichment_queue_stats
+
+
+def get_database_stats() -> Dict[str, Any]:
+    """Row counts of the main tables and enrichment tasks per status."""
+    with session_scope(write=False) as db:
+        return {
+            "basic_communities": db.scalar(select(func.count()).select_from(BasicCommunityDB)),
+            "communities": db.scalar(select(func.count()).select_from(CommunityDB)),
+            "active_communities": db.scalar(
+                select(func.count())
+                .select_from(CommunityDB)
+                .where(func.coalesce(CommunityDB.is_active, True).is_(True))
+            ),
+            "community_changes": db.scalar(select(func.count()).select_from(CommunityChangeDB)),
+            "enrichment_queue": get_enrichment_queue_stats(db),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the community database without the agents")
+    parser.add_argument(
+        "command",
+        choices=["init", "stats"],
+        help="init creates or upgrades the schema; stats prints table sizes",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        init_db()
+        print(f"Database ready: {engine.url.render_as_string(hide_password=True)}")
+    else:
+        print(json.dumps(get_database_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
@@ -0,0 +1,611 @@
+"""Batch runner that enriches queued communities without an orchestrating LLM.
+
+Pending communities are claimed from the enrichment queue and passed to
+community_enricher_agent directly through the ADK runner, with a bounded
+number of concurrent calls. Each answer is validated against
+EnrichedCommunity and saved in batches with the bulk upsert tool.
+
+The runner fetches each website itself and hands the model a compact page
+digest. Results are cached by page content and prompt, so unchanged sites
+are not sent to the model again. With --batched, several digests share one
+call to community_batch_enricher_agent.
+
+    python -m mataconnect_data_agent.enrichment_runner --limit 500 --concurrency 16
+    python -m mataconnect_data_agent.enrichment_runner --limit 500 --batched
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from google.adk.runners import InMemoryRunner
+from pydantic import ValidationError
+
+from .shared_libraries.agent_calls import JSON_FENCE, run_agent
+from .shared_libraries.database import BasicCommunityDB, EnrichedCommunity, session_scope
+from .shared_libraries.database_tool import save_enriched_communities_to_db
+from .shared_libraries.enrichment_cache import (
+    EnrichmentCache,
+    content_hash,
+    prompt_hash,
+)
+from .shared_libraries.enrichment_queue import (
+    ENRICHMENT_BATCH_SIZE,
+    claim_enrichment_batch,
+    fail_enrichment,
+)
+from .shared_libraries.extraction import PageDigest, estimate_tokens, extract_page_digest
+from .shared_libraries.fetcher import WebsiteFetcher
+from .shared_libraries.instrumentation import (
+    INSTRUMENTATION_ENABLED,
+    instrument_agent,
+    instrumentation_run,
+)
+from .shared_libraries.urls import canonicalize_url
+from .sub_agents.community_enricher import (
+    community_batch_enricher_agent,
+    community_enricher_agent,
+)
+
+# Runner configuration
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+ENRICHMENT_WRITE_BATCH_SIZE = int(os.getenv("ENRICHMENT_WRITE_BATCH_SIZE", "50"))
+ENRICHMENT_CALL_TIMEOUT_SECONDS = float(os.getenv("ENRICHMENT_CALL_TIMEOUT_SECONDS", "180"))
+
+# Batched enrichment: communities are packed into one model call up to these limits
+ENRICHMENT_BATCH_MAX_COMMUNITIES = int(os.getenv("ENRICHMENT_BATCH_MAX_COMMUNITIES", "8"))
+ENRICHMENT_BATCH_TOKEN_BUDGET = int(os.getenv("ENRICHMENT_BATCH_TOKEN_BUDGET", "12000"))
+ENRICHMENT_BATCH_OUTPUT_TOKEN_BUDGET = int(os.getenv("ENRICHMENT_BATCH_OUTPUT_TOKEN_BUDGET", "8192"))
+# How long a batch waits for more fetched communities before it is sent
+ENRICHMENT_BATCH_WAIT_SECONDS = float(os.getenv("ENRICHMENT_BATCH_WAIT_SECONDS", "2"))
+
+# Bump when build_enrichment_message changes so cached results are not reused
+ENRICHMENT_MESSAGE_VERSION = "2"
+
+APP_NAME = "mataconnect_enrichment_runner"
+
+
+class EnrichmentError(Exception):
+    """Raised when the enricher does not return a valid enriched community."""
+
+
+def build_enrichment_message(
+    community: Dict[str, Any], digest: Optional[PageDigest] = None
+) -> str:
+    """Build the request sent to the enricher for one basic community."""
+    message = (
+        "Enrich this community and return only the JSON object.\n"
+        f"Name: {community['name']}\n"
+        f"Website: {community['url']}"
+    )
+    if digest and digest.text:
+        message += (
+            "\n\nThe website has already been fetched; use this digest of it and only "
+            "fetch or search for details it does not cover.\n"
+            f"Page data: {json.dumps(_digest_side_data(digest))}\n"
+            f"Page text:\n{digest.text}"
+        )
+    return message
+
+
+def _digest_side_data(digest: PageDigest) -> Dict[str, Any]:
+    return {
+        "title": digest.title,
+        "description": digest.description,
+        "language": digest.language,
+        "emails": digest.emails,
+        "social_links": digest.social_links,
+        "links": digest.links,
+    }
+
+
+def _batch_section(community: Dict[str, Any], digest: PageDigest) -> str:
+    """The part of a batched request describing one community."""
+    return (
+        f"### basic_community_id: {community['id']}\n"
+        f"Name: {community['name']}\n"
+        f"Website: {community['url']}\n"
+        f"Page data: {json.dumps(_digest_side_data(digest))}\n"
+        f"Page text:\n{digest.text}"
+    )
+
+
+def build_batch_enrichment_message(items: List[Tuple[Dict[str, Any], PageDigest]]) -> str:
+    """Build the request sent to the batched enricher for (community, digest) pairs."""
+    sections = "\n\n".join(_batch_section(community, digest) for community, digest in items)
+    return (
+        f"Enrich these {len(items)} communities and return only the JSON array, "
+        f"one object per community.\n\n{sections}"
+    )
+
+
+def _digest_hash(digest: PageDigest) -> str:
+    """Hash the parts of a digest that reach the model."""
+    return content_hash(
+        digest.model_dump(
+            include={"title", "description", "language", "text", "emails", "social_links", "links"}
+        )
+    )
+
+
+def _request_hash(agent) -> str:
+    """Hash the enricher's instruction, model and message format."""
+    model = getattr(agent.model, "model", agent.model)
+    instruction = agent.instruction if isinstance(agent.instruction, str) else ""
+    return prompt_hash(instruction, str(model), ENRICHMENT_MESSAGE_VERSION)
+
+
+def parse_enriched_community(text: str, community: Dict[str, Any]) -> EnrichedCommunity:
+    """
+    Parse and validate the enricher's final answer for a community.
+
+    Accepts a bare JSON object or one wrapped in a markdown code fence.
+    Fills name, website and data_source from the basic community when the
+    model leaves them out.
+    """
+    fenced = JSON_FENCE.search(text or "")
+    candidate = fenced.group(1) if fenced else (text or "")
+    start, end = candidate.find("{"), candidate.rfind("}")
+    if start == -1 or end <= start:
+        raise EnrichmentError("Enricher response contains no JSON object")
+    try:
+        data = json.loads(candidate[start : end + 1])
+    except ValueError as e:
+        raise EnrichmentError(f"Enricher response is not valid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise EnrichmentError("Enricher response is not a JSON object")
+    return _validate_enriched(data, community)
+
+
+def _validate_enriched(data: Dict[str, Any], community: Dict[str, Any]) -> EnrichedCommunity:
+    # focus_areas is a Text column but the prompt asks for a list
+    if isinstance(data.get("focus_areas"), list):
+        data["focus_areas"] = ", ".join(str(item) for item in data["focus_areas"])
+    data["name"] = data.get("name") or community["name"]
+    data["website"] = data.get("website") or community["url"]
+    data["data_source"] = data.get("data_source") or community.get("source")
+
+    try:
+        return EnrichedCommunity.model_validate(data)
+    except ValidationError as e:
+        raise EnrichmentError(f"Enricher response failed validation: {str(e)}")
+
+
+def parse_enriched_batch(
+    text: str, communities: List[Dict[str, Any]]
+) -> Tuple[Dict[int, EnrichedCommunity], Dict[int, str]]:
+    """
+    Parse and validate the batched enricher's answer for several communities.
+
+    Results are matched to communities by basic_community_id and validated
+    one by one. Returns the enriched communities and the errors, both keyed
+    by basic community id; a community missing from the answer counts as an
+    error. Raises EnrichmentError if the answer is not a JSON array at all.
+    """
+    fenced = JSON_FENCE.search(text or "")
+    candidate = fenced.group(1) if fenced else (text or "")
+    start, end = candidate.find("["), candidate.rfind("]")
+    if start == -1 or end <= start:
+        raise EnrichmentError("Batched enricher response contains no JSON array")
+    try:
+        items = json.loads(candidate[start : end + 1])
+    except ValueError as e:
+        raise EnrichmentError(f"Batched enricher response is not valid JSON: {str(e)}")
+
+    by_id = {community["id"]: community for community in communities}
+    results: Dict[int, EnrichedCommunity] = {}
+    errors: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            basic_community_id = int(item.pop("basic_community_id", None))
+        except (TypeError, ValueError):
+            continue
+        community = by_id.get(basic_community_id)
+        if community is None or basic_community_id in results:
+            continue
+        # The response schema spells out every social network and metric; keep the ones given
+        for field in ("social_links", "community_info"):
+            if isinstance(item.get(field), dict):
+                item[field] = {key: value for key, value in item[field].items() if value} or None
+        try:
+            results[basic_community_id] = _validate_enriched(item, community)
+            errors.pop(basic_community_id, None)
+        except EnrichmentError as e:
+            errors[basic_community_id] = str(e)
+
+    for community in communities:
+        if community["id"] not in results and community["id"] not in errors:
+            errors[community["id"]] = "Missing from the batched enricher response"
+    return results, errors
+
+
+class _BatchPlanner:
+    """
+    Decides how many communities go into one batched enricher call.
+
+    A batch grows until it reaches ENRICHMENT_BATCH_MAX_COMMUNITIES, its
+    page digests would exceed the input token budget, or the expected
+    answer would exceed the output token budget. The expected answer size
+    per community starts as a guess and follows the answers actually seen.
+    """
+
+    def __init__(
+        self,
+        max_communities: int = ENRICHMENT_BATCH_MAX_COMMUNITIES,
+        token_budget: int = ENRICHMENT_BATCH_TOKEN_BUDGET,
+        output_token_budget: int = ENRICHMENT_BATCH_OUTPUT_TOKEN_BUDGET,
+    ):
+        self.max_communities = max_communities
+        self.token_budget = token_budget
+        self.output_token_budget = output_token_budget
+        self.output_tokens_per_community = 600.0
+
+    def fits(self, size: int, tokens: int, item_tokens: int) -> bool:
+        """Whether a batch of `size` communities and `tokens` can take one more."""
+        if size == 0:
+            return True
+        return (
+            size < self.max_communities
+            and tokens + item_tokens <= self.token_budget
+            and (size + 1) * self.output_tokens_per_community <= self.output_token_budget
+        )
+
+    def observe(self, text: str, communities: int) -> None:
+        """Update the expected answer size from an answer covering `communities`."""
+        if communities:
+            observed = estimate_tokens(text) / communities
+            self.output_tokens_per_community = 0.7 * self.output_tokens_per_community + 0.3 * observed
+
+
+class _ResultWriter:
+    """Collects enrichment outcomes and writes them in batches."""
+
+    def __init__(self, write_batch_size: int):
+        self.write_batch_size = write_batch_size
+        self.enriched: List[dict] = []
+        self.failures: List[tuple] = []
+        self.lock = asyncio.Lock()
+        self.stats = {"enriched": 0, "inserted": 0, "updated": 0, "failed": 0}
+
+    async def add_enriched(self, basic_community_id: int, enriched: EnrichedCommunity):
+        async with self.lock:
+            self.enriched.append(
+                {**enriched.model_dump(), "basic_community_id": basic_community_id}
+            )
+            if len(self.enriched) >= self.write_batch_size:
+                await self._flush()
+
+    async def add_failure(self, basic_community_id: int, error: str):
+        async with self.lock:
+            self.failures.append((basic_community_id, error))
+            if len(self.failures) >= self.write_batch_size:
+                await self._flush()
+
+    async def flush(self):
+        async with self.lock:
+            await self._flush()
+
+    async def _flush(self):
+        enriched, self.enriched = self.enriched, []
+        failures, self.failures = self.failures, []
+        if enriched:
+            try:
+                saved = await asyncio.to_thread(save_enriched_communities_to_db, enriched)
+            except Exception as e:
+                # The whole batch is retried by a later claim instead of ending the run
+                print(f"Failed to save {len(enriched)} enriched communities: {str(e)}")
+                failures.extend((record["basic_community_id"], str(e)) for record in enriched)
+            else:
+                self.stats["enriched"] += len(enriched)
+                self.stats["inserted"] += saved["inserted"]
+                self.stats["updated"] += saved["updated"]
+                for failure in saved["failures"]:
+                    failures.append(
+                        (enriched[failure["index"]]["basic_community_id"], failure["error"])
+                    )
+        if failures:
+            try:
+                await asyncio.to_thread(_record_failures, failures)
+            except Exception as e:
+                # Unrecorded tasks keep their lease and are claimable again once it expires
+                print(f"Failed to record {len(failures)} enrichment failures: {str(e)}")
+            self.stats["failed"] += len(failures)
+
+
+def _record_failures(failures: List[tuple]) -> None:
+    """Mark failed queue tasks in one transaction."""
+    with session_scope() as db:
+        for basic_community_id, error in failures:
+            fail_enrichment(db, basic_community_id, error)
+
+
+def _claim_batch(limit: int, after_id: Optional[int]) -> List[Dict[str, Any]]:
+    """Claim queued communities and detach them from the session."""
+    with session_scope() as db:
+        communities: List[BasicCommunityDB] = claim_enrichment_batch(
+            db, limit=limit, after_id=after_id
+        )
+        db.commit()
+        return [
+            {"id": c.id, "name": c.name, "url": c.url, "source": c.source}
+            for c in communities
+        ]
+
+
+async def fetch_digest(
+    fetcher: Optional[WebsiteFetcher], community: Dict[str, Any]
+) -> Optional[PageDigest]:
+    """Fetch a community's website and reduce it to a digest, if possible."""
+    if fetcher is None:
+        return None
+    result = await fetcher.fetch(community["url"])
+    if result.error or not result.text or (result.status or 0) >= 400:
+        return None
+    return extract_page_digest(result.text, url=result.final_url or result.url)
+
+
+async def run_enricher(
+    runner: InMemoryRunner, community: Dict[str, Any], digest: Optional[PageDigest]
+) -> str:
+    """Run the enricher for one community in a fresh session and return its answer."""
+    return await run_agent(runner, build_enrichment_message(community, digest))
+
+
+async def enrich_communities(
+    limit: Optional[int] = None,
+    concurrency: int = ENRICHMENT_CONCURRENCY,
+    batch_size: int = ENRICHMENT_BATCH_SIZE,
+    write_batch_size: int = ENRICHMENT_WRITE_BATCH_SIZE,
+    agent=community_enricher_agent,
+    fetch_pages: bool = True,
+    cache: Optional[EnrichmentCache] = None,
+    use_cache: bool = True,
+    batched: bool = False,
+    batch_agent=community_batch_enricher_agent,
+) -> Dict[str, Any]:
+    """
+    Enrich up to `limit` queued communities (all of them when None).
+
+    Up to `concurrency` enricher calls run at once. Communities are claimed
+    from the queue `batch_size` at a time, so several runners can drain the
+    same queue. With `fetch_pages`, websites are fetched up front and passed
+    to the model as digests, and with `use_cache` results for unchanged
+    digests are reused from the enrichment cache.
+
+    With `batched`, fetched communities are sent to `batch_agent` several
+    per call, packed by _BatchPlanner; only the communities that fail
+    validation are retried, in smaller batches, down to one. Communities
+    whose website could not be fetched still go to `agent` one by one.
+    Returns counts of claimed, enriched, inserted, updated, failed and
+    cached communities, model calls and the elapsed time.
+    """
+    if batched and not fetch_pages:
+        raise ValueError("Batched enrichment needs fetch_pages")
+    if INSTRUMENTATION_ENABLED:
+        instrument_agent(agent, track_runs=False)
+        if batched:
+            instrument_agent(batch_agent, track_runs=False)
+    runner = InMemoryRunner(agent=agent, app_name=APP_NAME)
+    batch_runner = InMemoryRunner(agent=batch_agent, app_name=APP_NAME) if batched else None
+    if use_cache and cache is None:
+        cache = EnrichmentCache()
+    if not use_cache or not fetch_pages:
+        cache = None
+    request_hash = _request_hash(batch_agent if batched else agent)
+    fetcher = WebsiteFetcher() if fetch_pages else None
+    cache_hits = 0
+    writer = _ResultWriter(write_batch_size)
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max(concurrency * 2, batch_size))
+    # Fetched communities waiting for a batched call, ended by one None per batch worker
+    ready: asyncio.Queue = asyncio.Queue()
+    planner = _BatchPlanner()
+    calls = {"single": 0, "batched": 0, "batch_retries": 0}
+    started = time.perf_counter()
+    claimed = 0
+
+    async def produce():
+        nonlocal claimed
+        after_id = None
+        while limit is None or claimed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - claimed)
+            batch = await asyncio.to_thread(_claim_batch, size, after_id)
+            if not batch:
+                break
+            claimed += len(batch)
+            after_id = batch[-1]["id"]
+            for community in batch:
+                await pending.put(community)
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def work():
+        nonlocal cache_hits
+        while (community := await pending.get()) is not None:
+            try:
+                digest = await fetch_digest(fetcher, community)
+                cache_key = None
+                if cache is not None and digest is not None:
+                    cache_key = (
+                        canonicalize_url(community["url"]),
+                        _digest_hash(digest),
+                        request_hash,
+                    )
+                    cached = await asyncio.to_thread(cache.get, *cache_key)
+                    if cached is not None:
+                        cache_hits += 1
+                        await writer.add_enriched(community["id"], cached)
+                        continue
+                if batched and digest is not None:
+                    await ready.put((community, digest, cache_key))
+                    continue
+
+                calls["single"] += 1
+                text = await asyncio.wait_for(
+                    run_enricher(runner, community, digest), ENRICHMENT_CALL_TIMEOUT_SECONDS
+                )
+                enriched = parse_enriched_community(text, community)
+                if cache_key is not None:
+                    await asyncio.to_thread(cache.put, *cache_key, enriched)
+                await writer.add_enriched(community["id"], enriched)
+            except asyncio.TimeoutError:
+                await writer.add_failure(community["id"], "Enricher call timed out")
+            except Exception as e:
+                print(f"Failed to enrich {community['name']}: {str(e)}")
+                await writer.add_failure(community["id"], str(e))
+
+    async def enrich_batch(items: List[tuple]):
+        communities = [community for community, _, _ in items]
+        message = build_batch_enrichment_message([(community, digest) for community, digest, _ in items])
+        calls["batched"] += 1
+        try:
+            text = await asyncio.wait_for(
+                run_agent(batch_runner, message), ENRICHMENT_CALL_TIMEOUT_SECONDS
+            )
+            results, errors = parse_enriched_batch(text, communities)
+            planner.observe(text, len(results))
+        except asyncio.TimeoutError:
+            results, errors = {}, {c["id"]: "Batched enricher call timed out" for c in communities}
+        except Exception as e:
+            results, errors = {}, {c["id"]: str(e) for c in communities}
+
+        for community, _, cache_key in items:
+            enriched = results.get(community["id"])
+            if enriched is not None:
+                try:
+                    if cache_key is not None:
+                        await asyncio.to_thread(cache.put, *cache_key, enriched)
+                    await writer.add_enriched(community["id"], enriched)
+                except Exception as e:
+                    print(f"Failed to save {community['name']}: {str(e)}")
+                    await writer.add_failure(community["id"], str(e))
+
+        failed = [item for item in items if item[0]["id"] in errors]
+        if not failed:
+            return
+        if len(items) == 1:
+            community = items[0][0]
+            print(f"Failed to enrich {community['name']}: {errors[community['id']]}")
+            await writer.add_failure(community["id"], errors[community["id"]])
+            return
+        # Retry only the failed communities; a batch that failed as a whole is halved
+        calls["batch_retries"] += 1
+        if len(failed) < len(items):
+            await enrich_batch(failed)
+        else:
+            middle = len(failed) // 2
+            await enrich_batch(failed[:middle])
+            await enrich_batch(failed[middle:])
+
+    async def batch_work():
+        carried = None
+        finished = False
+        while not finished:
+            item = carried if carried is not None else await ready.get()
+            carried = None
+            if item is None:
+                break
+            items = [item]
+            tokens = estimate_tokens(_batch_section(item[0], item[1]))
+            deadline = time.monotonic() + ENRICHMENT_BATCH_WAIT_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = await asyncio.wait_for(ready.get(), remaining)
+                    else:
+                        item = ready.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    finished = True
+                    break
+                item_tokens = estimate_tokens(_batch_section(item[0], item[1]))
+                if not planner.fits(len(items), tokens, item_tokens):
+                    carried = item
+                    break
+                items.append(item)
+                tokens += item_tokens
+            await enrich_batch(items)
+
+    async def prepare():
+        await asyncio.gather(*(work() for _ in range(concurrency)))
+        for _ in range(concurrency):
+            await ready.put(None)
+
+    if fetcher is not None:
+        await fetcher.open()
+    try:
+        # One instrumentation run covers the whole batch
+        with instrumentation_run(APP_NAME):
+            if batched:
+                await asyncio.gather(
+                    produce(), prepare(), *(batch_work() for _ in range(concurrency))
+                )
+            else:
+                await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+            await writer.flush()
+    finally:
+        if fetcher is not None:
+            await fetcher.close()
+
+    cache_stats = None
+    if cache is not None:
+        await asyncio.to_thread(cache.evict)
+        cache_stats = await asyncio.to_thread(cache.stats)
+
+    stats = {
+        "claimed": claimed,
+        **writer.stats,
+        "cache_hits": cache_hits,
+        "cache": cache_stats,
+        "model_calls": calls,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    print(f"Enrichment run finished: {stats}")
+    return stats
+
+
+def run_enrichment(**kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around enrich_communities."""
+    return asyncio.run(enrich_communities(**kwargs))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Enrich queued communities in batch.")
+    parser.add_argument("--limit", type=int, default=None, help="Communities to enrich")
+    parser.add_argument("--concurrency", type=int, default=ENRICHMENT_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=ENRICHMENT_BATCH_SIZE)
+    parser.add_argument("--write-batch-size", type=int, default=ENRICHMENT_WRITE_BATCH_SIZE)
+    parser.add_argument(
+        "--no-fetch", action="store_true", help="Let the enricher fetch websites itself"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always call the model, ignoring cached results"
+    )
+    parser.add_argument(
+        "--batched", action="store_true", help="Enrich several fetched communities per model call"
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    run_enrichment(
+        limit=args.limit,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        write_batch_size=args.write_batch_size,
+        fetch_pages=not args.no_fetch,
+        use_cache=not args.no_cache,
+        batched=args.batched,
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,550 @@
+"""Resumable collect, enrich and save pipeline with checkpointed stage outputs.
+
+A run searches with google_scraper_agent for each of its queries, saves the
+communities found, enriches the ones with a website through
+community_enricher_agent and saves the results. Every model output is
+checkpointed in the pipeline_items table as soon as it exists: the
+communities collected per query, and each enriched community before it is
+saved. Saving a checkpointed output is idempotent, so a run that dies
+(quota error, container restart) is resumed by its run id after the last
+completed item, without repeating any model call:
+
+    python -m mataconnect_data_agent.pipeline "women in tech communities in London" "women founders UK"
+    python -m mataconnect_data_agent.pipeline --resume 20261018-021500-3f9a1c
+    python -m mataconnect_data_agent.pipeline --list
+
+Communities are leased from the enrichment queue under a worker id derived
+from the run id, so a resumed run takes its own leases back at once while
+other runners keep away from them.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from google.adk.runners import InMemoryRunner
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .collector import QUERY_SHARDS, expand_query, search_query
+from .enrichment_runner import (
+    ENRICHMENT_CALL_TIMEOUT_SECONDS,
+    ENRICHMENT_CONCURRENCY,
+    ENRICHMENT_WRITE_BATCH_SIZE,
+    fetch_digest,
+    parse_enriched_community,
+    run_enricher,
+)
+from .shared_libraries.database import (
+    BasicCommunityDB,
+    EnrichmentTaskDB,
+    PIPELINE_COLLECT,
+    PIPELINE_COLLECTED,
+    PIPELINE_ENRICH,
+    PIPELINE_ENRICHED,
+    PIPELINE_FAILED,
+    PIPELINE_PENDING,
+    PIPELINE_SAVED,
+    PIPELINE_SKIPPED,
+    PipelineItemDB,
+    PipelineRunDB,
+    session_scope,
+)
+from .shared_libraries.database_tool import (
+    insert_basic_communities,
+    save_enriched_communities_to_db,
+)
+from .shared_libraries.enrichment_queue import claim_enrichment_batch, fail_enrichment
+from .shared_libraries.fetcher import WebsiteFetcher
+from .shared_libraries.handles import COMMUNITY_HANDLE, parse_handle
+from .shared_libraries.instrumentation import (
+    INSTRUMENTATION_ENABLED,
+    instrument_agent,
+    instrumentation_run,
+)
+from .shared_libraries.search_cache import SearchCache
+from .shared_libraries.urls import canonicalize_url
+from .sub_agents.community_enricher import community_enricher_agent
+from .sub_agents.google_scraper import google_scraper_agent
+
+APP_NAME = "mataconnect_pipeline"
+PIPELINE_SOURCE = "google_scraper"
+
+# Communities claimed from the enrichment queue per claim
+PIPELINE_CLAIM_SIZE = 50
+
+
+class PipelineError(Exception):
+    """Raised when a run cannot be created, found or continued."""
+
+
+def new_run_id() -> str:
+    """A sortable, unique run id."""
+    return f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def _worker_id(run_id: str) -> str:
+    return f"pipeline-{run_id}"
+
+
+def create_run(
+    queries: List[str],
+    source: str = PIPELINE_SOURCE,
+    run_id: Optional[str] = None,
+    shard_by: Optional[str] = None,
+) -> str:
+    """
+    Record a new run and one pending collect item per query; returns the run id.
+
+    With `shard_by` every query is expanded into its sub-queries per city
+    or sector first (see collector.expand_query).
+    """
+    run_id = run_id or new_run_id()
+    if shard_by:
+        queries = [sub_query for query in queries for sub_query in expand_query(query, shard_by)]
+    try:
+        with session_scope() as db:
+            if db.get(PipelineRunDB, run_id) is not None:
+                raise PipelineError(f"Run {run_id} already exists")
+            db.add(PipelineRunDB(run_id=run_id, queries=queries, source=source, status="running"))
+            db.flush()
+            db.add_all(
+                PipelineItemDB(
+                    run_id=run_id,
+                    stage=PIPELINE_COLLECT,
+                    item_key=str(index),
+                    status=PIPELINE_PENDING,
+                    output={"query": query},
+                )
+                for index, query in enumerate(queries)
+            )
+    except SQLAlchemyError as e:
+        raise PipelineError(f"Failed to create run: {str(e)}")
+    return run_id
+
+
+def list_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent runs with their status and item counts per stage."""
+    with session_scope(write=False) as db:
+        runs = db.scalars(
+            select(PipelineRunDB).order_by(PipelineRunDB.created_at.desc()).limit(limit)
+        ).all()
+        return [
+            {
+                "run_id": run.run_id,
+                "status": run.status,
+                "queries": len(run.queries or []),
+                "created_at": run.created_at.isoformat() if run.created_at else None,
+                "items": _item_counts(db, run.run_id),
+            }
+            for run in runs
+        ]
+
+
+def _item_counts(db, run_id: str) -> Dict[str, Dict[str, int]]:
+    counts: Dict[str, Dict[str, int]] = {}
+    rows = db.execute(
+        select(PipelineItemDB.stage, PipelineItemDB.status, func.count())
+        .where(PipelineItemDB.run_id == run_id)
+        .group_by(PipelineItemDB.stage, PipelineItemDB.status)
+    )
+    for stage, status, count in rows:
+        counts.setdefault(stage, {})[status] = count
+    return counts
+
+
+def _items(run_id: str, stage: str, statuses: List[str]) -> List[PipelineItemDB]:
+    with session_scope(write=False) as db:
+        items = db.scalars(
+            select(PipelineItemDB)
+            .where(
+                PipelineItemDB.run_id == run_id,
+                PipelineItemDB.stage == stage,
+                PipelineItemDB.status.in_(statuses),
+            )
+            .order_by(func.length(PipelineItemDB.item_key), PipelineItemDB.item_key)
+        ).all()
+        db.expunge_all()
+        return items
+
+
+def _checkpoint(db, run_id: str, stage: str, item_key: str, **values) -> None:
+    """Update one item's state and output. Does not commit."""
+    db.execute(
+        update(PipelineItemDB)
+        .where(
+            PipelineItemDB.run_id == run_id,
+            PipelineItemDB.stage == stage,
+            PipelineItemDB.item_key == item_key,
+        )
+        .values(**values, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def checkpoint(run_id: str, stage: str, item_key: str, **values) -> None:
+    """Update one item's state and output in its own transaction."""
+    with session_scope() as db:
+        _checkpoint(db, run_id, stage, item_key, **values)
+
+
+def save_collected(run_id: str, item_key: str, source: str) -> int:
+    """
+    Save a collected query's communities and queue the run's enrichment items.
+
+    Inserting the communities, adding an enrich item for every one with a
+    website and marking the collect item saved happen in one transaction.
+    Returns the number of enrich items added.
+    """
+    with session_scope() as db:
+        item = db.get(PipelineItemDB, (run_id, PIPELINE_COLLECT, item_key))
+        output = dict(item.output)
+        saved = insert_basic_communities(db, output["communities"], source)
+
+        # Duplicates are enriched too: they may be waiting from an earlier run
+        urls = {canonicalize_url(c["url"]) for c in output["communities"] if c.get("url")}
+        ids = []
+        if urls:
+            ids = sorted(
+                db.scalars(
+                    select(BasicCommunityDB.id).where(BasicCommunityDB.canonical_url.in_(urls))
+                )
+            )
+        existing = set(
+            db.scalars(
+                select(PipelineItemDB.item_key).where(
+                    PipelineItemDB.run_id == run_id,
+                    PipelineItemDB.stage == PIPELINE_ENRICH,
+                    PipelineItemDB.item_key.in_([str(id) for id in ids]),
+                )
+            )
+        )
+        added = [
+            PipelineItemDB(
+                run_id=run_id, stage=PIPELINE_ENRICH, item_key=str(id), status=PIPELINE_PENDING
+            )
+            for id in ids
+            if str(id) not in existing
+        ]
+        db.add_all(added)
+
+        output.update(
+            inserted=saved["inserted"], duplicates=saved["duplicates"], basic_community_ids=ids
+        )
+        _checkpoint(db, run_id, PIPELINE_COLLECT, item_key, status=PIPELINE_SAVED, output=output)
+        return len(added)
+
+
+def save_enriched(run_id: str, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Save the run's checkpointed enrichments that are not saved yet.
+
+    Saving is an upsert on the canonical URL, so enrichments saved just
+    before a crash are saved again on resume without creating duplicates.
+    Returns the saved and failed counts.
+    """
+    items = _items(run_id, PIPELINE_ENRICH, [PIPELINE_ENRICHED])[:limit]
+    if not items:
+        return {"saved": 0, "failed": 0}
+    records = [{**item.output, "basic_community_id": int(item.item_key)} for item in items]
+    saved = save_enriched_communities_to_db(records)
+    errors = {failure["index"]: failure["error"] for failure in saved["failures"]}
+
+    with session_scope() as db:
+        for index, item in enumerate(items):
+            handle = saved["handles"][index]
+            if handle:
+                _checkpoint(
+                    db,
+                    run_id,
+                    PIPELINE_ENRICH,
+                    item.item_key,
+                    status=PIPELINE_SAVED,
+                    community_id=parse_handle(handle, COMMUNITY_HANDLE),
+                    error=None,
+                )
+            else:
+                _checkpoint(
+                    db,
+                    run_id,
+                    PIPELINE_ENRICH,
+                    item.item_key,
+                    status=PIPELINE_FAILED,
+                    error=errors.get(index),
+                )
+                fail_enrichment(db, int(item.item_key), errors.get(index) or "Save failed")
+    return {"saved": len(items) - len(errors), "failed": len(errors)}
+
+
+def _claim(run_id: str, items: List[PipelineItemDB]) -> List[Dict[str, Any]]:
+    """
+    Lease the items' queue tasks for this run and return the claimed communities.
+
+    Items whose task cannot be claimed (already enriched, leased by another
+    runner or out of attempts) are marked skipped with the task's status.
+    """
+    ids = [int(item.item_key) for item in items]
+    with session_scope() as db:
+        communities = claim_enrichment_batch(
+            db, limit=len(ids), ids=ids, worker_id=_worker_id(run_id), reclaim_own=True
+        )
+        claimed = [
+            {"id": c.id, "name": c.name, "url": c.url, "source": c.source} for c in communities
+        ]
+        unclaimed = set(ids) - {c["id"] for c in claimed}
+        if unclaimed:
+            statuses = dict(
+                db.execute(
+                    select(EnrichmentTaskDB.basic_community_id, EnrichmentTaskDB.status).where(
+                        EnrichmentTaskDB.basic_community_id.in_(unclaimed)
+                    )
+                ).all()
+            )
+            for id in unclaimed:
+                _checkpoint(
+                    db,
+                    run_id,
+                    PIPELINE_ENRICH,
+                    str(id),
+                    status=PIPELINE_SKIPPED,
+                    error=f"Enrichment task is {statuses.get(id, 'missing')}",
+                )
+    return claimed
+
+
+async def run_pipeline(
+    run_id: str,
+    concurrency: int = ENRICHMENT_CONCURRENCY,
+    write_batch_size: int = ENRICHMENT_WRITE_BATCH_SIZE,
+    retry_failed: bool = False,
+    fetch_pages: bool = True,
+    use_cache: bool = True,
+    scraper_agent=google_scraper_agent,
+    agent=community_enricher_agent,
+) -> Dict[str, Any]:
+    """
+    Run, or resume, the pipeline run `run_id` until every item is finished.
+
+    Collect items whose communities were checkpointed are only saved, and
+    enrich items whose enrichment was checkpointed are only saved; model
+    calls are made only for items without a checkpointed output, and not
+    for searches answered by the search cache. Failed items stay failed
+    unless `retry_failed`. Returns the item counts per stage and status,
+    the model calls made by this attempt and the elapsed time.
+    """
+    with session_scope(write=False) as db:
+        record = db.get(PipelineRunDB, run_id)
+        if record is None:
+            raise PipelineError(f"Run {run_id} not found")
+        source = record.source
+
+    if INSTRUMENTATION_ENABLED:
+        instrument_agent(scraper_agent, track_runs=False)
+        instrument_agent(agent, track_runs=False)
+    scraper_runner = InMemoryRunner(agent=scraper_agent, app_name=APP_NAME)
+    runner = InMemoryRunner(agent=agent, app_name=APP_NAME)
+    fetcher = WebsiteFetcher() if fetch_pages else None
+    cache = SearchCache() if use_cache else None
+    retry = [PIPELINE_FAILED] if retry_failed else []
+    calls = {"collect": 0, "enrich": 0}
+    limiter = asyncio.Semaphore(concurrency)
+    save_lock = asyncio.Lock()
+    unsaved = 0
+    started = time.perf_counter()
+
+    async def collect(item: PipelineItemDB):
+        query = item.output["query"]
+        async with limiter:
+            try:
+                communities, cached = await search_query(scraper_runner, query, source, cache)
+            except Exception as e:
+                message = "Scraper call timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                print(f"Failed to collect '{query}': {message}")
+                calls["collect"] += 1
+                await asyncio.to_thread(
+                    checkpoint,
+                    run_id,
+                    PIPELINE_COLLECT,
+                    item.item_key,
+                    status=PIPELINE_FAILED,
+                    error=message,
+                )
+                return
+        calls["collect"] += not cached
+        # Checkpointed before saving, so a crash in between costs no new search
+        await asyncio.to_thread(
+            checkpoint,
+            run_id,
+            PIPELINE_COLLECT,
+            item.item_key,
+            status=PIPELINE_COLLECTED,
+            output={"query": query, "communities": communities, "cached": cached},
+            error=None,
+        )
+        added = await asyncio.to_thread(save_collected, run_id, item.item_key, source)
+        print(f"Collected {len(communities)} communities for '{query}', {added} to enrich")
+
+    async def flush(force: bool = False):
+        nonlocal unsaved
+        async with save_lock:
+            if unsaved < write_batch_size and not force:
+                return
+            unsaved = 0
+            saved = await asyncio.to_thread(save_enriched, run_id)
+            if saved["saved"] or saved["failed"]:
+                print(f"Saved {saved['saved']} enriched communities, {saved['failed']} failed")
+
+    async def enrich(community: Dict[str, Any]):
+        nonlocal unsaved
+        async with limiter:
+            try:
+                digest = await fetch_digest(fetcher, community)
+                calls["enrich"] += 1
+                text = await asyncio.wait_for(
+                    run_enricher(runner, community, digest), ENRICHMENT_CALL_TIMEOUT_SECONDS
+                )
+                enriched = parse_enriched_community(text, community)
+            except Exception as e:
+                message = "Enricher call timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                print(f"Failed to enrich {community['name']}: {message}")
+                await asyncio.to_thread(_fail, run_id, community["id"], message)
+                return
+        await asyncio.to_thread(
+            checkpoint,
+            run_id,
+            PIPELINE_ENRICH,
+            str(community["id"]),
+            status=PIPELINE_ENRICHED,
+            output=enriched.model_dump(),
+            error=None,
+        )
+        unsaved += 1
+        await flush()
+
+    if fetcher is not None:
+        await fetcher.open()
+    try:
+        with instrumentation_run(APP_NAME):
+            # Collected but unsaved queries first, then the ones never collected
+            for item in _items(run_id, PIPELINE_COLLECT, [PIPELINE_COLLECTED]):
+                await asyncio.to_thread(save_collected, run_id, item.item_key, source)
+            await asyncio.gather(
+                *(collect(item) for item in _items(run_id, PIPELINE_COLLECT, [PIPELINE_PENDING, *retry]))
+            )
+
+            # Enrichments checkpointed before a crash are saved without a model call
+            await flush(force=True)
+            pending = _items(run_id, PIPELINE_ENRICH, [PIPELINE_PENDING, *retry])
+            for start in range(0, len(pending), PIPELINE_CLAIM_SIZE):
+                communities = await asyncio.to_thread(
+                    _claim, run_id, pending[start : start + PIPELINE_CLAIM_SIZE]
+                )
+                await asyncio.gather(*(enrich(community) for community in communities))
+            await flush(force=True)
+    finally:
+        if fetcher is not None:
+            await fetcher.close()
+
+    with session_scope() as db:
+        items = _item_counts(db, run_id)
+        unfinished = sum(
+            count
+            for stage in items.values()
+            for status, count in stage.items()
+            if status in (PIPELINE_PENDING, PIPELINE_COLLECTED, PIPELINE_ENRICHED)
+        )
+        stats = {
+            "run_id": run_id,
+            "items": items,
+            "model_calls": calls,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+        db.execute(
+            update(PipelineRunDB)
+            .where(PipelineRunDB.run_id == run_id)
+            .values(status="running" if unfinished else "finished", stats=stats)
+        )
+    print(f"Pipeline run {run_id} {'stopped' if unfinished else 'finished'}: {stats}")
+    return stats
+
+
+def _fail(run_id: str, basic_community_id: int, error: str) -> None:
+    """Mark an enrich item and its queue task failed in one transaction."""
+    with session_scope() as db:
+        _checkpoint(
+            db,
+            run_id,
+            PIPELINE_ENRICH,
+            str(basic_community_id),
+            status=PIPELINE_FAILED,
+            error=error,
+        )
+        fail_enrichment(db, basic_community_id, error)
+
+
+def run(
+    queries: Optional[List[str]] = None,
+    run_id: Optional[str] = None,
+    shard_by: Optional[str] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Synchronous entry point: start a run for `queries`, or resume `run_id`.
+
+    A new run gets `run_id` when given, otherwise a generated one, and its
+    queries are sharded by `shard_by` when given.
+    """
+    if queries:
+        run_id = create_run(queries, run_id=run_id, shard_by=shard_by)
+        print(f"Started pipeline run {run_id}")
+    elif not run_id:
+        raise PipelineError("Give queries for a new run or the run id to resume")
+    return asyncio.run(run_pipeline(run_id, **kwargs))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Collect, enrich and save communities, resumably.")
+    parser.add_argument("queries", nargs="*", help="Search queries for a new run")
+    parser.add_argument("--run-id", default=None, help="Id for a new run instead of a generated one")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None, help="Resume an earlier run")
+    parser.add_argument(
+        "--shard-by", choices=sorted(QUERY_SHARDS), default=None, help="Expand new queries per city or sector"
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="Retry items that failed")
+    parser.add_argument("--list", action="store_true", help="List recent runs and exit")
+    parser.add_argument("--concurrency", type=int, default=ENRICHMENT_CONCURRENCY)
+    parser.add_argument("--write-batch-size", type=int, default=ENRICHMENT_WRITE_BATCH_SIZE)
+    parser.add_argument(
+        "--no-fetch", action="store_true", help="Let the enricher fetch websites itself"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Search again even for cached queries")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print(json.dumps(list_runs(), indent=2))
+        return
+    if bool(args.queries) == bool(args.resume):
+        parser.error("give either queries for a new run or --resume RUN_ID")
+
+    stats = run(
+        queries=args.queries,
+        run_id=args.resume or args.run_id,
+        shard_by=args.shard_by,
+        concurrency=args.concurrency,
+        write_batch_size=args.write_batch_size,
+        retry_failed=args.retry_failed,
+        fetch_pages=not args.no_fetch,
+        use_cache=not args.no_cache,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+"""One-shot calls to an agent outside an ADK conversation.
+
+Used by the batch runners (enrichment_runner, pipeline, collector) that
+send each agent a single message in a fresh session and parse its final
+answer.
+"""
+
+import re
+
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+AGENT_CALL_USER_ID = "enrichment_runner"
+
+# Markdown code fence around a JSON answer
+JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+async def run_agent(runner: InMemoryRunner, text: str) -> str:
+    """Send `text` to the runner's agent in a fresh session and return its answer."""
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=AGENT_CALL_USER_ID
+    )
+    message = types.Content(role="user", parts=[types.Part(text=text)])
+    final_text = ""
+    try:
+        async for event in runner.run_async(
+            user_id=AGENT_CALL_USER_ID, session_id=session.id, new_message=message
+        ):
+            if event.is_final_response() and event.content and event.content.parts:
+                final_text = "".join(part.text or "" for part in event.content.parts)
+    finally:
+        await runner.session_service.delete_session(
+            app_name=runner.app_name, user_id=AGENT_CALL_USER_ID, session_id=session.id
+        )
+    return final_text
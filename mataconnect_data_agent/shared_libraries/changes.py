@@ -0,0 +1,225 @@
+"""Change log of enriched communities for incremental sync.
+
+Every save, deactivation, merge or delete of a community appends an entry
+to community_changes in the same transaction. Entries carry a monotonic
+sequence number, so a consumer keeps the last `next_cursor` it processed
+and asks only for what changed after it:
+
+    page = get_community_changes(after_seq=cursor)
+    # apply page["changes"], then store page["next_cursor"]
+
+The log is seeded with one entry per existing community, so starting at
+cursor 0 is a full sync. Compacting drops entries superseded by a later
+change to the same community; it keeps that property.
+
+    python -m mataconnect_data_agent.shared_libraries.changes --after 0 --limit 100
+    python -m mataconnect_data_agent.shared_libraries.changes --compact
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import case, delete, exists, func, insert, literal, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import (
+    CHANGE_DEACTIVATE,
+    CHANGE_UPSERT,
+    CommunityChangeDB,
+    CommunityDB,
+    session_scope,
+)
+from .export import EXPORT_COLUMNS
+
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "500"))
+CHANGES_MAX_PAGE_SIZE = 5000
+
+
+def record_changes(connection, community_ids: Iterable[int], op: str = CHANGE_UPSERT) -> None:
+    """Append change entries for communities. Runs in the caller's transaction."""
+    now = datetime.utcnow()
+    rows = [
+        {"community_id": community_id, "op": op, "changed_at": now}
+        for community_id in dict.fromkeys(community_ids)
+    ]
+    if rows:
+        connection.execute(insert(CommunityChangeDB.__table__), rows)
+
+
+def change_op(data: Dict[str, Any]) -> str:
+    """Operation logged for a save of `data`."""
+    return CHANGE_DEACTIVATE if data.get("is_active") is False else CHANGE_UPSERT
+
+
+def backfill_changes(connection) -> int:
+    """
+    Seed an empty change log with one entry per community.
+
+    Entries follow updated_at order, so consumers syncing from cursor 0 see
+    communities roughly in the order they last changed. Runs in the
+    caller's transaction.
+    """
+    changes = CommunityChangeDB.__table__
+    communities = CommunityDB.__table__
+    if connection.execute(select(exists().select_from(changes))).scalar():
+        return 0
+    op = case(
+        (func.coalesce(communities.c.is_active, True).is_(True), literal(CHANGE_UPSERT)),
+        else_=literal(CHANGE_DEACTIVATE),
+    )
+    result = connection.execute(
+        insert(changes).from_select(
+            ["community_id", "op", "changed_at"],
+            select(
+                communities.c.id,
+                op,
+                func.coalesce(communities.c.updated_at, communities.c.created_at),
+            ).order_by(communities.c.updated_at, communities.c.id),
+        )
+    )
+    if result.rowcount:
+        print(f"Seeded change log with {result.rowcount} communities")
+    return result.rowcount
+
+
+def _community_rows(db, community_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    rows = db.execute(
+        select(*(getattr(CommunityDB, column) for column in EXPORT_COLUMNS)).where(
+            CommunityDB.id.in_(community_ids)
+        )
+    ).mappings()
+    communities = {}
+    for row in rows:
+        data = dict(row)
+        for column in ("created_at", "updated_at"):
+            data[column] = data[column].isoformat() if data[column] else None
+        communities[data["id"]] = data
+    return communities
+
+
+def get_community_changes(
+    after_seq: int = 0, limit: int = CHANGES_PAGE_SIZE, include_data: bool = True
+) -> Dict[str, Any]:
+    """
+    Return the next page of community changes after the cursor `after_seq`.
+
+    Within a page only the latest change per community is returned, with
+    the community's current columns unless `include_data` is False. Deleted
+    communities come back with op 'delete' and no data; deactivated ones
+    with op 'deactivate' and is_active false. Pass `next_cursor` as
+    `after_seq` for the next page; `has_more` is false once caught up.
+    """
+    limit = max(1, min(limit, CHANGES_MAX_PAGE_SIZE))
+    try:
+        with session_scope(write=False) as db:
+            entries = db.execute(
+                select(
+                    CommunityChangeDB.seq,
+                    CommunityChangeDB.community_id,
+                    CommunityChangeDB.op,
+                    CommunityChangeDB.changed_at,
+                )
+                .where(CommunityChangeDB.seq > after_seq)
+                .order_by(CommunityChangeDB.seq)
+                .limit(limit + 1)
+            ).all()
+            has_more = len(entries) > limit
+            entries = entries[:limit]
+
+            latest = {entry.community_id: entry for entry in entries}
+            communities = {}
+            if include_data and latest:
+                communities = _community_rows(db, list(latest))
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to fetch community changes: {str(e)}")
+
+    changes = []
+    for entry in sorted(latest.values(), key=lambda entry: entry.seq):
+        change = {
+            "seq": entry.seq,
+            "community_id": entry.community_id,
+            "op": entry.op,
+            "changed_at": entry.changed_at.isoformat() if entry.changed_at else None,
+        }
+        if include_data:
+            change["community"] = communities.get(entry.community_id)
+        changes.append(change)
+
+    return {
+        "changes": changes,
+        "next_cursor": entries[-1].seq if entries else after_seq,
+        "has_more": has_more,
+    }
+
+
+def deactivate_communities(community_ids: List[int]) -> Dict[str, Any]:
+    """
+    Mark communities inactive and log the deactivation.
+
+    Deactivated communities drop out of searches and exports but stay in the
+    database. Returns how many active communities were deactivated.
+    """
+    try:
+        with session_scope() as db:
+            ids = list(
+                db.scalars(
+                    update(CommunityDB)
+                    .where(
+                        CommunityDB.id.in_(community_ids),
+                        func.coalesce(CommunityDB.is_active, True).is_(True),
+                    )
+                    .values(is_active=False, updated_at=datetime.utcnow())
+                    .returning(CommunityDB.id)
+                )
+            )
+            record_changes(db.connection(), ids, CHANGE_DEACTIVATE)
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to deactivate communities: {str(e)}")
+
+    print(f"Deactivated {len(ids)} communities")
+    return {"deactivated": len(ids), "community_ids": ids}
+
+
+def compact_changes() -> int:
+    """Delete change entries superseded by a later change to the same community."""
+    changes = CommunityChangeDB.__table__
+    newer = changes.alias("newer")
+    try:
+        with session_scope() as db:
+            result = db.execute(
+                delete(changes).where(
+                    exists().where(
+                        newer.c.community_id == changes.c.community_id,
+                        newer.c.seq > changes.c.seq,
+                    )
+                )
+            )
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to compact community changes: {str(e)}")
+    print(f"Compacted {result.rowcount} superseded changes")
+    return result.rowcount
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Read or compact the community change log")
+    parser.add_argument("--after", type=int, default=0, help="Cursor to read changes after")
+    parser.add_argument("--limit", type=int, default=CHANGES_PAGE_SIZE)
+    parser.add_argument("--ids-only", action="store_true", help="Leave out community data")
+    parser.add_argument("--compact", action="store_true", help="Drop superseded entries")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        compact_changes()
+        return
+    page = get_community_changes(args.after, limit=args.limit, include_data=not args.ids_only)
+    print(json.dumps(page, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
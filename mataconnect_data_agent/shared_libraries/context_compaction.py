@@ -0,0 +1,250 @@
+"""Rolling compaction of the root agent's session history.
+
+Every model turn re-sends the whole session, so a long "enrich communities"
+session pays for every earlier tool call and response again on each turn.
+compact_history is a before-model callback that, once the history in a
+request passes CONTEXT_TOKEN_CEILING, replaces its older part with a short
+ledger of what the session has done: the latest user request, collection
+counts and the outcome of each community handle. The most recent contents
+are kept as they are, up to half the ceiling, so the model still sees the
+turn it is working on.
+
+Only the request sent to the model is changed; session events are kept in
+full, and the ledger is rebuilt from them on every turn. Set
+CONTEXT_TOKEN_CEILING to 0 to send the history uncompacted.
+"""
+
+import json
+import os
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+
+from .extraction import estimate_tokens
+from .handles import BASIC_HANDLE, handle_kind, make_handle
+
+# Estimated tokens of session history above which older turns are compacted
+CONTEXT_TOKEN_CEILING = int(os.getenv("CONTEXT_TOKEN_CEILING", "16000"))
+# Community outcomes listed individually in the ledger; older ones are only counted
+CONTEXT_LEDGER_MAX_ENTRIES = int(os.getenv("CONTEXT_LEDGER_MAX_ENTRIES", "50"))
+
+LEDGER_HEADER = "[Session ledger] Earlier turns of this session were compacted into this summary."
+
+
+def _content_tokens(content: types.Content) -> int:
+    texts = []
+    for part in content.parts or []:
+        if part.text:
+            texts.append(part.text)
+        elif part.function_call:
+            texts.append(part.function_call.name or "")
+            texts.append(json.dumps(part.function_call.args, default=str))
+        elif part.function_response:
+            texts.append(part.function_response.name or "")
+            texts.append(json.dumps(part.function_response.response, default=str))
+    return estimate_tokens("\n".join(texts))
+
+
+def _is_boundary(content: types.Content) -> bool:
+    """Whether history may start at this content: it answers no earlier call."""
+    return not any(part.function_response for part in content.parts or [])
+
+
+def _user_text(content: types.Content) -> Optional[str]:
+    if content.role != "user" or not _is_boundary(content):
+        return None
+    text = "\n".join(part.text for part in content.parts or [] if part.text)
+    return text or None
+
+
+def _json_arg(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class _Ledger:
+    """What the compacted part of a session did, rebuilt from its contents."""
+
+    def __init__(self):
+        self.request: Optional[str] = None
+        self.searches = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.saved: Counter = Counter()
+        self.failed = 0
+        self.names: Dict[str, str] = {}
+        self.outcomes: "OrderedDict[str, str]" = OrderedDict()
+        self.open: "OrderedDict[str, str]" = OrderedDict()
+        self.other_tools: Counter = Counter()
+
+    @staticmethod
+    def _key(handle: Any) -> Optional[str]:
+        if handle is None or str(handle).strip() == "":
+            return None
+        handle = str(handle).strip()
+        return handle if handle_kind(handle) else make_handle(BASIC_HANDLE, handle)
+
+    def _open(self, handle: Any, state: str) -> None:
+        handle = self._key(handle)
+        if handle is None:
+            return
+        self.open[handle] = state
+        self.open.move_to_end(handle)
+
+    def _close(self, handle: Any, outcome: str) -> None:
+        handle = self._key(handle)
+        if handle is None:
+            return
+        self.open.pop(handle, None)
+        self.outcomes[handle] = outcome
+        self.outcomes.move_to_end(handle)
+
+    def add(self, name: str, args: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Record one tool call and its response."""
+        error = response.get("error") if isinstance(response, dict) else None
+        if name == "google_scraper_agent":
+            self.searches += 1
+        elif name == "save_community_info_to_db":
+            self.inserted += response.get("inserted", 0)
+            self.duplicates += response.get("duplicates", 0)
+        elif name == "collect_and_save_communities" and not error:
+            self.searches += response.get("queries", 1)
+            self.inserted += response.get("inserted", 0)
+            self.duplicates += response.get("duplicates", 0)
+        elif name == "get_communities_to_enrich":
+            for community in response.get("communities", []):
+                self.names[community.get("handle")] = community.get("name")
+                self._open(community.get("handle"), "claimed")
+        elif name == "community_enricher_agent":
+            request = _json_arg(args.get("request"))
+            if isinstance(request, dict):
+                self._open(
+                    request.get("basic_community_id"),
+                    f"enrichment failed: {error}" if error else "enriched, not yet saved",
+                )
+        elif name == "save_enriched_community_to_db":
+            data = _json_arg(args.get("enriched_data")) or {}
+            handle = data.get("basic_community_id") if isinstance(data, dict) else None
+            if error or "handle" not in response:
+                self._open(handle, f"save failed: {error}")
+            else:
+                self.saved[response.get("status", "saved")] += 1
+                self._close(handle, f"saved as {response['handle']} ({response.get('status')})")
+        elif name == "save_enriched_communities_to_db":
+            records = _json_arg(args.get("enriched_communities")) or []
+            handles = response.get("handles") or [None] * len(records)
+            errors = {failure.get("index"): failure.get("error") for failure in response.get("failures", [])}
+            self.saved["inserted"] += response.get("inserted", 0)
+            self.saved["updated"] += response.get("updated", 0)
+            for index, record in enumerate(records):
+                handle = record.get("basic_community_id") if isinstance(record, dict) else None
+                if error:
+                    self._open(handle, f"save failed: {error}")
+                elif index < len(handles) and handles[index]:
+                    self._close(handle, f"saved as {handles[index]}")
+                else:
+                    self._open(handle, f"save failed: {errors.get(index, 'unknown error')}")
+        elif name == "mark_enrichment_failed":
+            if not error:
+                self.failed += 1
+                self._close(args.get("basic_community_id"), f"marked failed: {args.get('error')}")
+        else:
+            self.other_tools[name] += 1
+
+    def _describe(self, entries: "OrderedDict[str, str]") -> List[str]:
+        shown = list(entries.items())[-CONTEXT_LEDGER_MAX_ENTRIES:]
+        lines = [
+            f"- {handle}{f' ({self.names[handle]})' if self.names.get(handle) else ''}: {outcome}"
+            for handle, outcome in shown
+        ]
+        if len(entries) > len(shown):
+            lines.insert(0, f"- ... {len(entries) - len(shown)} earlier not listed")
+        return lines
+
+    def render(self) -> str:
+        lines = [LEDGER_HEADER]
+        if self.request:
+            lines.append(f"Latest user request in the compacted turns: {self.request}")
+        if self.searches or self.inserted or self.duplicates:
+            lines.append(
+                f"Collected: {self.searches} searches, {self.inserted} communities saved, "
+                f"{self.duplicates} duplicates skipped."
+            )
+        done = sum(self.saved.values())
+        if done or self.failed or self.open:
+            lines.append(
+                f"Enrichment: {done} saved ({self.saved['inserted']} inserted, "
+                f"{self.saved['updated']} updated), {self.failed} marked failed, {len(self.open)} open."
+            )
+        if self.open:
+            lines.append(
+                "Open communities (claimed but not yet saved or marked failed); "
+                "enrich again any whose result is not in the turns below:"
+            )
+            lines.extend(self._describe(self.open))
+        if self.outcomes:
+            lines.append("Finished communities, most recent last; do not claim or enrich them again:")
+            lines.extend(self._describe(self.outcomes))
+        if self.other_tools:
+            calls = ", ".join(f"{name} x{count}" for name, count in sorted(self.other_tools.items()))
+            lines.append(f"Other tool calls: {calls}.")
+        return "\n".join(lines)
+
+
+def build_ledger(contents: List[types.Content]) -> str:
+    """Summarize the given session contents as a ledger."""
+    ledger = _Ledger()
+    # Client call ids are stripped from requests, so responses are paired
+    # with calls of the same tool in order
+    calls: Dict[str, deque] = {}
+    for content in contents:
+        text = _user_text(content)
+        if text:
+            ledger.request = text
+        for part in content.parts or []:
+            if part.function_call:
+                calls.setdefault(part.function_call.name, deque()).append(part.function_call.args or {})
+            elif part.function_response:
+                name = part.function_response.name
+                pending = calls.get(name)
+                args = pending.popleft() if pending else {}
+                ledger.add(name, args, part.function_response.response or {})
+    return ledger.render()
+
+
+def compact_history(callback_context, llm_request) -> None:
+    """Before-model callback replacing older history with a ledger above the token ceiling."""
+    contents = llm_request.contents
+    if CONTEXT_TOKEN_CEILING <= 0 or len(contents) < 2:
+        return None
+    sizes = [_content_tokens(content) for content in contents]
+    if sum(sizes) <= CONTEXT_TOKEN_CEILING:
+        return None
+
+    # Keep the latest contents that fit half the ceiling, starting at a
+    # content that does not answer a compacted call; at least the last one
+    budget = CONTEXT_TOKEN_CEILING // 2
+    cut = None
+    kept = 0
+    for index in range(len(contents) - 1, 0, -1):
+        kept += sizes[index]
+        if kept > budget and cut is not None:
+            break
+        if _is_boundary(contents[index]):
+            cut = index
+    if cut is None:
+        return None
+
+    ledger = types.Part(text=build_ledger(contents[:cut]))
+    tail = list(contents[cut:])
+    if tail[0].role == "user":
+        tail[0] = types.Content(role="user", parts=[ledger, *(tail[0].parts or [])])
+    else:
+        tail.insert(0, types.Content(role="user", parts=[ledger]))
+    llm_request.contents = tail
+    return None
@@ -1,10 +1,14 @@
 """Database models and utilities for the mataconnect data agent."""
 
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
+    text,
     Column,
     Integer,
     String,
@@ -12,6 +16,9 @@ from sqlalchemy import (
     Text,
     Boolean,
     JSON,
+    ForeignKey,
+    Index,
+    func,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
@@ -20,9 +27,85 @@ from pydantic import BaseModel
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mataconnect_data.db")
 
+# Connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite connection settings, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def _create_engine(url: str):
+    """Create the engine with a sized pool and, for SQLite, per-connection pragmas."""
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    in_memory = url in ("sqlite://", "sqlite:///:memory:")
+    pool_args = (
+        {}
+        if in_memory
+        else {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    )
+    sqlite_engine = create_engine(
+        url,
+        echo=False,
+        # Pooled connections are used from worker threads, never concurrently
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **pool_args,
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself; pysqlite's implicit transactions
+        # break SAVEPOINT and defer BEGIN until the first write
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            # WAL lets readers run while a writer commits
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @event.listens_for(sqlite_engine, "begin")
+    def _begin_sqlite(connection):
+        # Writers take the write lock up front, so a busy database makes them
+        # wait for busy_timeout instead of failing when a read turns into a write
+        mode = connection.get_execution_options().get("sqlite_begin", "")
+        connection.exec_driver_sql(f"BEGIN {mode}".strip())
+
+    return sqlite_engine
+
+
 # Create engine and session
-engine = create_engine(DATABASE_URL, echo=False)
+engine = _create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Same pool; on SQLite its transactions start with BEGIN IMMEDIATE
+write_engine = engine.execution_options(sqlite_begin="IMMEDIATE")
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
 Base = declarative_base()
 
 
@@ -34,6 +117,8 @@ class CommunityDB(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     website = Column(String(500), nullable=False)
+    canonical_url = Column(String(500), nullable=True)  # Dedup key, see urls.py
+    registered_domain = Column(String(255), nullable=True, index=True)
     description = Column(Text, nullable=True)
     tags = Column(JSON, nullable=True)  # List of generic tags
     focus_areas = Column(Text, nullable=True)  # Rich description for LLM matching
@@ -51,11 +136,24 @@ class CommunityDB(Base):
     year_founded = Column(Integer, nullable=True)
     verified = Column(Boolean, default=False)
     embedding = Column(JSON, nullable=True)  # Vector embedding for search
+    embedding_hash = Column(String(64), nullable=True)  # Hash of embedded text and model
+    embedded_at = Column(DateTime, nullable=True, index=True)  # When last embedded
     data_source = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        # Conflict target for bulk upserts of enriched communities
+        Index("uq_communities_name_website", "name", "website", unique=True),
+        # Conflict target that deduplicates communities across URL variants
+        Index("uq_communities_canonical_url", "canonical_url", unique=True),
+        # Case-insensitive browse filters, see facets.py
+        Index("ix_communities_country_lower", func.lower(country)),
+        Index("ix_communities_city_lower", func.lower(city)),
+        Index("ix_communities_pricing_model_lower", func.lower(pricing_model)),
+    )
+
 
 class BasicCommunityDB(Base):
     """Simple database model for storing basic community data."""
@@ -64,10 +162,166 @@ class BasicCommunityDB(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
-    url = Column(String(500), nullable=True)
+    url = Column(String(500), nullable=True, index=True)
+    canonical_url = Column(String(500), nullable=True)  # Dedup key, see urls.py
+    registered_domain = Column(String(255), nullable=True, index=True)
     source = Column(String(100), nullable=False)
     created_at = Column(DateTime, default=datetime.now())
 
+    __table_args__ = (
+        Index("uq_basic_communities_canonical_url", "canonical_url", unique=True),
+    )
+
+
+# Enrichment work queue states
+ENRICHMENT_PENDING = "pending"
+ENRICHMENT_IN_PROGRESS = "in_progress"
+ENRICHMENT_DONE = "done"
+ENRICHMENT_FAILED = "failed"
+
+
+class EnrichmentTaskDB(Base):
+    """Database model tracking the enrichment state of a basic community."""
+
+    __tablename__ = "enrichment_tasks"
+
+    basic_community_id = Column(
+        Integer,
+        ForeignKey("basic_communities.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    status = Column(String(20), nullable=False, default=ENRICHMENT_PENDING)
+    lease_owner = Column(String(100), nullable=True)  # Runner holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    community_id = Column(Integer, nullable=True)  # CommunityDB row once done
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_enrichment_tasks_status_id", "status", "basic_community_id"),
+    )
+
+
+class CommunityFacetDB(Base):
+    """Database model for one value of a community's list field (tag, topic or event type)."""
+
+    __tablename__ = "community_facets"
+
+    community_id = Column(
+        Integer, ForeignKey("communities.id", ondelete="CASCADE"), primary_key=True
+    )
+    facet = Column(String(50), primary_key=True)  # tags, topics_supported or event_types
+    value = Column(String(255), primary_key=True)  # Normalized, see facets.py
+
+    __table_args__ = (
+        # Covers filtering by value and counting values over a set of communities
+        Index("ix_community_facets_facet_value", "facet", "value", "community_id"),
+    )
+
+
+# Community change log operations
+CHANGE_UPSERT = "upsert"
+CHANGE_DEACTIVATE = "deactivate"
+CHANGE_DELETE = "delete"
+
+
+class CommunityChangeDB(Base):
+    """Database model for one entry of the community change log, see changes.py."""
+
+    __tablename__ = "community_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    # No foreign key: entries for deleted communities must outlive them
+    community_id = Column(Integer, nullable=False)
+    op = Column(String(20), nullable=False)  # upsert, deactivate or delete
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Finds superseded entries when the log is compacted
+        Index("ix_community_changes_community_seq", "community_id", "seq"),
+        # Never reuse the sequence numbers of compacted entries
+        {"sqlite_autoincrement": True},
+    )
+
+
+class EnrichmentCacheDB(Base):
+    """Database model caching validated enrichment results by content and prompt."""
+
+    __tablename__ = "enrichment_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 of the three parts below
+    canonical_url = Column(String(500), nullable=False, index=True)
+    content_hash = Column(String(64), nullable=False)
+    prompt_hash = Column(String(64), nullable=False, index=True)
+    result = Column(JSON, nullable=False)  # EnrichedCommunity fields
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SearchCacheDB(Base):
+    """Database model caching the communities found for a search query."""
+
+    __tablename__ = "search_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 of query and prompt hash
+    query = Column(String(500), nullable=False, index=True)  # Normalized query
+    prompt_hash = Column(String(64), nullable=False, index=True)
+    results = Column(JSON, nullable=False)  # Validated community records
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Pipeline stages and item states, see pipeline.py
+PIPELINE_COLLECT = "collect"
+PIPELINE_ENRICH = "enrich"
+PIPELINE_PENDING = "pending"
+PIPELINE_COLLECTED = "collected"
+PIPELINE_ENRICHED = "enriched"
+PIPELINE_SAVED = "saved"
+PIPELINE_FAILED = "failed"
+PIPELINE_SKIPPED = "skipped"
+
+
+class PipelineRunDB(Base):
+    """Database model for a resumable collect, enrich and save pipeline run."""
+
+    __tablename__ = "pipeline_runs"
+
+    run_id = Column(String(64), primary_key=True)
+    queries = Column(JSON, nullable=False)  # Search queries for the collect stage
+    source = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default="running")
+    stats = Column(JSON, nullable=True)  # Summary of the last finished attempt
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PipelineItemDB(Base):
+    """Database model checkpointing one item of a pipeline stage and its output."""
+
+    __tablename__ = "pipeline_items"
+
+    run_id = Column(
+        String(64),
+        ForeignKey("pipeline_runs.run_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    stage = Column(String(20), primary_key=True)
+    item_key = Column(String(64), primary_key=True)  # Query index or basic community id
+    status = Column(String(20), nullable=False, default=PIPELINE_PENDING)
+    output = Column(JSON, nullable=True)  # Stage output, kept until the run is deleted
+    error = Column(Text, nullable=True)
+    community_id = Column(Integer, nullable=True)  # CommunityDB row once saved
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_pipeline_items_run_stage_status", "run_id", "stage", "status"),
+    )
+
 
 class CommunityInfo(BaseModel):
     """Pydantic model for community information and URL."""
@@ -102,8 +356,29 @@ class EnrichedCommunity(BaseModel):
     data_source: Optional[str] = None
 
 
+@contextmanager
+def session_scope(write: bool = True) -> Iterator[Session]:
+    """
+    Provide a session for one unit of work.
+
+    Commits when the block completes, rolls back if it raises and always
+    closes the session, returning its connection to the pool. Pass
+    `write=False` for read-only work: on SQLite in WAL mode it then reads a
+    snapshot without waiting for writers.
+    """
+    db = WriteSessionLocal() if write else SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def get_db() -> Session:
-    """Get database session."""
+    """Get database session (generator form for dependency injection)."""
     db = SessionLocal()
     try:
         yield db
@@ -111,6 +386,110 @@ def get_db() -> Session:
         db.close()
 
 
+def _dedupe_communities_by_name_website(connection):
+    """Keep only the newest community per (name, website) pair."""
+    connection.execute(
+        text(
+            """
+            UPDATE enrichment_tasks
+            SET community_id = (
+                SELECT MAX(keep.id) FROM communities AS dup
+                JOIN communities AS keep
+                  ON keep.name = dup.name AND keep.website = dup.website
+                WHERE dup.id = enrichment_tasks.community_id
+            )
+            WHERE community_id IS NOT NULL
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            DELETE FROM communities
+            WHERE EXISTS (
+                SELECT 1 FROM communities AS newer
+                WHERE newer.name = communities.name
+                  AND newer.website = communities.website
+                  AND newer.id > communities.id
+            )
+            """
+        )
+    )
+
+
+def _add_missing_columns(connection):
+    """Add model columns missing from existing tables (nullable columns only)."""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                )
+
+
+def _index_names(connection, table_name):
+    """Names of the indexes on a table, including expression indexes."""
+    if connection.dialect.name == "sqlite":
+        # The inspector skips expression indexes on SQLite
+        return set(
+            connection.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {"table": table_name},
+            ).scalars()
+        )
+    return {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+
+def upgrade_schema():
+    """Bring an existing database up to date with the current models."""
+    # Imported here to avoid a circular import with the backfill helpers
+    from .changes import backfill_changes
+    from .deduplication import backfill_canonical_urls
+    from .facets import backfill_facets
+    from .fulltext import ensure_fulltext_index
+
+    with write_engine.begin() as connection:
+        _add_missing_columns(connection)
+
+        if "uq_communities_name_website" not in _index_names(
+            connection, CommunityDB.__tablename__
+        ):
+            _dedupe_communities_by_name_website(connection)
+
+        # Seeds an empty change log, so merges below are logged on top of it
+        backfill_changes(connection)
+
+        # Merges duplicates, so it must run before the unique indexes exist
+        backfill_canonical_urls(connection)
+
+        # create_all only creates indexes together with new tables
+        for table in Base.metadata.sorted_tables:
+            existing = _index_names(connection, table.name)
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=connection)
+
+        # Keyword search index and its sync triggers (SQLite only)
+        ensure_fulltext_index(connection)
+
+        # Decodes double-encoded JSON lists before facets are built from them
+        backfill_facets(connection)
+
+
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+    # Imported here to avoid a circular import with the queue helpers
+    from .enrichment_queue import sync_enrichment_queue
+
+    with session_scope() as db:
+        queued = sync_enrichment_queue(db)
+    if queued:
+        print(f"Queued {queued} existing communities for enrichment")
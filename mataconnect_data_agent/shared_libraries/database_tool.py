@@ -1,228 +1,518 @@
 """Database tool for Google ADK agents to save community data."""
 
-import json
+import os
 from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Dict, Any, Optional
-from .database import CommunityDB, BasicCommunityDB, get_db
+from typing import List, Dict, Any, Optional, Tuple
+from .database import CommunityDB, BasicCommunityDB, session_scope
+from .changes import change_op, record_changes
+from .enrichment_queue import (
+    ENRICHMENT_BATCH_SIZE,
+    claim_enrichment_batch,
+    complete_enrichment,
+    enqueue_basic_communities,
+    fail_enrichment,
+)
+from .facets import JSON_COLUMNS, decode_json_value, replace_community_facets
+from .handles import (
+    BASIC_HANDLE,
+    COMMUNITY_HANDLE,
+    decode_cursor,
+    encode_cursor,
+    make_handle,
+    parse_handle,
+)
+from .urls import canonicalize_url, registered_domain
+from .write_queue import run_write
 
+# Rows per INSERT ... ON CONFLICT statement when saving enriched communities
+ENRICHED_UPSERT_CHUNK_SIZE = int(os.getenv("ENRICHED_UPSERT_CHUNK_SIZE", "500"))
+# Upper bound on communities claimed per get_communities_to_enrich call
+ENRICH_CLAIM_MAX = int(os.getenv("ENRICH_CLAIM_MAX", "50"))
 
-def save_community_info_to_db(
-    community_data: dict, source: str = "google_scraper"
-) -> List[Dict[str, Any]]:
+
+def insert_basic_communities(db, communities: list, source: str) -> Dict[str, Any]:
     """
-    Save a list of community information and URLs to the basic database.
+    Insert new basic communities and queue them for enrichment, without committing.
+
+    `communities` are dicts with a name and optional url; ones already stored
+    or repeated within the list are skipped as duplicates.
     """
+    candidates = []
+    for community_info in communities:
+        name = (community_info.get("name") or "").strip()
+        url = (community_info.get("url") or "").strip()
+        candidates.append(
+            {
+                "name": name,
+                "url": url if url else None,
+                "canonical_url": canonicalize_url(url),
+                "registered_domain": registered_domain(url),
+            }
+        )
+
+    # Look up known URLs and URL-less names with the indexed columns
+    urls = {
+        candidate["canonical_url"] for candidate in candidates if candidate["url"]
+    }
+    names = {candidate["name"] for candidate in candidates if not candidate["url"]}
+    known_urls = set()
+    if urls:
+        known_urls = set(
+            db.scalars(
+                select(BasicCommunityDB.canonical_url).where(
+                    BasicCommunityDB.canonical_url.in_(urls)
+                )
+            )
+        )
+    known_names = set()
+    if names:
+        known_names = set(
+            db.scalars(
+                select(BasicCommunityDB.name).where(
+                    BasicCommunityDB.name.in_(names), BasicCommunityDB.url.is_(None)
+                )
+            )
+        )
+
+    new_rows = []
+    for candidate in candidates:
+        if candidate["url"]:
+            if candidate["canonical_url"] in known_urls:
+                continue
+            known_urls.add(candidate["canonical_url"])
+        else:
+            if candidate["name"] in known_names:
+                continue
+            known_names.add(candidate["name"])
+        new_rows.append(
+            {**candidate, "source": source, "created_at": datetime.now()}
+        )
 
-    db = next(get_db())
     db_communities = []
-    communities = community_data.get("communities", [])
+    if new_rows:
+        # A Core INSERT ... RETURNING batches all rows into a few statements;
+        # the ORM form, and sorting by parameter order, insert row by row on SQLite
+        table = BasicCommunityDB.__table__
+        db_communities = sorted(
+            db.execute(insert(table).returning(*table.c), new_rows).all(),
+            key=lambda row: row.id,
+        )
 
-    try:
-        for i, community_info in enumerate(communities):
-            name = community_info.get("name", "").strip()
-            url = community_info.get("url", "")
-
-            db_community = BasicCommunityDB(
-                name=name,
-                url=url if url else None,
-                source=source,
-                created_at=datetime.now(),
-            )
+    # Queue communities with a URL for enrichment in the same transaction
+    enqueue_basic_communities(
+        db, [db_community.id for db_community in db_communities if db_community.url]
+    )
 
-            db.add(db_community)
-            db_communities.append(db_community)
-            print(f"Added community: {name}")
+    # Convert to serializable format
+    result = []
+    for db_community in db_communities:
+        result.append(
+            {
+                "id": db_community.id,
+                "name": db_community.name,
+                "url": db_community.url,
+                "source": db_community.source,
+                "created_at": db_community.created_at.isoformat()
+                if db_community.created_at
+                else None,
+            }
+        )
 
-        # Commit all changes
-        db.commit()
-        print(f"Successfully saved {len(db_communities)} communities to database")
+    return {
+        "communities": result,
+        "inserted": len(db_communities),
+        "duplicates": len(candidates) - len(db_communities),
+    }
 
-        # Refresh all communities to get their IDs
-        for db_community in db_communities:
-            db.refresh(db_community)
 
-        # Convert to serializable format
-        result = []
-        for db_community in db_communities:
-            result.append(
-                {
-                    "id": db_community.id,
-                    "name": db_community.name,
-                    "url": db_community.url,
-                    "source": db_community.source,
-                    "created_at": db_community.created_at.isoformat()
-                    if db_community.created_at
-                    else None,
-                }
-            )
+def save_community_info_to_db(
+    community_data: dict, source: str = "google_scraper"
+) -> Dict[str, Any]:
+    """
+    Save a list of community information and URLs to the basic database.
 
-        return result
+    Communities whose canonical URL is already stored (or, without a URL,
+    whose name is already stored without one) are skipped. New rows are written with one
+    multi-row INSERT ... RETURNING, group-committed with concurrent saves by
+    the background writer. Returns how many records were inserted and how
+    many were duplicates; the new communities are claimed for enrichment
+    with get_communities_to_enrich.
+    """
+    communities = community_data.get("communities", [])
 
+    try:
+        saved = run_write(insert_basic_communities, communities, source)
     except SQLAlchemyError as e:
-        db.rollback()
         print(f"Database error: {str(e)}")
         raise Exception(f"Failed to save communities: {str(e)}")
     except Exception as e:
-        db.rollback()
         print(f"Unexpected error: {str(e)}")
         raise Exception(
             f"Failed to save communities: {str(e)}, community_data: {communities}, type: {type(communities)}"
         )
 
+    print(
+        f"Successfully saved {saved['inserted']} communities to database, "
+        f"skipped {saved['duplicates']} duplicates"
+    )
+    return {"inserted": saved["inserted"], "duplicates": saved["duplicates"]}
 
-def get_communities_to_enrich(limit: Optional[int] = None) -> List[Dict[str, Any]]:
-    """
-    Fetch communities from the database that have URLs and need enrichment.
-    """
-    db = next(get_db())
 
-    try:
-        # Query communities that have URLs
-        query = db.query(BasicCommunityDB).filter(
-            BasicCommunityDB.url.isnot(None), BasicCommunityDB.url != ""
-        )
-
-        if limit:
-            query = query.limit(limit)
+def get_communities_to_enrich(
+    limit: Optional[int] = None, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Claim a batch of communities that have URLs and still need enrichment.
 
-        communities = query.all()
+    Communities that are already enriched or leased by another runner are
+    skipped. Each claimed community is returned as its handle, name and url;
+    pass the handle as `basic_community_id` when saving or failing it. Pass
+    the returned `next_cursor` as `cursor` to claim the next batch; it is
+    null once the queue has no more claimable communities.
+    """
+    with session_scope() as db:
+        try:
+            batch_size = max(1, min(limit or ENRICHMENT_BATCH_SIZE, ENRICH_CLAIM_MAX))
+            after_id = decode_cursor(cursor).get("after")
+            communities = claim_enrichment_batch(db, limit=batch_size, after_id=after_id)
+            db.commit()
 
-        # Convert to serializable format
-        result = []
-        for community in communities:
-            result.append(
+            result = [
                 {
-                    "id": community.id,
+                    "handle": make_handle(BASIC_HANDLE, community.id),
                     "name": community.name,
                     "url": community.url,
-                    "source": community.source,
-                    "created_at": community.created_at.isoformat()
-                    if community.created_at
-                    else None,
                 }
-            )
+                for community in communities
+            ]
 
-        print(f"Found {len(result)} communities to enrich")
-        return result
+            print(f"Found {len(result)} communities to enrich")
+            return {
+                "communities": result,
+                "next_cursor": encode_cursor(after=communities[-1].id)
+                if len(result) == batch_size
+                else None,
+            }
 
-    except SQLAlchemyError as e:
-        print(f"Database error: {str(e)}")
-        raise Exception(f"Failed to fetch communities: {str(e)}")
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        raise Exception(f"Failed to fetch communities: {str(e)}")
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Database error: {str(e)}")
+            raise Exception(f"Failed to fetch communities: {str(e)}")
+        except Exception as e:
+            db.rollback()
+            print(f"Unexpected error: {str(e)}")
+            raise Exception(f"Failed to fetch communities: {str(e)}")
 
 
-def save_enriched_community_to_db(enriched_data: dict) -> Dict[str, Any]:
+def mark_enrichment_failed(basic_community_id: str, error: str) -> Dict[str, Any]:
     """
-    Save enriched community data to the database.
+    Record that enriching a community failed so it can be retried later.
+
+    `basic_community_id` is the handle returned by get_communities_to_enrich.
     """
+    with session_scope() as db:
+        try:
+            id = parse_handle(basic_community_id, BASIC_HANDLE)
+            updated = fail_enrichment(db, id, error)
+            db.commit()
+            print(f"Marked community {basic_community_id} as failed: {error}")
+            return {"handle": make_handle(BASIC_HANDLE, id), "updated": bool(updated)}
 
-    db = next(get_db())
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Database error: {str(e)}")
+            raise Exception(f"Failed to mark enrichment as failed: {str(e)}")
+        except ValueError as e:
+            raise Exception(f"Failed to mark enrichment as failed: {str(e)}")
 
-    try:
-        # Map 'url' to 'website' if present, since CommunityDB expects 'website'
-        if "url" in enriched_data and "website" not in enriched_data:
-            enriched_data["website"] = enriched_data.pop("url")
-
-        # Map 'source' to 'data_source' if present, since CommunityDB expects 'data_source'
-        if "source" in enriched_data and "data_source" not in enriched_data:
-            enriched_data["data_source"] = enriched_data.pop("source")
-
-        # Prepare data for database insertion with proper JSON serialization
-        db_data = {}
-        for key, value in enriched_data.items():
-            if key in [
-                "tags",
-                "social_links",
-                "community_info",
-                "topics_supported",
-                "event_types",
-                "embedding",
-            ]:
-                # Serialize JSON fields properly
-                if value is not None:
-                    if isinstance(value, (list, dict)):
-                        db_data[key] = json.dumps(value)
-                    else:
-                        db_data[key] = value
-                else:
-                    db_data[key] = None
-            elif key == "focus_areas":
-                # Handle focus_areas specially - it's a Text column but receives list data
-                if value is not None:
-                    if isinstance(value, list):
-                        db_data[key] = ", ".join(value)
-                    else:
-                        db_data[key] = str(value)
+
+def _prepare_enriched_data(enriched_data: dict) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    Map enriched agent output onto CommunityDB columns.
+
+    Returns the column values and the queue task id the enrichment completes.
+    Works on a copy, so a write that is retried maps the caller's data again.
+    """
+    enriched_data = dict(enriched_data)
+
+    # Map 'url' to 'website' if present, since CommunityDB expects 'website'
+    if "url" in enriched_data and "website" not in enriched_data:
+        enriched_data["website"] = enriched_data.pop("url")
+
+    # Map 'source' to 'data_source' if present, since CommunityDB expects 'data_source'
+    if "source" in enriched_data and "data_source" not in enriched_data:
+        enriched_data["data_source"] = enriched_data.pop("source")
+
+    # The queue task this enrichment completes is not a CommunityDB column
+    basic_community_id = enriched_data.pop("basic_community_id", None)
+    if basic_community_id is not None:
+        basic_community_id = parse_handle(basic_community_id, BASIC_HANDLE)
+
+    # Deduplication keys are always derived from the website
+    enriched_data["canonical_url"] = canonicalize_url(enriched_data.get("website"))
+    enriched_data["registered_domain"] = registered_domain(enriched_data.get("website"))
+
+    # JSON columns take lists and dicts as they are; decode values sent as JSON text
+    db_data = {}
+    for key, value in enriched_data.items():
+        if key in JSON_COLUMNS:
+            db_data[key] = decode_json_value(value)
+        elif key == "focus_areas":
+            # Handle focus_areas specially - it's a Text column but receives list data
+            if value is not None:
+                if isinstance(value, list):
+                    db_data[key] = ", ".join(value)
                 else:
-                    db_data[key] = None
+                    db_data[key] = str(value)
             else:
-                db_data[key] = value
-
-        # Check if community already exists
-        existing = (
-            db.query(CommunityDB)
-            .filter(
-                CommunityDB.name == db_data.get("name"),
-                CommunityDB.website == db_data.get("website"),
-            )
-            .first()
-        )
-
-        if existing:
-            print(f"Community {db_data.get('name')} already exists, updating...")
-            # Update existing record
-            for key, value in db_data.items():
-                if key not in ["name", "website"]:  # Don't update primary identifiers
-                    setattr(existing, key, value)
-            existing.updated_at = datetime.utcnow()
-            community_db = existing
+                db_data[key] = None
         else:
-            # Create new record
-            community_db = CommunityDB(**db_data)
-            community_db.created_at = datetime.utcnow()
-            db.add(community_db)
+            db_data[key] = value
 
-        db.commit()
-        print(f"Successfully saved enriched community: {db_data.get('name')}")
+    return db_data, basic_community_id
 
-        # Return the saved data
-        return {
-            "id": community_db.id,
-            "name": community_db.name,
-            "website": community_db.website,
-            "description": community_db.description,
-            "tags": community_db.tags,
-            "focus_areas": community_db.focus_areas,
-            "country": community_db.country,
-            "city": community_db.city,
-            "language": community_db.language,
-            "contact_email": community_db.contact_email,
-            "is_virtual": community_db.is_virtual,
-            "social_links": community_db.social_links,
-            "community_info": community_db.community_info,
-            "pricing_model": community_db.pricing_model,
-            "topics_supported": community_db.topics_supported,
-            "audience_type": community_db.audience_type,
-            "event_types": community_db.event_types,
-            "year_founded": community_db.year_founded,
-            "verified": community_db.verified,
-            "data_source": community_db.data_source,
-            "created_at": community_db.created_at.isoformat()
-            if community_db.created_at
-            else None,
-            "updated_at": community_db.updated_at.isoformat()
-            if community_db.updated_at
-            else None,
-        }
 
+def _save_enriched_community(db, enriched_data: dict) -> Dict[str, Any]:
+    """Insert or update one enriched community and complete its queue task, without committing."""
+    db_data, basic_community_id = _prepare_enriched_data(enriched_data)
+
+    # Check if community already exists
+    existing = (
+        db.query(CommunityDB)
+        .filter(CommunityDB.canonical_url == db_data.get("canonical_url"))
+        .first()
+    )
+
+    if existing:
+        print(f"Community {db_data.get('name')} already exists, updating...")
+        # Update existing record
+        for key, value in db_data.items():
+            # Don't update primary identifiers
+            if key not in ["name", "website", "canonical_url"]:
+                setattr(existing, key, value)
+        existing.updated_at = datetime.utcnow()
+        community_db = existing
+    else:
+        # Create new record
+        community_db = CommunityDB(**db_data)
+        community_db.created_at = datetime.utcnow()
+        db.add(community_db)
+
+    db.flush()
+    replace_community_facets(db.connection(), {community_db.id: db_data})
+    record_changes(db.connection(), [community_db.id], change_op(db_data))
+    complete_enrichment(
+        db,
+        community_db.id,
+        basic_community_id=basic_community_id,
+        website=community_db.website,
+    )
+
+    return {
+        "handle": make_handle(COMMUNITY_HANDLE, community_db.id),
+        "name": community_db.name,
+        "status": "updated" if existing else "inserted",
+    }
+
+
+def save_enriched_community_to_db(enriched_data: dict) -> Dict[str, Any]:
+    """
+    Save enriched community data to the database.
+
+    The write is group-committed with concurrent saves by the background
+    writer. Returns the saved community's handle, name and whether it was
+    inserted or updated; get_community_details returns the full record.
+    """
+    try:
+        saved = run_write(_save_enriched_community, enriched_data)
     except SQLAlchemyError as e:
-        db.rollback()
         print(f"Database error: {str(e)}")
         raise Exception(f"Failed to save enriched community: {str(e)} {enriched_data}")
     except Exception as e:
-        db.rollback()
         print(f"Unexpected error: {str(e)}")
         raise Exception(f"Failed to save enriched community: {str(e)} {enriched_data}")
+
+    print(f"Successfully saved enriched community: {saved['name']}")
+    return saved
+
+
+def _upsert_insert(db):
+    """Return the dialect-specific INSERT construct that supports ON CONFLICT."""
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert
+    if dialect == "postgresql":
+        return postgresql_insert
+    raise Exception(f"Bulk upsert is not supported for the {dialect} dialect")
+
+
+def _upsert_enriched_rows(db, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Upsert rows that share the same columns with one INSERT ... ON CONFLICT.
+
+    Returns the community id for each canonical URL. Does not commit.
+    """
+    insert = _upsert_insert(db)
+    stmt = insert(CommunityDB).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CommunityDB.canonical_url],
+        set_={
+            **{
+                key: stmt.excluded[key]
+                for key in rows[0]
+                # Don't update primary identifiers
+                if key not in ["name", "website", "canonical_url"]
+            },
+            "updated_at": datetime.utcnow(),
+        },
+    ).returning(CommunityDB.id, CommunityDB.canonical_url)
+
+    return {canonical_url: id for id, canonical_url in db.execute(stmt)}
+
+
+def save_enriched_communities_to_db(
+    enriched_communities: List[dict],
+) -> Dict[str, Any]:
+    """
+    Save a batch of enriched communities to the database.
+
+    Each chunk is written with one INSERT ... ON CONFLICT DO UPDATE on the
+    unique canonical URL and committed in one transaction. Records with
+    the same canonical URL are saved as one community, later fields
+    winning; all but the first of them are reported as merged into it.
+    Returns the inserted, updated, merged and failed counts, the saved
+    community's handle for every input record in order (null where it
+    failed), the index of each merged record with the index it was merged
+    into, and the index and error of each failed record.
+    """
+
+    with session_scope() as db:
+        results: List[Dict[str, Any]] = [
+            {"index": index, "status": "failed"}
+            for index in range(len(enriched_communities))
+        ]
+
+        # Validate and map every record before touching the database
+        prepared = []
+        columns = set(CommunityDB.__table__.columns.keys())
+        for index, enriched_data in enumerate(enriched_communities):
+            try:
+                db_data, basic_community_id = _prepare_enriched_data(enriched_data)
+                unknown = set(db_data) - columns
+                if unknown:
+                    raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+                if not db_data.get("name") or not db_data.get("website"):
+                    raise ValueError("name and website are required")
+                prepared.append((index, db_data, basic_community_id))
+            except Exception as e:
+                results[index]["error"] = str(e)
+
+        for start in range(0, len(prepared), ENRICHED_UPSERT_CHUNK_SIZE):
+            chunk = prepared[start : start + ENRICHED_UPSERT_CHUNK_SIZE]
+            try:
+                _save_enriched_chunk(db, chunk, results)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                print(f"Database error in chunk, retrying rows one by one: {str(e)}")
+                # Isolate the rows that make the chunk fail
+                for row in chunk:
+                    try:
+                        _save_enriched_chunk(db, [row], results)
+                        db.commit()
+                    except SQLAlchemyError as row_error:
+                        db.rollback()
+                        results[row[0]].update(status="failed", error=str(row_error))
+
+        # Records that collapsed into one community are reported as merged
+        # into the first of them, not as updates of it
+        first_index: Dict[int, int] = {}
+        for result in results:
+            if result["status"] == "failed":
+                continue
+            first = first_index.setdefault(result["id"], result["index"])
+            if first != result["index"]:
+                result.update(status="merged", merged_into=first)
+
+        counts = {"inserted": 0, "updated": 0, "merged": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        print(
+            f"Saved enriched communities: {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['merged']} merged, {counts['failed']} failed"
+        )
+        return {
+            **counts,
+            "handles": [
+                make_handle(COMMUNITY_HANDLE, result["id"])
+                if result["status"] != "failed"
+                else None
+                for result in results
+            ],
+            "merges": [
+                {"index": result["index"], "merged_into": result["merged_into"]}
+                for result in results
+                if result["status"] == "merged"
+            ],
+            "failures": [
+                {"index": result["index"], "error": result.get("error", "")}
+                for result in results
+                if result["status"] == "failed"
+            ],
+        }
+
+
+def _save_enriched_chunk(db, chunk: list, results: List[Dict[str, Any]]) -> None:
+    """Upsert one chunk of prepared rows and record per-row results. Does not commit."""
+    # Later records for the same key win, as they would with one call per
+    # record, except for the identifiers an update never changes
+    rows_by_key: Dict[str, Dict[str, Any]] = {}
+    for _, db_data, _ in chunk:
+        key = db_data["canonical_url"]
+        first = rows_by_key.get(key)
+        rows_by_key[key] = {**(first or {}), **db_data}
+        if first:
+            rows_by_key[key].update(name=first["name"], website=first["website"])
+
+    existing_keys = set(
+        db.scalars(
+            select(CommunityDB.canonical_url).where(
+                CommunityDB.canonical_url.in_(list(rows_by_key))
+            )
+        )
+    )
+
+    # Rows in one multi-row INSERT must share the same columns
+    rows_by_columns: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for row in rows_by_key.values():
+        rows_by_columns.setdefault(frozenset(row), []).append(row)
+
+    ids: Dict[str, int] = {}
+    for rows in rows_by_columns.values():
+        ids.update(_upsert_enriched_rows(db, rows))
+    replace_community_facets(
+        db.connection(), {ids[key]: row for key, row in rows_by_key.items()}
+    )
+    changed: Dict[str, List[int]] = {}
+    for key, row in rows_by_key.items():
+        changed.setdefault(change_op(row), []).append(ids[key])
+    for op, community_ids in changed.items():
+        record_changes(db.connection(), community_ids, op)
+
+    for index, db_data, basic_community_id in chunk:
+        key = db_data["canonical_url"]
+        complete_enrichment(
+            db,
+            ids[key],
+            basic_community_id=basic_community_id,
+            website=db_data["website"],
+        )
+        results[index].update(
+            id=ids[key],
+            status="updated" if key in existing_keys else "inserted",
+        )
+        existing_keys.add(key)
@@ -0,0 +1,182 @@
+"""One-time backfill of canonical URLs and merging of duplicate communities."""
+
+from typing import Dict
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.engine import Connection
+
+from .changes import record_changes
+from .database import (
+    CHANGE_DELETE,
+    BasicCommunityDB,
+    CommunityDB,
+    CommunityFacetDB,
+    EnrichmentTaskDB,
+    ENRICHMENT_DONE,
+    ENRICHMENT_FAILED,
+    ENRICHMENT_IN_PROGRESS,
+    ENRICHMENT_PENDING,
+)
+from .facets import FACET_COLUMNS, replace_community_facets
+from .urls import canonicalize_url, registered_domain
+
+BACKFILL_CHUNK_SIZE = 1000
+
+# Which task to keep when duplicate basic communities are merged
+_TASK_PRIORITY = {
+    ENRICHMENT_DONE: 0,
+    ENRICHMENT_IN_PROGRESS: 1,
+    ENRICHMENT_PENDING: 2,
+    ENRICHMENT_FAILED: 3,
+}
+
+
+def _backfill_table(connection: Connection, table, url_column) -> int:
+    """Fill canonical_url and registered_domain where they are missing."""
+    filled = 0
+    last_id = 0
+    # Backfilling keys is not a content change, so keep updated_at as it is
+    preserved = {"updated_at": table.c.updated_at} if "updated_at" in table.c else {}
+    while True:
+        rows = connection.execute(
+            select(table.c.id, url_column)
+            .where(
+                table.c.id > last_id,
+                table.c.canonical_url.is_(None),
+                url_column.isnot(None),
+                url_column != "",
+            )
+            .order_by(table.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return filled
+
+        connection.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(
+                canonical_url=bindparam("canonical"),
+                registered_domain=bindparam("domain"),
+                **preserved,
+            ),
+            [
+                {
+                    "row_id": row_id,
+                    "canonical": canonicalize_url(url),
+                    "domain": registered_domain(url),
+                }
+                for row_id, url in rows
+            ],
+        )
+        filled += len(rows)
+        last_id = rows[-1][0]
+
+
+def _duplicate_canonical_urls(connection: Connection, table):
+    """Yield canonical URLs shared by more than one row."""
+    return connection.execute(
+        select(table.c.canonical_url)
+        .where(table.c.canonical_url.isnot(None))
+        .group_by(table.c.canonical_url)
+        .having(func.count() > 1)
+    ).scalars()
+
+
+def _merge_basic_communities(connection: Connection) -> int:
+    """Keep the oldest basic community per canonical URL and its best task."""
+    basic = BasicCommunityDB.__table__
+    tasks = EnrichmentTaskDB.__table__
+    removed = 0
+
+    for canonical_url in list(_duplicate_canonical_urls(connection, basic)):
+        ids = connection.execute(
+            select(basic.c.id).where(basic.c.canonical_url == canonical_url).order_by(basic.c.id)
+        ).scalars().all()
+        keep_id, duplicate_ids = ids[0], ids[1:]
+
+        group_tasks = connection.execute(
+            select(tasks).where(tasks.c.basic_community_id.in_(ids))
+        ).mappings().all()
+        if group_tasks:
+            best = dict(
+                min(group_tasks, key=lambda task: _TASK_PRIORITY.get(task["status"], 99))
+            )
+            best["basic_community_id"] = keep_id
+            connection.execute(delete(tasks).where(tasks.c.basic_community_id.in_(ids)))
+            connection.execute(insert(tasks).values(best))
+
+        connection.execute(delete(basic).where(basic.c.id.in_(duplicate_ids)))
+        removed += len(duplicate_ids)
+
+    return removed
+
+
+def _merge_communities(connection: Connection) -> int:
+    """Keep the newest community per canonical URL, filling its gaps from the others."""
+    communities = CommunityDB.__table__
+    tasks = EnrichmentTaskDB.__table__
+    removed = 0
+
+    for canonical_url in list(_duplicate_canonical_urls(connection, communities)):
+        rows = connection.execute(
+            select(communities)
+            .where(communities.c.canonical_url == canonical_url)
+            .order_by(communities.c.updated_at.desc(), communities.c.id.desc())
+        ).mappings().all()
+        keep, duplicates = rows[0], rows[1:]
+        duplicate_ids = [row["id"] for row in duplicates]
+
+        filled = {}
+        for column in communities.columns.keys():
+            if keep[column] is None:
+                for row in duplicates:
+                    if row[column] is not None:
+                        filled[column] = row[column]
+                        break
+
+        connection.execute(
+            delete(CommunityFacetDB.__table__).where(
+                CommunityFacetDB.__table__.c.community_id.in_(duplicate_ids)
+            )
+        )
+        connection.execute(delete(communities).where(communities.c.id.in_(duplicate_ids)))
+        record_changes(connection, duplicate_ids, CHANGE_DELETE)
+        if filled:
+            connection.execute(
+                update(communities).where(communities.c.id == keep["id"]).values(filled)
+            )
+            merged = {column: filled[column] for column in FACET_COLUMNS if column in filled}
+            replace_community_facets(connection, {keep["id"]: merged})
+            record_changes(connection, [keep["id"]])
+        connection.execute(
+            update(tasks)
+            .where(tasks.c.community_id.in_(duplicate_ids))
+            .values(community_id=keep["id"])
+        )
+        removed += len(duplicate_ids)
+
+    return removed
+
+
+def backfill_canonical_urls(connection: Connection) -> Dict[str, int]:
+    """
+    Canonicalize stored URLs and merge communities that share a canonical URL.
+
+    Safe to run repeatedly: only rows without a canonical URL are backfilled.
+    Runs inside the caller's transaction.
+    """
+    basic = BasicCommunityDB.__table__
+    communities = CommunityDB.__table__
+
+    stats = {
+        "basic_communities_backfilled": _backfill_table(connection, basic, basic.c.url),
+        "communities_backfilled": _backfill_table(
+            connection, communities, communities.c.website
+        ),
+        "basic_communities_merged": _merge_basic_communities(connection),
+        "communities_merged": _merge_communities(connection),
+    }
+    if any(stats.values()):
+        print(f"Canonical URL backfill: {stats}")
+    return stats
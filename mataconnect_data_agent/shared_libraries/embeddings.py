@@ -0,0 +1,349 @@
+"""Embedding pipeline for enriched communities.
+
+Each community is embedded from its name, focus areas, description and tags.
+A hash of that text and the embedder's model is stored next to the vector,
+and `embedded_at` records when it was embedded. Writing an embedding leaves
+updated_at alone, so it is no edit to the community; a run only reads rows
+updated since they were last embedded and only calls the embedder for those
+whose text actually changed:
+
+    python -m mataconnect_data_agent.shared_libraries.embeddings --embedder hashing
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import CommunityDB, session_scope
+from .vector_index import VECTOR_INDEX_DIR, VectorIndex, sync_vector_index
+
+# Embedding configuration
+EMBEDDER = os.getenv("EMBEDDER", "gemini")  # gemini or hashing
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "0")) or None  # Model default when unset
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", "256"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_SCAN_BATCH_SIZE = 1000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class Embedder(ABC):
+    """
+    Turns texts into fixed-size vectors.
+
+    Subclasses set `model`, a stable identifier that is part of each stored
+    embedding hash, and implement `embed`. `embed_query` embeds search text
+    and defaults to `embed`.
+    """
+
+    model: str = ""
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return one row per text, in order."""
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder for offline runs and tests.
+
+    Word unigrams and bigrams are hashed into `dim` signed buckets with
+    log-scaled counts. Texts sharing vocabulary get similar vectors, with
+    no model download or API call.
+    """
+
+    def __init__(self, dim: int = HASHING_EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def _bucket(self, token: str):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = TOKEN_PATTERN.findall(text.lower())
+            counts: Dict[str, int] = {}
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                bucket, sign = self._bucket(token)
+                vectors[row, bucket] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class GeminiEmbedder(Embedder):
+    """Embedder backed by the Gemini embedding API."""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dim: Optional[int] = EMBEDDING_DIM):
+        from google import genai
+
+        self.client = genai.Client()
+        self.dim = dim
+        self.model = f"{model}:{dim}" if dim else model
+        self._model_name = model
+
+    def _embed(self, texts: Sequence[str], task_type: str) -> np.ndarray:
+        from google.genai import types
+
+        response = self.client.models.embed_content(
+            model=self._model_name,
+            contents=list(texts),
+            config=types.EmbedContentConfig(
+                task_type=task_type, output_dimensionality=self.dim
+            ),
+        )
+        return np.asarray(
+            [embedding.values for embedding in response.embeddings], dtype=np.float32
+        )
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self._embed(texts, "RETRIEVAL_DOCUMENT")
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed([text], "RETRIEVAL_QUERY")[0]
+
+
+def get_embedder(name: str = EMBEDDER) -> Embedder:
+    """Return the configured embedder ('gemini' or 'hashing')."""
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "gemini":
+        return GeminiEmbedder()
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def _as_list(value) -> List[Any]:
+    """Decode list columns that may hold JSON-encoded strings."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+    return value if isinstance(value, list) else []
+
+
+def community_embedding_text(community) -> str:
+    """Text a community is embedded from."""
+    parts = [community.name or "", community.focus_areas or "", community.description or ""]
+    tags = [str(tag) for tag in _as_list(community.tags)]
+    if tags:
+        parts.append("Tags: " + ", ".join(tags))
+    return "\n".join(part for part in parts if part)
+
+
+def embedding_hash(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+def _write_embeddings(db, rows: List[Dict[str, Any]]) -> None:
+    """
+    Bulk UPDATE by primary key, one executemany per batch.
+
+    Each row carries the updated_at it was read with. updated_at itself is
+    never written, and a row updated since it was read is left for the next
+    run instead of being marked embedded.
+    """
+    if not rows:
+        return
+    table = CommunityDB.__table__
+    columns = [key for key in rows[0] if key not in ("id", "updated_at")]
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .where(table.c.updated_at.is_not_distinct_from(bindparam("read_updated_at")))
+        .values(
+            updated_at=table.c.updated_at,
+            **{column: bindparam(f"new_{column}") for column in columns},
+        )
+    )
+    db.connection().execute(
+        statement,
+        [
+            {
+                "row_id": row["id"],
+                "read_updated_at": row["updated_at"],
+                **{f"new_{column}": row[column] for column in columns},
+            }
+            for row in rows
+        ],
+    )
+
+
+def embed_communities(
+    embedder: Optional[Embedder] = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    limit: Optional[int] = None,
+    index_dir: Optional[str] = VECTOR_INDEX_DIR,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """
+    Embed communities whose embedding text changed since they were last embedded.
+
+    Rows never embedded, without an embedding, or updated after `embedded_at`
+    are scanned in id order. Rows whose text hash is unchanged only have
+    `embedded_at` caught up; the rest are embedded `batch_size` at a time
+    and written back with bulk updates, committed per batch. The vector
+    index in `index_dir` is then synced (rebuilt if the dimension changed).
+    With `full`, every row is rehashed, which is needed after switching the
+    embedder or model.
+    """
+    embedder = embedder or get_embedder()
+    started = time.perf_counter()
+    stats = {"scanned": 0, "embedded": 0, "unchanged": 0, "failed": 0}
+    dims = set()
+
+    try:
+        with session_scope() as db:
+            last_id = 0
+            pending: List[Dict[str, Any]] = []
+
+            def flush_pending() -> None:
+                texts = [item.pop("text") for item in pending]
+                # Don't hold the write lock while waiting for the embedder
+                db.commit()
+                try:
+                    vectors = embedder.embed(texts)
+                except Exception as e:
+                    print(f"Embedding batch of {len(texts)} failed: {str(e)}")
+                    stats["failed"] += len(texts)
+                    pending.clear()
+                    return
+                dims.add(vectors.shape[1])
+                now = datetime.utcnow()
+                for item, vector in zip(pending, vectors):
+                    item.update(embedding=[float(x) for x in vector], embedded_at=now)
+                _write_embeddings(db, pending)
+                db.commit()
+                stats["embedded"] += len(pending)
+                pending.clear()
+
+            while limit is None or stats["scanned"] < limit:
+                scan = EMBEDDING_SCAN_BATCH_SIZE
+                if limit is not None:
+                    scan = min(scan, limit - stats["scanned"])
+                query = (
+                    select(
+                        CommunityDB.id,
+                        CommunityDB.name,
+                        CommunityDB.focus_areas,
+                        CommunityDB.description,
+                        CommunityDB.tags,
+                        CommunityDB.embedding_hash,
+                        CommunityDB.updated_at,
+                        CommunityDB.embedding.is_(None).label("missing"),
+                    )
+                    .where(CommunityDB.id > last_id)
+                    .order_by(CommunityDB.id)
+                    .limit(scan)
+                )
+                if not full:
+                    query = query.where(
+                        or_(
+                            CommunityDB.embedding_hash.is_(None),
+                            CommunityDB.embedded_at.is_(None),
+                            CommunityDB.embedding.is_(None),
+                            CommunityDB.updated_at > CommunityDB.embedded_at,
+                        )
+                    )
+                communities = db.execute(query).all()
+                if not communities:
+                    break
+                last_id = communities[-1].id
+                stats["scanned"] += len(communities)
+
+                caught_up = []
+                for community in communities:
+                    text = community_embedding_text(community)
+                    text_hash = embedding_hash(text, embedder.model)
+                    if text_hash == community.embedding_hash and not community.missing:
+                        # Changed columns are not embedded
+                        caught_up.append(
+                            {
+                                "id": community.id,
+                                "embedded_at": community.updated_at,
+                                "updated_at": community.updated_at,
+                            }
+                        )
+                        continue
+                    pending.append(
+                        {
+                            "id": community.id,
+                            "embedding_hash": text_hash,
+                            "updated_at": community.updated_at,
+                            "text": text,
+                        }
+                    )
+                    if len(pending) >= batch_size:
+                        flush_pending()
+
+                _write_embeddings(db, caught_up)
+                db.commit()
+                stats["unchanged"] += len(caught_up)
+
+            if pending:
+                flush_pending()
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to embed communities: {str(e)}")
+
+    if index_dir and stats["embedded"]:
+        index = VectorIndex.open(index_dir)
+        if index is not None and dims - {index.dim}:
+            print(f"Embedding size changed from {index.dim} to {max(dims)}, rebuilding vector index")
+            shutil.rmtree(index_dir, ignore_errors=True)
+            index = None
+        index = sync_vector_index(index, directory=index_dir)
+        stats["indexed"] = len(index) if index is not None else 0
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    print(
+        f"Embedded {stats['embedded']} communities ({stats['unchanged']} unchanged, "
+        f"{stats['failed']} failed) in {stats['elapsed_seconds']}s"
+    )
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Embed changed communities and update the vector index")
+    parser.add_argument("--embedder", choices=["gemini", "hashing"], default=EMBEDDER)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="Communities to scan at most")
+    parser.add_argument("--full", action="store_true", help="Rehash every community, e.g. after changing model")
+    parser.add_argument("--no-index", action="store_true", help="Do not update the vector index")
+    args = parser.parse_args(argv)
+
+    stats = embed_communities(
+        get_embedder(args.embedder),
+        batch_size=args.batch_size,
+        limit=args.limit,
+        index_dir=None if args.no_index else VECTOR_INDEX_DIR,
+        full=args.full,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
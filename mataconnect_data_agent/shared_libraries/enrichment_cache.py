@@ -0,0 +1,247 @@
+"""Persistent cache of enrichment results keyed by page content and prompt.
+
+An entry is keyed by the community's canonical URL, a hash of the page
+content the model was given and a hash of the prompt and model that
+produced it. Unchanged sites enriched with an unchanged prompt are served
+from the cache without an LLM call; changing the prompt or model changes
+the prompt hash, so only results produced by the old prompt stop matching.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import EnrichedCommunity, EnrichmentCacheDB, session_scope
+
+# Cache configuration
+ENRICHMENT_CACHE_TTL_SECONDS = int(
+    os.getenv("ENRICHMENT_CACHE_TTL_SECONDS", str(30 * 24 * 3600))
+)
+ENRICHMENT_CACHE_MAX_ENTRIES = int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "100000"))
+ENRICHMENT_CACHE_MAX_BYTES = int(
+    os.getenv("ENRICHMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+EVICTION_BATCH_SIZE = 1000
+# Cache hits recorded in memory before their hit counts are written
+CACHE_USAGE_BATCH_SIZE = 100
+
+
+def content_hash(content: Any) -> str:
+    """Hash page content (a string or JSON-serializable value)."""
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def prompt_hash(instruction: str, model: str, *extra: str) -> str:
+    """Hash everything about the request that is not page content."""
+    return content_hash("\x1f".join([instruction, model, *extra]))
+
+
+class CacheUsage:
+    """
+    Batches the hit count and last use of cache entries.
+
+    Lookups read in a read-only session and only record their hits here;
+    the hits are written in one statement per batch, best effort, so cache
+    reads never wait for the database writer.
+    """
+
+    def __init__(self, table, batch_size: int = CACHE_USAGE_BATCH_SIZE):
+        self.table = table.__table__
+        self.batch_size = batch_size
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, used_at: datetime) -> None:
+        """Record a hit, writing the batch once it is full."""
+        with self._lock:
+            hits, _ = self._pending.get(key, (0, used_at))
+            self._pending[key] = (hits + 1, used_at)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the recorded hits; returns how many entries were updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        statement = (
+            update(self.table)
+            .where(self.table.c.cache_key == bindparam("key"))
+            .values(hits=self.table.c.hits + bindparam("new_hits"), last_used_at=bindparam("used_at"))
+        )
+        try:
+            with session_scope() as db:
+                db.connection().execute(
+                    statement,
+                    [
+                        {"key": key, "new_hits": hits, "used_at": used_at}
+                        for key, (hits, used_at) in pending.items()
+                    ],
+                )
+        except SQLAlchemyError as e:
+            print(f"Cache usage update failed: {str(e)}")
+            return 0
+        return len(pending)
+
+
+def _cache_key(canonical_url: str, page_hash: str, request_hash: str) -> str:
+    return content_hash("\x1f".join([canonical_url, page_hash, request_hash]))
+
+
+class EnrichmentCache:
+    """
+    Enrichment result cache stored in the enrichment_cache table.
+
+    Entries expire after `ttl_seconds`; beyond `max_entries` or `max_bytes`
+    the least recently used entries are evicted. Hit, miss, store and
+    eviction counters are kept per instance.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = ENRICHMENT_CACHE_TTL_SECONDS,
+        max_entries: int = ENRICHMENT_CACHE_MAX_ENTRIES,
+        max_bytes: int = ENRICHMENT_CACHE_MAX_BYTES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.usage = CacheUsage(EnrichmentCacheDB)
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def get(
+        self, canonical_url: str, page_hash: str, request_hash: str
+    ) -> Optional[EnrichedCommunity]:
+        """Return the cached result, or None when missing or expired."""
+        key = _cache_key(canonical_url, page_hash, request_hash)
+        now = datetime.utcnow()
+        try:
+            with session_scope(write=False) as db:
+                entry = db.get(EnrichmentCacheDB, key)
+                if entry is None or entry.created_at < now - timedelta(seconds=self.ttl_seconds):
+                    self._count("misses")
+                    return None
+                result = entry.result
+            self.usage.record(key, now)
+            self._count("hits")
+            return EnrichedCommunity.model_validate(result)
+        except SQLAlchemyError as e:
+            print(f"Enrichment cache read failed: {str(e)}")
+            self._count("misses")
+            return None
+
+    def put(
+        self,
+        canonical_url: str,
+        page_hash: str,
+        request_hash: str,
+        enriched: EnrichedCommunity,
+    ) -> None:
+        """Store a validated result, replacing any entry with the same key."""
+        result = enriched.model_dump()
+        now = datetime.utcnow()
+        try:
+            with session_scope() as db:
+                db.merge(
+                    EnrichmentCacheDB(
+                        cache_key=_cache_key(canonical_url, page_hash, request_hash),
+                        canonical_url=canonical_url,
+                        content_hash=page_hash,
+                        prompt_hash=request_hash,
+                        result=result,
+                        size_bytes=len(json.dumps(result, default=str)),
+                        hits=0,
+                        created_at=now,
+                        last_used_at=now,
+                    )
+                )
+            self._count("stores")
+        except SQLAlchemyError as e:
+            print(f"Enrichment cache write failed: {str(e)}")
+
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones over the limits."""
+        self.usage.flush()
+        evicted = 0
+        try:
+            with session_scope() as db:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+                evicted += db.execute(
+                    delete(EnrichmentCacheDB).where(EnrichmentCacheDB.created_at < cutoff)
+                ).rowcount or 0
+
+                while True:
+                    entries, size = db.execute(
+                        select(func.count(), func.coalesce(func.sum(EnrichmentCacheDB.size_bytes), 0))
+                    ).one()
+                    excess = entries - self.max_entries
+                    if size > self.max_bytes:
+                        excess = max(excess, min(entries, EVICTION_BATCH_SIZE))
+                    if excess <= 0:
+                        break
+                    oldest = (
+                        select(EnrichmentCacheDB.cache_key)
+                        .order_by(EnrichmentCacheDB.last_used_at)
+                        .limit(excess)
+                    )
+                    evicted += db.execute(
+                        delete(EnrichmentCacheDB).where(EnrichmentCacheDB.cache_key.in_(oldest))
+                    ).rowcount or 0
+        except SQLAlchemyError as e:
+            print(f"Enrichment cache eviction failed: {str(e)}")
+            evicted = 0
+
+        self._count("evictions", evicted)
+        return evicted
+
+    def invalidate(
+        self,
+        canonical_url: Optional[str] = None,
+        prompt_hash: Optional[str] = None,
+        all: bool = False,
+    ) -> int:
+        """
+        Delete entries for a URL and/or produced by a given prompt hash.
+
+        Deleting every entry takes an explicit `all=True`; without a filter
+        it raises ValueError.
+        """
+        conditions = []
+        if canonical_url:
+            conditions.append(EnrichmentCacheDB.canonical_url == canonical_url)
+        if prompt_hash:
+            conditions.append(EnrichmentCacheDB.prompt_hash == prompt_hash)
+        if not conditions and not all:
+            raise ValueError("Give canonical_url or prompt_hash, or all=True to clear the cache")
+        with session_scope() as db:
+            return db.execute(delete(EnrichmentCacheDB).where(*conditions)).rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for this instance plus the size of the stored cache."""
+        self.usage.flush()
+        with session_scope(write=False) as db:
+            entries, size = db.execute(
+                select(func.count(), func.coalesce(func.sum(EnrichmentCacheDB.size_bytes), 0))
+            ).one()
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": entries,
+            "size_bytes": size,
+        }
@@ -0,0 +1,287 @@
+"""Enrichment work queue backed by the enrichment_tasks table.
+
+Every basic community with a URL gets one task row. Runners claim batches of
+tasks atomically, holding a lease until they report the task as done or
+failed. Expired leases and failed tasks with attempts left are claimable
+again, so several runners can drain the queue without doing the same work.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, exists, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from .database import (
+    BasicCommunityDB,
+    CommunityDB,
+    EnrichmentTaskDB,
+    ENRICHMENT_DONE,
+    ENRICHMENT_FAILED,
+    ENRICHMENT_IN_PROGRESS,
+    ENRICHMENT_PENDING,
+)
+from .urls import canonicalize_url
+
+# Queue configuration
+ENRICHMENT_BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", "25"))
+ENRICHMENT_LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", "900"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3"))
+
+# Identifies this process when it holds leases
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _claimable(now: datetime, max_attempts: int):
+    """Condition matching tasks that a runner may claim right now."""
+    return or_(
+        EnrichmentTaskDB.status == ENRICHMENT_PENDING,
+        and_(
+            EnrichmentTaskDB.status == ENRICHMENT_IN_PROGRESS,
+            EnrichmentTaskDB.lease_expires_at < now,
+            EnrichmentTaskDB.attempts < max_attempts,
+        ),
+        and_(
+            EnrichmentTaskDB.status == ENRICHMENT_FAILED,
+            EnrichmentTaskDB.attempts < max_attempts,
+        ),
+    )
+
+
+def _fail_expired_leases(
+    db: Session, now: datetime, max_attempts: int, keep_owner: Optional[str] = None
+) -> int:
+    """
+    Mark expired leases without attempts left as failed. Does not commit.
+
+    Such a task can no longer be claimed, so it would otherwise stay
+    in_progress for good. Leases of `keep_owner` are kept.
+    """
+    expired = [
+        EnrichmentTaskDB.status == ENRICHMENT_IN_PROGRESS,
+        EnrichmentTaskDB.lease_expires_at < now,
+        EnrichmentTaskDB.attempts >= max_attempts,
+    ]
+    if keep_owner is not None:
+        expired.append(
+            or_(EnrichmentTaskDB.lease_owner.is_(None), EnrichmentTaskDB.lease_owner != keep_owner)
+        )
+    result = db.execute(
+        update(EnrichmentTaskDB)
+        .where(*expired)
+        .values(
+            status=ENRICHMENT_FAILED,
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error="lease expired",
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def enqueue_basic_communities(db: Session, basic_community_ids: Iterable[int]) -> int:
+    """
+    Add pending tasks for the given basic communities. Does not commit.
+    """
+    ids = [basic_community_id for basic_community_id in basic_community_ids if basic_community_id]
+    if not ids:
+        return 0
+
+    now = datetime.utcnow()
+    db.execute(
+        insert(EnrichmentTaskDB),
+        [
+            {
+                "basic_community_id": basic_community_id,
+                "status": ENRICHMENT_PENDING,
+                "attempts": 0,
+                "updated_at": now,
+            }
+            for basic_community_id in ids
+        ],
+    )
+    return len(ids)
+
+
+def sync_enrichment_queue(db: Session) -> int:
+    """
+    Create tasks for basic communities that have a URL but no task yet.
+
+    Communities whose URL already has an enriched record are queued as done,
+    so existing data is not enriched again. Does not commit.
+    """
+    already_enriched = exists().where(
+        CommunityDB.canonical_url == BasicCommunityDB.canonical_url
+    )
+    missing = (
+        select(
+            BasicCommunityDB.id,
+            case((already_enriched, ENRICHMENT_DONE), else_=ENRICHMENT_PENDING),
+            literal(0),
+        )
+        .outerjoin(
+            EnrichmentTaskDB,
+            EnrichmentTaskDB.basic_community_id == BasicCommunityDB.id,
+        )
+        .where(
+            EnrichmentTaskDB.basic_community_id.is_(None),
+            BasicCommunityDB.url.isnot(None),
+            BasicCommunityDB.url != "",
+        )
+    )
+    result = db.execute(
+        insert(EnrichmentTaskDB).from_select(
+            ["basic_community_id", "status", "attempts"], missing
+        )
+    )
+    return result.rowcount or 0
+
+
+def claim_enrichment_batch(
+    db: Session,
+    limit: int = ENRICHMENT_BATCH_SIZE,
+    after_id: Optional[int] = None,
+    worker_id: str = WORKER_ID,
+    lease_seconds: int = ENRICHMENT_LEASE_SECONDS,
+    max_attempts: int = ENRICHMENT_MAX_ATTEMPTS,
+    ids: Optional[Iterable[int]] = None,
+    reclaim_own: bool = False,
+) -> List[BasicCommunityDB]:
+    """
+    Atomically lease up to `limit` claimable tasks and return their communities.
+
+    Tasks are claimed in id order starting after `after_id`, so callers can
+    page through the queue with a keyset cursor; `ids` restricts the claim
+    to the given basic communities. With `reclaim_own`, tasks still leased
+    by `worker_id` are claimable again without using up an attempt, so a
+    run-scoped worker id that outlives a process resumes its own leases;
+    only pass it with such an id, never the process-wide WORKER_ID. The
+    claim is a single UPDATE that re-checks claimability, so concurrent
+    runners never lease the same task twice. Expired leases without
+    attempts left are marked failed first. Does not commit.
+    """
+    now = datetime.utcnow()
+    _fail_expired_leases(db, now, max_attempts, keep_owner=worker_id if reclaim_own else None)
+    claimable = _claimable(now, max_attempts)
+    attempts = EnrichmentTaskDB.attempts + 1
+    if reclaim_own:
+        own_lease = and_(
+            EnrichmentTaskDB.status == ENRICHMENT_IN_PROGRESS,
+            EnrichmentTaskDB.lease_owner == worker_id,
+        )
+        claimable = or_(claimable, own_lease)
+        attempts = case((own_lease, EnrichmentTaskDB.attempts), else_=attempts)
+
+    candidates = select(EnrichmentTaskDB.basic_community_id).where(claimable)
+    if after_id is not None:
+        candidates = candidates.where(EnrichmentTaskDB.basic_community_id > after_id)
+    if ids is not None:
+        candidates = candidates.where(EnrichmentTaskDB.basic_community_id.in_(list(ids)))
+    candidates = candidates.order_by(EnrichmentTaskDB.basic_community_id).limit(limit)
+
+    claimed_ids = (
+        db.execute(
+            update(EnrichmentTaskDB)
+            .where(EnrichmentTaskDB.basic_community_id.in_(candidates), claimable)
+            .values(
+                status=ENRICHMENT_IN_PROGRESS,
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=attempts,
+                updated_at=now,
+            )
+            .returning(EnrichmentTaskDB.basic_community_id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    if not claimed_ids:
+        return []
+
+    return (
+        db.query(BasicCommunityDB)
+        .filter(BasicCommunityDB.id.in_(claimed_ids))
+        .order_by(BasicCommunityDB.id)
+        .all()
+    )
+
+
+def complete_enrichment(
+    db: Session,
+    community_id: int,
+    basic_community_id: Optional[int] = None,
+    website: Optional[str] = None,
+) -> int:
+    """
+    Mark tasks as done once their enriched record has been saved.
+
+    Tasks are matched by `basic_community_id` when given, otherwise by the
+    basic community whose canonical URL matches `website`. Does not commit.
+    """
+    if basic_community_id is not None:
+        match = EnrichmentTaskDB.basic_community_id == basic_community_id
+    elif website:
+        match = EnrichmentTaskDB.basic_community_id.in_(
+            select(BasicCommunityDB.id).where(
+                BasicCommunityDB.canonical_url == canonicalize_url(website)
+            )
+        )
+    else:
+        return 0
+
+    result = db.execute(
+        update(EnrichmentTaskDB)
+        .where(match)
+        .values(
+            status=ENRICHMENT_DONE,
+            community_id=community_id,
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error=None,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def fail_enrichment(db: Session, basic_community_id: int, error: str) -> int:
+    """
+    Mark a task as failed and release its lease. Does not commit.
+
+    The task is retried by a later claim while it has attempts left.
+    """
+    result = db.execute(
+        update(EnrichmentTaskDB)
+        .where(EnrichmentTaskDB.basic_community_id == basic_community_id)
+        .values(
+            status=ENRICHMENT_FAILED,
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error=(error or "")[:2000],
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def get_enrichment_queue_stats(db: Session) -> Dict[str, int]:
+    """Count tasks per status."""
+    rows = db.execute(
+        select(EnrichmentTaskDB.status, func.count()).group_by(EnrichmentTaskDB.status)
+    ).all()
+    stats = {
+        ENRICHMENT_PENDING: 0,
+        ENRICHMENT_IN_PROGRESS: 0,
+        ENRICHMENT_DONE: 0,
+        ENRICHMENT_FAILED: 0,
+    }
+    stats.update({status: count for status, count in rows})
+    return stats
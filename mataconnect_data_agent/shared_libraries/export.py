@@ -0,0 +1,369 @@
+"""Streaming export of enriched communities to NDJSON, CSV or Parquet.
+
+Rows are read with a streaming cursor `EXPORT_CHUNK_SIZE` at a time and
+written out chunk by chunk, so memory stays flat however large the table
+is. JSON columns are fetched as text: NDJSON and CSV write that text as it
+is, Parquet decodes it once per row:
+
+    python -m mataconnect_data_agent.shared_libraries.export communities.ndjson.gz
+    python -m mataconnect_data_agent.shared_libraries.export verified.csv --verified
+    python -m mataconnect_data_agent.shared_libraries.export recent.parquet --updated-since 2025-01-01
+
+The format follows the file extension (a trailing .gz compresses NDJSON and
+CSV) unless `--format` is given. Parquet needs the optional `pyarrow` package.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import Text, func, select, type_coerce
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import CommunityDB, engine
+from .facets import decode_json_value
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+EXPORT_FORMATS = ["ndjson", "csv", "parquet"]
+
+# Exported columns in output order; embeddings only on request
+EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "website",
+    "canonical_url",
+    "registered_domain",
+    "description",
+    "tags",
+    "focus_areas",
+    "country",
+    "city",
+    "language",
+    "contact_email",
+    "is_virtual",
+    "social_links",
+    "community_info",
+    "pricing_model",
+    "topics_supported",
+    "audience_type",
+    "event_types",
+    "year_founded",
+    "verified",
+    "data_source",
+    "created_at",
+    "updated_at",
+    "is_active",
+]
+JSON_EXPORT_COLUMNS = {"tags", "social_links", "community_info", "topics_supported", "event_types", "embedding"}
+LIST_EXPORT_COLUMNS = {"tags", "topics_supported", "event_types"}
+DATETIME_EXPORT_COLUMNS = {"created_at", "updated_at"}
+
+
+def _export_query(
+    columns: List[str],
+    active_only: bool,
+    verified: Optional[bool],
+    updated_since: Optional[datetime],
+    updated_until: Optional[datetime],
+    raw_datetimes: bool,
+):
+    selected = [
+        # Fetch JSON as text so it is decoded once, here, not by the column type
+        type_coerce(getattr(CommunityDB, column), Text).label(column)
+        if column in JSON_EXPORT_COLUMNS or (raw_datetimes and column in DATETIME_EXPORT_COLUMNS)
+        else getattr(CommunityDB, column)
+        for column in columns
+    ]
+    query = select(*selected).order_by(CommunityDB.id)
+    if active_only:
+        query = query.where(func.coalesce(CommunityDB.is_active, True).is_(True))
+    if verified is not None:
+        query = query.where(func.coalesce(CommunityDB.verified, False).is_(verified))
+    if updated_since is not None:
+        query = query.where(CommunityDB.updated_at >= updated_since)
+    if updated_until is not None:
+        query = query.where(CommunityDB.updated_at < updated_until)
+    return query
+
+
+def _decode_json(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+        # Rows saved by old versions may hold JSON encoded twice
+        if isinstance(value, str):
+            value = decode_json_value(value)
+    return value
+
+
+def _json_text(value) -> Optional[str]:
+    # Drivers such as psycopg2 hand back JSON already decoded
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def iter_community_chunks(
+    active_only: bool = True,
+    verified: Optional[bool] = None,
+    updated_since: Optional[datetime] = None,
+    updated_until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    include_embedding: bool = False,
+    decode_json: bool = True,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield communities in id order as lists of up to `chunk_size` dicts.
+
+    Datetimes are ISO 8601 strings. JSON columns are decoded, or with
+    `decode_json=False` left as the JSON text stored in the database. The
+    rows are streamed, so only one chunk is held in memory at a time.
+    """
+    columns = EXPORT_COLUMNS + (["embedding"] if include_embedding else [])
+    # Parsing SQLite's datetime text only to format it again is wasted work
+    query = _export_query(
+        columns,
+        active_only,
+        verified,
+        updated_since,
+        updated_until,
+        raw_datetimes=engine.dialect.name == "sqlite",
+    )
+    json_columns = [column for column in columns if column in JSON_EXPORT_COLUMNS]
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=chunk_size).execute(query)
+        keys = list(result.keys())
+        for partition in result.partitions():
+            chunk = [dict(zip(keys, row)) for row in partition]
+            for data in chunk:
+                for column in DATETIME_EXPORT_COLUMNS:
+                    data[column] = _isoformat(data[column])
+                for column in json_columns:
+                    data[column] = (_decode_json if decode_json else _json_text)(data[column])
+            yield chunk
+
+
+def _isoformat(value) -> Optional[str]:
+    if isinstance(value, str):
+        # SQLite stores "YYYY-MM-DD HH:MM:SS.ffffff"
+        return value.replace(" ", "T", 1)
+    return value.isoformat() if value is not None else None
+
+
+class _NdjsonWriter:
+    """Writes rows with undecoded JSON columns, splicing in their JSON text."""
+
+    def __init__(self, stream, columns: List[str]):
+        self.stream = stream
+        self.json_columns = [column for column in columns if column in JSON_EXPORT_COLUMNS]
+
+    def write(self, chunk: List[Dict[str, Any]]) -> None:
+        lines = []
+        for row in chunk:
+            raw = [(column, row.pop(column)) for column in self.json_columns]
+            line = json.dumps(row, ensure_ascii=False, default=str)[:-1]
+            lines.append(
+                line + "".join(f', "{column}": {value or "null"}' for column, value in raw) + "}"
+            )
+        self.stream.write("\n".join(lines) + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+class _CsvWriter:
+    """JSON columns are written as their JSON text."""
+
+    def __init__(self, stream, columns: List[str]):
+        self.writer = csv.DictWriter(stream, fieldnames=columns)
+        self.writer.writeheader()
+
+    def write(self, chunk: List[Dict[str, Any]]) -> None:
+        self.writer.writerows(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetWriter:
+    """Lists become list<string> columns; dict columns are stored as JSON text."""
+
+    def __init__(self, path: str, columns: List[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Parquet export requires pyarrow: pip install pyarrow")
+
+        types = {
+            "id": pa.int64(),
+            "year_founded": pa.int64(),
+            "is_virtual": pa.bool_(),
+            "verified": pa.bool_(),
+            "is_active": pa.bool_(),
+            "created_at": pa.timestamp("us"),
+            "updated_at": pa.timestamp("us"),
+            "embedding": pa.list_(pa.float32()),
+        }
+        self.columns = columns
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                (
+                    column,
+                    types.get(column)
+                    or (pa.list_(pa.string()) if column in LIST_EXPORT_COLUMNS else pa.string()),
+                )
+                for column in columns
+            ]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def _column(self, column: str, chunk: List[Dict[str, Any]]) -> list:
+        values = [row[column] for row in chunk]
+        if column in LIST_EXPORT_COLUMNS:
+            return [
+                [str(item) for item in value] if isinstance(value, list) else None
+                for value in values
+            ]
+        if column in JSON_EXPORT_COLUMNS and column != "embedding":
+            return [
+                json.dumps(value, ensure_ascii=False) if value is not None else None
+                for value in values
+            ]
+        if column in DATETIME_EXPORT_COLUMNS:
+            return [datetime.fromisoformat(value) if value else None for value in values]
+        if column == "embedding":
+            return [value if isinstance(value, list) else None for value in values]
+        return values
+
+    def write(self, chunk: List[Dict[str, Any]]) -> None:
+        table = self.pa.Table.from_arrays(
+            [self._column(column, chunk) for column in self.columns], schema=self.schema
+        )
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def export_format(path: str) -> str:
+    """Export format implied by a file name."""
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".parquet"):
+        return "parquet"
+    return "ndjson"
+
+
+def export_communities(
+    path: str,
+    format: Optional[str] = None,
+    active_only: bool = True,
+    verified: Optional[bool] = None,
+    updated_since: Optional[datetime] = None,
+    updated_until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    include_embedding: bool = False,
+) -> Dict[str, Any]:
+    """
+    Stream communities into `path` ('-' for stdout) as NDJSON, CSV or Parquet.
+
+    Only active communities are exported unless `active_only` is False;
+    `verified` keeps only (un)verified ones and `updated_since` /
+    `updated_until` bound updated_at. Returns the row count and timing.
+    """
+    format = format or export_format(path)
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    if format == "parquet" and path == "-":
+        raise ValueError("Parquet cannot be written to stdout")
+
+    columns = EXPORT_COLUMNS + (["embedding"] if include_embedding else [])
+    started = time.perf_counter()
+    stats = {"path": path, "format": format, "rows": 0}
+
+    stream = None
+    if format == "parquet":
+        writer = _ParquetWriter(path, columns)
+    else:
+        if path == "-":
+            stream = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="", write_through=True)
+        elif path.endswith(".gz"):
+            stream = gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+        else:
+            stream = open(path, "w", encoding="utf-8", newline="", buffering=1 << 20)
+        writer = _NdjsonWriter(stream, columns) if format == "ndjson" else _CsvWriter(stream, columns)
+
+    try:
+        for chunk in iter_community_chunks(
+            active_only=active_only,
+            verified=verified,
+            updated_since=updated_since,
+            updated_until=updated_until,
+            chunk_size=chunk_size,
+            include_embedding=include_embedding,
+            # NDJSON and CSV write JSON columns as stored; only Parquet needs values
+            decode_json=format == "parquet",
+        ):
+            writer.write(chunk)
+            stats["rows"] += len(chunk)
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to export communities: {str(e)}")
+    finally:
+        writer.close()
+        if stream is not None:
+            if path == "-":
+                stream.detach()
+            else:
+                stream.close()
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    if path != "-":
+        stats["bytes"] = os.path.getsize(path)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export enriched communities")
+    parser.add_argument("path", help="Output file (.ndjson, .csv, .parquet, optionally .gz) or - for stdout")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None)
+    parser.add_argument("--include-inactive", action="store_true", help="Also export deactivated communities")
+    verified = parser.add_mutually_exclusive_group()
+    verified.add_argument("--verified", dest="verified", action="store_true", default=None)
+    verified.add_argument("--unverified", dest="verified", action="store_false")
+    parser.add_argument("--updated-since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--updated-until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("--include-embedding", action="store_true")
+    args = parser.parse_args(argv)
+
+    stats = export_communities(
+        args.path,
+        format=args.format,
+        active_only=not args.include_inactive,
+        verified=args.verified,
+        updated_since=args.updated_since,
+        updated_until=args.updated_until,
+        chunk_size=args.chunk_size,
+        include_embedding=args.include_embedding,
+    )
+    print(json.dumps(stats, indent=2), file=sys.stderr if args.path == "-" else sys.stdout)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
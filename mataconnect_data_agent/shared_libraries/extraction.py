@@ -0,0 +1,355 @@
+"""Extract a compact, token-budgeted text digest from community web pages."""
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Union
+from urllib.parse import urljoin, urlsplit
+
+from lxml import etree
+from pydantic import BaseModel
+
+# Extraction configuration
+EXTRACT_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", str(512 * 1024)))
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "1200"))
+EXTRACT_MAX_LINKS = 20
+FEED_CHUNK_BYTES = 64 * 1024
+
+# Rough token estimate for Gemini-style tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+# Elements whose content never reaches the digest
+SKIPPED_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "svg",
+    "template",
+    "iframe",
+    "canvas",
+    "nav",
+    "aside",
+    "form",
+    "button",
+    "select",
+    "option",
+    "head",
+}
+
+# Elements that end a run of text
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "footer",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "li",
+    "main",
+    "ol",
+    "p",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+# Words marking boilerplate when they are a whole class/id token or a
+# dash/underscore separated part of one ("cookie-banner", "nav_menu")
+BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[-_])(?:cookie|cookies|consent|gdpr|banner|modal|popup|newsletter|subscribe|"
+    r"breadcrumbs?|share|sharing|sidebar|menu|navbar|skip-link|advert|adverts|sponsor)(?:$|[-_])",
+    re.IGNORECASE,
+)
+# Boilerplate-marked elements with more text than this are content wrappers and kept
+BOILERPLATE_MAX_CHARS = 500
+# Class/id fragments marking the sections worth keeping
+PRIORITY_PATTERN = re.compile(
+    r"about|mission|vision|who-?we-?are|our-?story|what-?we-?do|contact|footer|"
+    r"values|purpose|founded|history",
+    re.IGNORECASE,
+)
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+SOCIAL_DOMAINS = {
+    "facebook.com": "facebook",
+    "linkedin.com": "linkedin",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "instagram.com": "instagram",
+    "youtube.com": "youtube",
+    "tiktok.com": "tiktok",
+    "meetup.com": "meetup",
+    "eventbrite.com": "eventbrite",
+    "eventbrite.co.uk": "eventbrite",
+}
+
+
+class PageDigest(BaseModel):
+    """Compact representation of a web page for the enrichment model."""
+
+    url: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    language: Optional[str] = None
+    text: str = ""
+    emails: List[str] = []
+    social_links: Dict[str, str] = {}
+    links: List[str] = []
+    bytes_in: int = 0
+    tokens_out: int = 0
+    truncated: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _is_boilerplate(marker: str) -> bool:
+    return any(BOILERPLATE_PATTERN.search(token) for token in marker.split())
+
+
+class _PageCollector:
+    """
+    lxml parser target that collects text blocks and side data while parsing.
+
+    Elements marked as boilerplate are collected like any other, then
+    dropped when they end unless their text exceeds BOILERPLATE_MAX_CHARS,
+    so a wrapper like <div class="content has-sidebar"> keeps the page.
+    """
+
+    def __init__(self, base_url: Optional[str]):
+        self.base_url = base_url
+        self.stack: List[tuple] = []  # (tag, skipped, priority, boilerplate start or None)
+        self.skip_depth = 0
+        self.buffer: List[str] = []
+        self.blocks: List[tuple] = []  # (priority, is_heading, text)
+        self.heading_level: Optional[int] = None  # Level of the matching heading
+        self.in_title = False
+        self.title_parts: List[str] = []
+        self.meta: Dict[str, str] = {}
+        self.language: Optional[str] = None
+        self.hrefs: List[str] = []
+        self.emails: List[str] = []
+
+    def _priority(self) -> bool:
+        return self.heading_level is not None or any(entry[2] for entry in self.stack)
+
+    def _flush(self, is_heading: bool = False) -> None:
+        text = " ".join("".join(self.buffer).split())
+        self.buffer = []
+        if text:
+            self.blocks.append((self._priority(), is_heading, text))
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        marker = f"{attrib.get('id', '')} {attrib.get('class', '')} {attrib.get('role', '')}"
+
+        if tag == "html" and attrib.get("lang"):
+            self.language = attrib["lang"]
+        elif tag == "title":
+            self.in_title = True
+        elif tag == "meta":
+            key = (attrib.get("name") or attrib.get("property") or "").lower()
+            if key in ("description", "og:description", "og:title", "og:site_name"):
+                self.meta.setdefault(key, " ".join((attrib.get("content") or "").split()))
+        elif tag == "a" and attrib.get("href"):
+            self.hrefs.append(attrib["href"])
+
+        if tag in BLOCK_TAGS:
+            self._flush()
+        else:
+            # Inline elements still separate words, e.g. adjacent links
+            self.buffer.append(" ")
+        if tag in HEADING_TAGS and self.heading_level is not None:
+            # A heading at the same or a higher level closes the matching section
+            if int(tag[1]) <= self.heading_level:
+                self.heading_level = None
+
+        skipped = tag in SKIPPED_TAGS
+        boilerplate = None
+        if not skipped and tag not in ("html", "body", "main") and _is_boilerplate(marker):
+            self._flush()
+            boilerplate = (len(self.blocks), len(self.emails))
+        priority = tag == "footer" or bool(PRIORITY_PATTERN.search(marker))
+        self.stack.append((tag, skipped, priority, boilerplate))
+        if skipped:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if tag == "title":
+            self.in_title = False
+
+        # Flush before popping so the block keeps its section's priority
+        if tag in HEADING_TAGS:
+            text = " ".join("".join(self.buffer).split())
+            if PRIORITY_PATTERN.search(text.replace(" ", "-")):
+                self.heading_level = int(tag[1])
+            self._flush(is_heading=True)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        else:
+            self.buffer.append(" ")
+
+        # Pop up to the matching start tag; lxml repairs unbalanced markup
+        while self.stack:
+            open_tag, skipped, _, boilerplate = self.stack.pop()
+            if skipped:
+                self.skip_depth -= 1
+            if boilerplate is not None:
+                self._drop_boilerplate(*boilerplate)
+            if open_tag == tag:
+                break
+
+    def _drop_boilerplate(self, first_block: int, first_email: int) -> None:
+        """Drop what a boilerplate element collected, unless it holds the page's content."""
+        self._flush()
+        if sum(len(text) for _, _, text in self.blocks[first_block:]) <= BOILERPLATE_MAX_CHARS:
+            del self.blocks[first_block:]
+            del self.emails[first_email:]
+
+    def data(self, data):
+        if self.in_title:
+            self.title_parts.append(data)
+            return
+        if self.skip_depth:
+            return
+        self.buffer.append(data)
+        if "@" in data:
+            self.emails.extend(EMAIL_PATTERN.findall(data))
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+        return self
+
+
+def _side_data(collector: _PageCollector, base_url: Optional[str]):
+    """Resolve links into emails, social profiles and same-site page links."""
+    emails = list(collector.emails)
+    social_links: Dict[str, str] = {}
+    links: List[str] = []
+    site_host = urlsplit(base_url).hostname if base_url else None
+
+    for href in collector.hrefs:
+        href = href.strip()
+        if href.lower().startswith("mailto:"):
+            emails.append(href[7:].split("?")[0])
+            continue
+        absolute = urljoin(base_url, href) if base_url else href
+        parts = urlsplit(absolute)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            continue
+        host = parts.hostname.lower()
+        if host.startswith("www."):
+            host = host[4:]
+
+        network = next(
+            (name for domain, name in SOCIAL_DOMAINS.items() if host == domain or host.endswith(f".{domain}")),
+            None,
+        )
+        if network:
+            social_links.setdefault(network, absolute)
+        elif (
+            site_host
+            and host == site_host.lower().removeprefix("www.")
+            and PRIORITY_PATTERN.search(parts.path)
+            and absolute not in links
+            and len(links) < EXTRACT_MAX_LINKS
+        ):
+            links.append(absolute.split("#")[0])
+
+    return list(dict.fromkeys(email.lower() for email in emails)), social_links, links
+
+
+def extract_page_digest(
+    html: Union[str, bytes],
+    url: Optional[str] = None,
+    token_budget: int = EXTRACT_TOKEN_BUDGET,
+    max_bytes: int = EXTRACT_MAX_BYTES,
+) -> PageDigest:
+    """
+    Reduce an HTML page to a token-budgeted text digest and side data.
+
+    The page is parsed incrementally and parsing stops after `max_bytes`.
+    Navigation, scripts, styles and boilerplate such as cookie banners are
+    dropped. Blocks from about, mission, contact and footer sections are
+    placed first, then the remaining text in document order until the
+    digest reaches `token_budget` tokens. Emails, social profile links and
+    same-site about/contact links are returned alongside the text.
+    """
+    raw = html.encode("utf-8", errors="replace") if isinstance(html, str) else html
+    truncated = len(raw) > max_bytes
+    raw = raw[:max_bytes]
+
+    collector = _PageCollector(url)
+    parser = etree.HTMLParser(target=collector, recover=True, encoding="utf-8")
+    try:
+        for start in range(0, len(raw), FEED_CHUNK_BYTES):
+            parser.feed(raw[start : start + FEED_CHUNK_BYTES])
+        parser.close()
+    except etree.XMLSyntaxError:
+        # Empty or hopeless input; keep whatever was collected
+        collector.close()
+
+    title = " ".join(" ".join(collector.title_parts).split()) or collector.meta.get("og:title")
+    description = collector.meta.get("description") or collector.meta.get("og:description")
+
+    # Priority blocks first, each block kept once, within the budget
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    seen = {title, description}
+    ordered = [block for block in collector.blocks if block[0]] + [
+        block for block in collector.blocks if not block[0]
+    ]
+    lines: List[str] = []
+    used = 0
+    for _, is_heading, text in ordered:
+        if text in seen or (len(text) < 3 and not is_heading):
+            continue
+        seen.add(text)
+        line = f"## {text}" if is_heading else text
+        if used + len(line) + 1 > budget_chars:
+            remaining = budget_chars - used
+            if remaining > 80 and not is_heading:
+                lines.append(line[:remaining].rsplit(" ", 1)[0] + " ...")
+            truncated = True
+            break
+        lines.append(line)
+        used += len(line) + 1
+
+    emails, social_links, links = _side_data(collector, url)
+    text = "\n".join(lines)
+    return PageDigest(
+        url=url,
+        title=title,
+        description=description,
+        language=collector.language,
+        text=text,
+        emails=emails,
+        social_links=social_links,
+        links=links,
+        bytes_in=len(raw),
+        tokens_out=estimate_tokens(text),
+        truncated=truncated,
+    )
@@ -0,0 +1,244 @@
+"""Normalized facet values for community list fields, and faceted browsing.
+
+Each value of `tags`, `topics_supported` and `event_types` is stored as a
+row of community_facets (community_id, facet, value), normalized to lower
+case. The (facet, value, community_id) index makes filtering by value and
+counting values over a filtered set of communities index-driven queries:
+
+    facet_counts(db, {"country": "UK", "pricing_model": "free",
+                      "is_virtual": True, "tags": ["tech"],
+                      "event_types": ["mentorship"]})
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Text, bindparam, cast, delete, exists, func, insert, or_, select, update
+
+from .database import CommunityDB, CommunityFacetDB
+
+# List columns normalized into community_facets
+FACET_COLUMNS = ["tags", "topics_supported", "event_types"]
+
+# JSON columns that older versions of the save path stored double-encoded
+JSON_COLUMNS = ["tags", "social_links", "community_info", "topics_supported", "event_types", "embedding"]
+
+# Community columns that can be filtered on and counted, compared case-insensitively
+SCALAR_FACETS = ["country", "city", "pricing_model", "audience_type", "language"]
+BOOLEAN_FACETS = ["is_virtual", "verified"]
+
+FACET_VALUE_LENGTH = 255
+FACET_COUNTS_LIMIT = 20
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def parse_bool(value) -> bool:
+    """Parse a boolean filter value: a bool, or "true"/"false"/"1"/"0" in any case."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1"):
+        return True
+    if text in ("false", "0"):
+        return False
+    raise ValueError(f"Invalid boolean value: {value!r}")
+
+
+def decode_json_value(value):
+    """Decode a JSON column value that may itself be a JSON-encoded string."""
+    while isinstance(value, str):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if decoded == value:
+            return value
+        value = decoded
+    return value
+
+
+def normalize_facet_value(value) -> Optional[str]:
+    """Lower-case, whitespace-collapsed form of a facet value."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = " ".join(str(value).split()).lower()
+    return value[:FACET_VALUE_LENGTH] or None
+
+
+def facet_values(value) -> List[str]:
+    """Distinct normalized values of a list column."""
+    value = decode_json_value(value)
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return []
+    values = (normalize_facet_value(item) for item in value)
+    return list(dict.fromkeys(item for item in values if item))
+
+
+def replace_community_facets(connection, rows: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Rewrite the facet rows of communities from their list column values.
+
+    `rows` maps community id to column values; only the facet columns
+    present for a community are replaced. Runs in the caller's transaction.
+    """
+    facets = CommunityFacetDB.__table__
+    for facet in FACET_COLUMNS:
+        ids = [id for id, data in rows.items() if facet in data]
+        if not ids:
+            continue
+        connection.execute(
+            delete(facets).where(facets.c.facet == facet, facets.c.community_id.in_(ids))
+        )
+        values = [
+            {"community_id": id, "facet": facet, "value": value}
+            for id in ids
+            for value in facet_values(rows[id][facet])
+        ]
+        if values:
+            connection.execute(insert(facets), values)
+
+
+def _double_encoded(column):
+    # A JSON string value serializes with a leading quote; lists and objects do not
+    return cast(column, Text).like('"%')
+
+
+def backfill_facets(connection) -> Dict[str, int]:
+    """
+    Decode double-encoded JSON columns and fill community_facets.
+
+    Decoding only touches rows holding encoded strings, and facets are only
+    rebuilt while community_facets is empty, so this is cheap to run on
+    every startup. Runs in the caller's transaction.
+    """
+    communities = CommunityDB.__table__
+    stats = {"decoded": 0, "faceted": 0}
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(communities.c.id, *(communities.c[column] for column in JSON_COLUMNS))
+            .where(
+                communities.c.id > last_id,
+                or_(*(_double_encoded(communities.c[column]) for column in JSON_COLUMNS)),
+            )
+            .order_by(communities.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        connection.execute(
+            update(communities)
+            .where(communities.c.id == bindparam("row_id"))
+            # Decoding is not a content change, so keep updated_at as it is
+            .values(
+                **{column: bindparam(f"new_{column}") for column in JSON_COLUMNS},
+                updated_at=communities.c.updated_at,
+            ),
+            [
+                {
+                    "row_id": row["id"],
+                    **{f"new_{column}": decode_json_value(row[column]) for column in JSON_COLUMNS},
+                }
+                for row in rows
+            ],
+        )
+        stats["decoded"] += len(rows)
+
+    if connection.execute(select(exists().select_from(CommunityFacetDB.__table__))).scalar():
+        return stats
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(communities.c.id, *(communities.c[column] for column in FACET_COLUMNS))
+            .where(communities.c.id > last_id)
+            .order_by(communities.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        replace_community_facets(connection, {row["id"]: dict(row) for row in rows})
+        stats["faceted"] += len(rows)
+
+    if any(stats.values()):
+        print(f"Facet backfill: {stats}")
+    return stats
+
+
+def filter_conditions(filters: Optional[Dict[str, Any]]) -> list:
+    """WHERE conditions on communities for a browse filter dict."""
+    conditions = [func.coalesce(CommunityDB.is_active, True).is_(True)]
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if key in FACET_COLUMNS:
+            # Every requested value must be present
+            values = [value] if isinstance(value, str) else value
+            for item in values:
+                conditions.append(
+                    CommunityDB.id.in_(
+                        select(CommunityFacetDB.community_id).where(
+                            CommunityFacetDB.facet == key,
+                            CommunityFacetDB.value == normalize_facet_value(item),
+                        )
+                    )
+                )
+        elif key in SCALAR_FACETS:
+            conditions.append(func.lower(getattr(CommunityDB, key)) == str(value).lower())
+        elif key in BOOLEAN_FACETS:
+            conditions.append(getattr(CommunityDB, key).is_(parse_bool(value)))
+        else:
+            raise ValueError(f"Unsupported filter: {key}")
+    return conditions
+
+
+def facet_counts(
+    db,
+    filters: Optional[Dict[str, Any]] = None,
+    facets: Optional[Iterable[str]] = None,
+    limit: int = FACET_COUNTS_LIMIT,
+) -> Dict[str, Any]:
+    """
+    Count communities per facet value over the communities matching `filters`.
+
+    Returns the number of matching communities and, for each of `facets`
+    (every facet when None), up to `limit` values with their counts, most
+    common first.
+    """
+    conditions = filter_conditions(filters)
+    matching = select(CommunityDB.id).where(*conditions)
+    total = db.scalar(select(func.count()).select_from(matching.subquery()))
+
+    counts: Dict[str, List[Dict[str, Any]]] = {}
+    for facet in FACET_COLUMNS + SCALAR_FACETS + BOOLEAN_FACETS if facets is None else facets:
+        if facet in FACET_COLUMNS:
+            count = func.count().label("count")
+            query = (
+                select(CommunityFacetDB.value, count)
+                .where(
+                    CommunityFacetDB.facet == facet,
+                    CommunityFacetDB.community_id.in_(matching),
+                )
+                .group_by(CommunityFacetDB.value)
+            )
+        elif facet in SCALAR_FACETS or facet in BOOLEAN_FACETS:
+            column = getattr(CommunityDB, facet)
+            value = func.lower(column) if facet in SCALAR_FACETS else column
+            count = func.count().label("count")
+            query = (
+                select(value.label("value"), count)
+                .where(*conditions, column.isnot(None))
+                .group_by(value)
+            )
+        else:
+            raise ValueError(f"Unsupported facet: {facet}")
+        rows = db.execute(query.order_by(count.desc(), "value").limit(limit))
+        counts[facet] = [{"value": row.value, "count": row.count} for row in rows]
+
+    return {"total": total, "facets": counts}
+
@@ -0,0 +1,329 @@
+"""Async website fetcher with per-host politeness and a conditional-GET disk cache."""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from pydantic import BaseModel
+
+from .urls import ensure_scheme
+
+# Fetcher configuration
+FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", "50"))
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "2"))
+FETCH_PER_HOST_DELAY_SECONDS = float(os.getenv("FETCH_PER_HOST_DELAY_SECONDS", "0.5"))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "15"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(1024 * 1024)))
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "./.fetch_cache")
+FETCH_CACHE_FRESH_SECONDS = int(os.getenv("FETCH_CACHE_FRESH_SECONDS", "3600"))
+FETCH_USER_AGENT = os.getenv("FETCH_USER_AGENT", "MataConnectDataAgent/1.0")
+
+# Only these content types are read and decoded
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+
+def _decode(body: bytes, charset: Optional[str]) -> str:
+    """Decode a body in its declared charset, falling back to UTF-8 for unknown ones."""
+    try:
+        return body.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class FetchResult(BaseModel):
+    """Result of fetching one URL."""
+
+    url: str
+    final_url: Optional[str] = None
+    status: Optional[int] = None
+    content_type: Optional[str] = None
+    text: Optional[str] = None
+    from_cache: bool = False
+    truncated: bool = False
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+class FetchCache:
+    """
+    On-disk cache of fetched pages keyed by URL.
+
+    Stores the body next to a small JSON record with the validators
+    (ETag / Last-Modified) used to revalidate it with a conditional GET.
+    """
+
+    def __init__(self, cache_dir: str = FETCH_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.body"
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached record for a URL with its body, if any."""
+        meta_path, body_path = self._paths(url)
+        try:
+            record = json.loads(meta_path.read_text(encoding="utf-8"))
+            record["text"] = body_path.read_text(encoding="utf-8")
+            return record
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, record: Dict, text: str) -> None:
+        """Store a record and body, replacing any previous entry atomically."""
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        for path, content in ((body_path, text), (meta_path, json.dumps(record))):
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, path)
+
+    def touch(self, url: str, record: Dict) -> None:
+        """Update the record of an entry revalidated with a 304."""
+        meta_path, _ = self._paths(url)
+        record = {key: value for key, value in record.items() if key != "text"}
+        tmp_path = meta_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+
+class WebsiteFetcher:
+    """
+    Fetch pages concurrently over one shared connection pool.
+
+    Concurrency is bounded globally and per host, requests to the same host
+    are spaced by a politeness delay (or the robots.txt Crawl-delay), and
+    robots.txt rules are honored. Bodies are capped at `max_bytes` and
+    cached on disk, and cached pages are revalidated with ETag and
+    Last-Modified so unchanged pages cost a 304.
+
+    Use as an async context manager:
+
+        async with WebsiteFetcher() as fetcher:
+            results = await fetcher.fetch_many(urls)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = FETCH_MAX_CONCURRENCY,
+        per_host_concurrency: int = FETCH_PER_HOST_CONCURRENCY,
+        per_host_delay: float = FETCH_PER_HOST_DELAY_SECONDS,
+        timeout: float = FETCH_TIMEOUT_SECONDS,
+        max_bytes: int = FETCH_MAX_BYTES,
+        cache_dir: Optional[str] = FETCH_CACHE_DIR,
+        cache_fresh_seconds: int = FETCH_CACHE_FRESH_SECONDS,
+        user_agent: str = FETCH_USER_AGENT,
+        respect_robots: bool = True,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.cache = FetchCache(cache_dir) if cache_dir else None
+        self.cache_fresh_seconds = cache_fresh_seconds
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_next_request: Dict[str, float] = {}
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+        self._crawl_delays: Dict[str, float] = {}
+
+    async def __aenter__(self) -> "WebsiteFetcher":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.session is None or self.session.closed
+
+    async def open(self) -> None:
+        """Create the connection pool on the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host_concurrency,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": self.user_agent},
+        )
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch_many(self, urls: List[str]) -> List[FetchResult]:
+        """Fetch all URLs concurrently, returning results in input order."""
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+    async def fetch(self, url: str) -> FetchResult:
+        """Fetch one URL. Errors are reported on the result, never raised."""
+        started = time.perf_counter()
+        try:
+            result = await self._fetch(url)
+        except asyncio.TimeoutError:
+            result = FetchResult(url=url, error=f"Timed out after {self.timeout}s")
+        except (aiohttp.ClientError, ValueError, UnicodeError, LookupError, OSError) as e:
+            result = FetchResult(url=url, error=f"{type(e).__name__}: {str(e)}")
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def _fetch(self, url: str) -> FetchResult:
+        # Scraped URLs often lack a scheme, e.g. "example.org/about"
+        target = ensure_scheme(url)
+        parts = urlsplit(target)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return FetchResult(url=url, error="Unsupported URL")
+
+        cached = self.cache.get(target) if self.cache else None
+        if cached and time.time() - cached.get("fetched_at", 0) < self.cache_fresh_seconds:
+            return self._cached_result(url, cached)
+
+        async with self._global_slots:
+            if self.respect_robots and not await self._allowed(target):
+                return FetchResult(url=url, error="Disallowed by robots.txt")
+
+            headers = {}
+            if cached and cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached and cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+            async with self._host_slot(parts.hostname):
+                async with self.session.get(target, headers=headers) as response:
+                    if response.status == 304 and cached:
+                        cached["fetched_at"] = time.time()
+                        if self.cache:
+                            await asyncio.to_thread(self.cache.touch, target, cached)
+                        return self._cached_result(url, cached)
+
+                    content_type = response.headers.get("Content-Type", "")
+                    result = FetchResult(
+                        url=url,
+                        final_url=str(response.url),
+                        status=response.status,
+                        content_type=content_type.split(";")[0].strip() or None,
+                    )
+                    if not content_type.startswith(TEXT_CONTENT_TYPES):
+                        return result
+
+                    body, result.truncated = await self._read_capped(response)
+                    result.text = _decode(body, response.charset)
+
+                    if self.cache and response.status == 200:
+                        record = {
+                            "final_url": result.final_url,
+                            "status": result.status,
+                            "content_type": result.content_type,
+                            "truncated": result.truncated,
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "fetched_at": time.time(),
+                        }
+                        await asyncio.to_thread(self.cache.put, target, record, result.text)
+                    return result
+
+    async def _read_capped(self, response: aiohttp.ClientResponse):
+        """Read at most max_bytes of the body."""
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                return b"".join(chunks)[: self.max_bytes], True
+        return b"".join(chunks), False
+
+    @staticmethod
+    def _cached_result(url: str, cached: Dict) -> FetchResult:
+        return FetchResult(
+            url=url,
+            final_url=cached.get("final_url"),
+            status=cached.get("status"),
+            content_type=cached.get("content_type"),
+            text=cached.get("text"),
+            truncated=cached.get("truncated", False),
+            from_cache=True,
+        )
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        """Hold a per-host slot, waiting out the host's politeness delay."""
+        slots = self._host_slots.setdefault(
+            host, asyncio.Semaphore(self.per_host_concurrency)
+        )
+        async with slots:
+            lock = self._host_locks.setdefault(host, asyncio.Lock())
+            async with lock:
+                now = time.monotonic()
+                start = max(now, self._host_next_request.get(host, now))
+                delay = max(self.per_host_delay, self._crawl_delays.get(host, 0.0))
+                self._host_next_request[host] = start + delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+    async def _allowed(self, url: str) -> bool:
+        """Check robots.txt for a URL, fetching it once per origin."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        lock = self._robots_locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            if origin not in self._robots:
+                self._robots[origin] = await self._load_robots(origin)
+        parser = self._robots[origin]
+        return parser is None or parser.can_fetch(self.user_agent, url)
+
+    async def _load_robots(self, origin: str) -> Optional[RobotFileParser]:
+        """Fetch and parse robots.txt; None means everything is allowed."""
+        try:
+            async with self._host_slot(urlsplit(origin).hostname):
+                async with self.session.get(f"{origin}/robots.txt") as response:
+                    if response.status >= 400:
+                        return None
+                    body, _ = await self._read_capped(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return None
+
+        parser = RobotFileParser()
+        parser.parse(body.decode("utf-8", errors="replace").splitlines())
+        parser.modified()
+        crawl_delay = parser.crawl_delay(self.user_agent)
+        if crawl_delay:
+            self._crawl_delays[urlsplit(origin).hostname] = float(crawl_delay)
+        return parser
+
+
+# Fetcher shared by tool calls on the same event loop
+_shared_fetcher: Optional[WebsiteFetcher] = None
+
+
+async def get_shared_fetcher() -> WebsiteFetcher:
+    """Return a fetcher whose connection pool is reused across tool calls."""
+    global _shared_fetcher
+    loop = asyncio.get_running_loop()
+    if _shared_fetcher is None or _shared_fetcher.closed or _shared_fetcher.loop is not loop:
+        _shared_fetcher = WebsiteFetcher()
+        await _shared_fetcher.open()
+    return _shared_fetcher
@@ -0,0 +1,249 @@
+"""Full-text search over communities with SQLite FTS5.
+
+`communities_fts` is an external-content FTS5 table over the searchable
+text columns of `communities`; it stores only the index, reads snippets
+from `communities` and is kept in sync by triggers. Results are ranked with
+BM25, weighting names above focus areas, tags and descriptions. A term
+ending in `*` matches as a prefix.
+
+Matches are ranked on the FTS table alone, keeping only the best
+candidates, and only those are joined to `communities` for the filters;
+when the filters leave too few, more candidates are ranked.
+
+Rebuild the index from existing data with:
+
+    python -m mataconnect_data_agent.shared_libraries.fulltext --rebuild
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from .database import engine, write_engine
+from .facets import BOOLEAN_FACETS, parse_bool
+
+FTS_TABLE = "communities_fts"
+
+# Indexed columns of communities and their BM25 weights
+FTS_COLUMNS = {
+    "name": 10.0,
+    "focus_areas": 4.0,
+    "tags": 3.0,
+    "topics_supported": 3.0,
+    "description": 2.0,
+    "city": 1.0,
+    "country": 1.0,
+}
+
+# Filters accepted by search_fulltext, mapped to communities columns
+FILTER_COLUMNS = {
+    "country",
+    "city",
+    "language",
+    "is_virtual",
+    "pricing_model",
+    "audience_type",
+    "verified",
+    "data_source",
+}
+
+# Best-ranked matches joined to communities per result wanted, before filtering
+FTS_CANDIDATE_FACTOR = int(os.getenv("FTS_CANDIDATE_FACTOR", "4"))
+SNIPPET_TOKENS = 12
+TERM_PATTERN = re.compile(r'"[^"]+"|[\w][\w\'-]*\*?', re.UNICODE)
+
+
+def fulltext_available(connection) -> bool:
+    """Whether the database is SQLite with the FTS5 extension."""
+    if connection.dialect.name != "sqlite":
+        return False
+    options = {row[0] for row in connection.execute(text("PRAGMA compile_options"))}
+    return "ENABLE_FTS5" in options
+
+
+def _trigger_sql() -> List[str]:
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS communities_fts_insert AFTER INSERT ON communities "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS communities_fts_delete AFTER DELETE ON communities "
+        f"BEGIN {delete_old} END",
+        # Only changes to indexed columns touch the index
+        f"CREATE TRIGGER IF NOT EXISTS communities_fts_update AFTER UPDATE OF {columns} "
+        f"ON communities BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def ensure_fulltext_index(connection) -> bool:
+    """
+    Create the FTS table and its triggers if missing.
+
+    A newly created index is filled from the existing rows. Returns False
+    when the database does not support FTS5.
+    """
+    if not fulltext_available(connection):
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).first()
+    if not exists:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{', '.join(FTS_COLUMNS)}, content='communities', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        )
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    for statement in _trigger_sql():
+        connection.execute(text(statement))
+    return True
+
+
+def rebuild_fulltext_index(optimize: bool = True) -> None:
+    """Re-index every community and optionally merge the index segments."""
+    with write_engine.begin() as connection:
+        if not ensure_fulltext_index(connection):
+            raise Exception("Full-text search requires SQLite with FTS5")
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        if optimize:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Words are quoted so punctuation cannot form FTS syntax and all of them
+    must match; "quoted phrases" stay phrases and a trailing `*` keeps a
+    prefix match. Returns None when the query has no searchable terms.
+    """
+    terms = []
+    for term in TERM_PATTERN.findall(query or ""):
+        prefix = term.endswith("*")
+        term = term.strip('"*').replace('"', "")
+        if term:
+            terms.append(f'"{term}"*' if prefix else f'"{term}"')
+    return " ".join(terms) or None
+
+
+def search_fulltext(
+    connection,
+    query: str,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """Return active communities matching `query`, best BM25 match first."""
+    if connection.dialect.name != "sqlite":
+        raise ValueError("Full-text search requires SQLite with FTS5")
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    conditions = ["COALESCE(c.is_active, 1) = 1"]
+    params: Dict[str, Any] = {"match": match, "limit": limit}
+    for key, value in (filters or {}).items():
+        if key not in FILTER_COLUMNS:
+            raise ValueError(f"Unsupported filter: {key}")
+        if value is None:
+            continue
+        if key in BOOLEAN_FACETS:
+            value = parse_bool(value)
+        if isinstance(value, str):
+            conditions.append(f"c.{key} = :{key} COLLATE NOCASE")
+        else:
+            conditions.append(f"c.{key} = :{key}")
+        params[key] = value
+
+    # Every match is ranked, but on the FTS table alone with a top-N sort;
+    # only the best candidates are joined to communities and filtered
+    weights = ", ".join(str(weight) for weight in FTS_COLUMNS.values())
+    where = " AND ".join(conditions)
+    ranked = text(
+        f"""
+        WITH ranked AS (
+            SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS score
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH :match
+            ORDER BY score
+            LIMIT :candidates
+        )
+        SELECT c.id, c.name, c.website, c.city, c.country, ranked.score
+        FROM ranked JOIN communities AS c ON c.id = ranked.id
+        WHERE {where}
+        ORDER BY ranked.score
+        LIMIT :limit
+        """
+    )
+    candidates = max(limit, 1) * FTS_CANDIDATE_FACTOR
+    matches = None
+    while True:
+        rows = connection.execute(ranked, {**params, "candidates": candidates}).all()
+        if len(rows) >= limit:
+            break
+        if matches is None:
+            matches = connection.execute(
+                text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"),
+                {"match": match},
+            ).scalar()
+        if candidates >= matches:
+            break
+        candidates *= FTS_CANDIDATE_FACTOR
+    if not rows:
+        return []
+
+    ids = ", ".join(str(row.id) for row in rows)
+    snippets = dict(
+        connection.execute(
+            text(
+                f"SELECT rowid, snippet({FTS_TABLE}, -1, '[', ']', '...', {SNIPPET_TOKENS}) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match AND rowid IN ({ids})"
+            ),
+            {"match": match},
+        ).all()
+    )
+    # bm25() is lower for better matches; report higher-is-better scores
+    return [
+        {**row._asdict(), "score": round(-row.score, 4), "snippet": snippets.get(row.id)}
+        for row in rows
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the community full-text index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every community")
+    parser.add_argument("--search", help="Run a search and print the results")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        started = time.perf_counter()
+        rebuild_fulltext_index()
+        print(f"Rebuilt full-text index in {time.perf_counter() - started:.2f}s")
+    if args.search:
+        with engine.connect() as connection:
+            started = time.perf_counter()
+            results = search_fulltext(connection, args.search, limit=args.limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            print(f"{result['score']:>8.3f}  {result['id']:>8}  {result['name']}  {result['snippet']}")
+        print(f"{len(results)} results in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+"""Opaque handles and cursors used in agent tool responses.
+
+Tools answer the root agent with short summaries that name each community
+by a handle ("b42" for a basic community waiting for enrichment, "c17"
+for an enriched one) and continue lists with opaque cursors, instead of
+echoing whole rows. Everything a tool returns stays in the conversation
+and is re-sent on every later turn, so keeping responses small and of
+bounded size keeps the per-turn context flat over long runs. Full records
+are fetched on demand with get_community_details.
+
+Handles also accept the plain numeric ids used by code calling the tools
+directly.
+"""
+
+import base64
+import json
+from typing import Any, Dict, Optional, Union
+
+BASIC_HANDLE = "b"
+COMMUNITY_HANDLE = "c"
+
+# Characters of long text fields kept in summaries
+SUMMARY_TEXT_LIMIT = 160
+
+
+def make_handle(kind: str, id: int) -> str:
+    """Handle of a basic ("b") or enriched ("c") community."""
+    return f"{kind}{id}"
+
+
+def parse_handle(handle: Union[str, int], kind: str) -> int:
+    """Return the id behind a handle of the given kind, or raise ValueError."""
+    if isinstance(handle, int):
+        return handle
+    value = str(handle).strip()
+    if value[:1].isalpha():
+        if value[0] != kind:
+            raise ValueError(f"Expected a '{kind}' handle, got {handle!r}")
+        value = value[1:]
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid handle: {handle!r}")
+
+
+def handle_kind(handle: Union[str, int]) -> Optional[str]:
+    """Kind of a handle, or None for a plain id."""
+    value = str(handle).strip()
+    return value[0] if value[:1].isalpha() else None
+
+
+def encode_cursor(**state: Any) -> str:
+    """Pack continuation state into an opaque cursor string."""
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+    """Unpack a cursor made by encode_cursor; an empty cursor is the start."""
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(state, dict):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return state
+
+
+def summarize_text(text: Optional[str], limit: int = SUMMARY_TEXT_LIMIT) -> Optional[str]:
+    """Shorten long text for a summary, marking the cut with an ellipsis."""
+    if text is None or len(text) <= limit:
+        return text
+    return text[: limit - 1].rsplit(" ", 1)[0] + "…"
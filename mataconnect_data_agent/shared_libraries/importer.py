@@ -0,0 +1,228 @@
+"""Bulk import of community candidates into basic_communities.
+
+Partner lists of organization names and URLs (CSV or NDJSON) are streamed,
+validated against CommunityInfo, canonicalized and deduplicated against
+existing rows, then inserted and queued for enrichment in chunked
+transactions, without any LLM calls:
+
+    python -m mataconnect_data_agent.shared_libraries.importer partners.csv --source partner:acme
+
+A checkpoint next to the input records how many records are committed, so
+rerunning the same command after a failure resumes after the last chunk.
+Rows repeated by a resume are caught by deduplication anyway.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import CommunityInfo, session_scope
+from .database_tool import insert_basic_communities
+from .urls import registered_domain
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# Input column names accepted for each CommunityInfo field, compared case-insensitively
+NAME_COLUMNS = ["name", "organisation", "organization", "org_name", "community", "title"]
+URL_COLUMNS = ["url", "website", "link", "homepage", "site"]
+NAME_MAX_LENGTH = 255
+URL_MAX_LENGTH = 500
+
+
+def import_format(path: str) -> str:
+    """Input format implied by a file name: csv or ndjson."""
+    return "csv" if path.lower().endswith((".csv", ".tsv")) else "ndjson"
+
+
+def _pick(record: Dict[str, Any], columns: List[str]) -> Optional[str]:
+    for column in columns:
+        value = record.get(column)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def iter_import_records(path: str, format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (record number, record) from a CSV or NDJSON file, streaming it."""
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        if format == "csv":
+            dialect = "excel-tab" if path.lower().endswith(".tsv") else "excel"
+            reader = csv.DictReader(stream, dialect=dialect)
+            for number, record in enumerate(reader, start=1):
+                yield number, {(key or "").strip().lower(): value for key, value in record.items()}
+        else:
+            number = 0
+            for line in stream:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = {"_error": f"invalid JSON: {str(e)}"}
+                if not isinstance(record, dict):
+                    record = {"_error": "record is not an object"}
+                yield number, {str(key).lower(): value for key, value in record.items()}
+
+
+def validate_record(record: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Return the community for an input record, or raise ValueError."""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    name = " ".join((_pick(record, NAME_COLUMNS) or "").split())
+    url = (_pick(record, URL_COLUMNS) or "").strip() or None
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f"name is longer than {NAME_MAX_LENGTH} characters")
+    if url is not None and (len(url) > URL_MAX_LENGTH or registered_domain(url) is None):
+        raise ValueError(f"invalid url: {url}")
+    try:
+        community = CommunityInfo(name=name, url=url, source=source)
+    except ValidationError as e:
+        raise ValueError(str(e))
+    return {"name": community.name, "url": community.url}
+
+
+def _checkpoint_path(path: str) -> str:
+    return f"{path}.import-checkpoint.json"
+
+
+def _read_checkpoint(checkpoint: str, path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(checkpoint, encoding="utf-8") as stream:
+            state = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    # A changed input file starts over
+    if state.get("size") != os.path.getsize(path):
+        return None
+    return state
+
+
+def _write_checkpoint(checkpoint: str, state: Dict[str, Any]) -> None:
+    temporary = f"{checkpoint}.tmp"
+    with open(temporary, "w", encoding="utf-8") as stream:
+        json.dump(state, stream)
+    os.replace(temporary, checkpoint)
+
+
+def import_communities(
+    path: str,
+    source: str = "import",
+    format: Optional[str] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    resume: bool = True,
+    rejects_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Import community candidates from a CSV or NDJSON file.
+
+    Records need a name and may have a URL (see NAME_COLUMNS and
+    URL_COLUMNS for accepted column names). Each chunk of `chunk_size`
+    records is committed in its own transaction, followed by the checkpoint.
+    Invalid records are counted and, with `rejects_path`, written there as
+    NDJSON with their record number and error. Returns the counts.
+    """
+    format = format or import_format(path)
+    checkpoint = _checkpoint_path(path)
+    state = _read_checkpoint(checkpoint, path) if resume else None
+    if state is None:
+        state = {
+            "size": os.path.getsize(path),
+            "records": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "invalid": 0,
+        }
+    elif state["records"]:
+        print(f"Resuming {path} after record {state['records']}")
+
+    started = time.perf_counter()
+    resumed_from = state["records"]
+    rejects = open(rejects_path, "a", encoding="utf-8") if rejects_path else None
+
+    def commit_chunk(chunk: List[Dict[str, Any]], last_record: int, invalid: int) -> None:
+        try:
+            with session_scope() as db:
+                saved = insert_basic_communities(db, chunk, source)
+        except SQLAlchemyError as e:
+            raise Exception(
+                f"Failed to import communities after record {state['records']}: {str(e)}"
+            )
+        state["records"] = last_record
+        state["inserted"] += saved["inserted"]
+        state["duplicates"] += saved["duplicates"]
+        state["invalid"] += invalid
+        _write_checkpoint(checkpoint, state)
+
+        elapsed = time.perf_counter() - started
+        rate = (last_record - resumed_from) / elapsed if elapsed else 0
+        print(
+            f"Imported {last_record} records: {state['inserted']} new, "
+            f"{state['duplicates']} duplicates, {state['invalid']} invalid ({rate:,.0f} records/s)"
+        )
+
+    try:
+        chunk: List[Dict[str, Any]] = []
+        invalid = 0
+        number = state["records"]
+        for number, record in iter_import_records(path, format):
+            if number <= state["records"]:
+                continue
+            try:
+                chunk.append(validate_record(record, source))
+            except ValueError as e:
+                invalid += 1
+                if rejects is not None:
+                    rejects.write(json.dumps({"record": number, "error": str(e)}) + "\n")
+            if number - state["records"] >= chunk_size:
+                commit_chunk(chunk, number, invalid)
+                chunk, invalid = [], 0
+        if number > state["records"]:
+            commit_chunk(chunk, number, invalid)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    # Finished, so a rerun imports the file again instead of resuming
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    stats = {key: state[key] for key in ("records", "inserted", "duplicates", "invalid")}
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import community names and URLs from CSV or NDJSON")
+    parser.add_argument("path", help="Input file (.csv, .tsv or .ndjson)")
+    parser.add_argument("--source", default="import", help="Source recorded on imported communities")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an earlier run")
+    parser.add_argument("--rejects", default=None, help="Write invalid records to this NDJSON file")
+    args = parser.parse_args(argv)
+
+    stats = import_communities(
+        args.path,
+        source=args.source,
+        format=args.format,
+        chunk_size=args.chunk_size,
+        resume=not args.restart,
+        rejects_path=args.rejects,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
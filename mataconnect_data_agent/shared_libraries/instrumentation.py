@@ -0,0 +1,542 @@
+"""Latency, token and SQL instrumentation for agent runs.
+
+Off by default; set INSTRUMENTATION_ENABLED=1 to turn it on without code
+changes. When enabled, every agent in the tree gets ADK model and tool
+callbacks that record per-call latency, input/output tokens and tool
+payload sizes, and SQLAlchemy cursor events time every SQL statement.
+
+Measurements go two ways:
+
+* A JSON summary per run in INSTRUMENTATION_DIR, where a run is one
+  invocation of the root agent (or an `instrumentation_run` block, such as
+  a batch enrichment run). Sub-agent calls and queued writes are attributed
+  to the run that caused them.
+* Cumulative Prometheus metrics, rewritten to METRICS_FILE after every run
+  (for the node_exporter textfile collector) and served on METRICS_PORT
+  at /metrics when that is set.
+
+Built-in google_search runs inside the model call, so its time shows up as
+model latency of the agent that uses it (community_search_agent and
+google_scraper_agent); the number of queries it issued is counted from the
+grounding metadata. Durations of agent tools include the sub-agent's own
+model and tool calls.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "0") == "1"
+INSTRUMENTATION_DIR = os.getenv("INSTRUMENTATION_DIR", ".instrumentation")
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join(INSTRUMENTATION_DIR, "metrics.prom"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Slowest statements kept verbatim in each run summary
+INSTRUMENTATION_SLOW_STATEMENTS = int(os.getenv("INSTRUMENTATION_SLOW_STATEMENTS", "10"))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_OPERATION = re.compile(r"^\s*(\w+)")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+[\"`]?(\w+)", re.IGNORECASE)
+
+
+def _payload_bytes(value: Any) -> int:
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def statement_label(statement: str) -> str:
+    """Short label for a SQL statement: its operation and main table."""
+    operation = _OPERATION.match(statement)
+    if operation is None:
+        return "OTHER"
+    table = _TABLE.search(statement)
+    return f"{operation.group(1).upper()} {table.group(1)}" if table else operation.group(1).upper()
+
+
+class _Histogram:
+    """Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series: Dict[tuple, List[float]] = {}
+
+    def observe(self, key: tuple, value: float) -> None:
+        # Per-bucket counts followed by sum and count
+        series = self.series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            labels = _labels(self.labels, key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count:g}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]:g}")
+        return lines
+
+
+class _Counter:
+    """Prometheus counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, key: tuple, value: float = 1) -> None:
+        self.series[key] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, key)}}} {value:g}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+
+
+class _Registry:
+    """Process-wide cumulative metrics in Prometheus form."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model_seconds = _Histogram(
+            "mataconnect_model_call_seconds", "Latency of model calls.", ("agent", "model", "status")
+        )
+        self.model_tokens = _Counter(
+            "mataconnect_model_tokens_total", "Model tokens by direction.", ("agent", "model", "direction")
+        )
+        self.tool_seconds = _Histogram(
+            "mataconnect_tool_call_seconds", "Latency of tool calls.", ("agent", "tool", "status")
+        )
+        self.tool_bytes = _Counter(
+            "mataconnect_tool_payload_bytes_total", "JSON size of tool arguments and responses.", ("tool", "direction")
+        )
+        self.search_queries = _Counter(
+            "mataconnect_google_search_queries_total", "Queries issued by built-in google_search.", ("agent",)
+        )
+        self.sql_seconds = _Histogram(
+            "mataconnect_sql_statement_seconds", "Latency of SQL statements.", ("statement",)
+        )
+        self.runs = _Counter("mataconnect_runs_total", "Finished instrumented runs.", ("name",))
+
+    def render(self) -> str:
+        with self.lock:
+            lines: List[str] = []
+            for metric in (
+                self.model_seconds,
+                self.model_tokens,
+                self.tool_seconds,
+                self.tool_bytes,
+                self.search_queries,
+                self.sql_seconds,
+                self.runs,
+            ):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = _Registry()
+
+
+class RunMetrics:
+    """Measurements of one run, summarized as JSON when it finishes."""
+
+    def __init__(self, name: str, run_id: Optional[str] = None):
+        self.name = name
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.models: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.tools: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.statements: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.slowest: List[Tuple[float, str]] = []
+        self.search_queries = 0
+
+    def add_model_call(
+        self, agent: str, seconds: float, input_tokens: int, output_tokens: int, queries: int, ok: bool
+    ) -> None:
+        with self.lock:
+            self.search_queries += queries
+            model = self.models[agent]
+            model["calls"] += 1
+            model["errors"] += 0 if ok else 1
+            model["seconds"] += seconds
+            model["max_seconds"] = max(model["max_seconds"], seconds)
+            model["input_tokens"] += input_tokens
+            model["output_tokens"] += output_tokens
+
+    def add_tool_call(self, tool: str, seconds: float, args_bytes: int, response_bytes: int, ok: bool) -> None:
+        with self.lock:
+            stats = self.tools[tool]
+            stats["calls"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["args_bytes"] += args_bytes
+            stats["response_bytes"] += response_bytes
+
+    def add_statement(self, label: str, statement: str, seconds: float) -> None:
+        with self.lock:
+            stats = self.statements[label]
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if len(self.slowest) < INSTRUMENTATION_SLOW_STATEMENTS or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, " ".join(statement.split())[:500]))
+                self.slowest.sort(key=lambda item: -item[0])
+                del self.slowest[INSTRUMENTATION_SLOW_STATEMENTS:]
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-ready summary of the run so far."""
+
+        def rounded(table: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+            return {
+                key: {
+                    field: round(value, 4) if field.endswith("seconds") else int(value)
+                    for field, value in stats.items()
+                }
+                for key, stats in sorted(table.items(), key=lambda item: -item[1]["seconds"])
+            }
+
+        with self.lock:
+            models = rounded(self.models)
+            tools = rounded(self.tools)
+            statements = rounded(self.statements)
+            slowest = [{"seconds": round(seconds, 4), "sql": sql} for seconds, sql in self.slowest]
+            search_queries = self.search_queries
+        return {
+            "run_id": self.run_id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "elapsed_seconds": round(time.perf_counter() - self.started, 3),
+            "totals": {
+                "model_calls": sum(stats["calls"] for stats in models.values()),
+                "model_seconds": round(sum(stats["seconds"] for stats in models.values()), 3),
+                "input_tokens": sum(stats["input_tokens"] for stats in models.values()),
+                "output_tokens": sum(stats["output_tokens"] for stats in models.values()),
+                "google_search_queries": search_queries,
+                "tool_calls": sum(stats["calls"] for stats in tools.values()),
+                "sql_statements": sum(stats["count"] for stats in statements.values()),
+                "sql_seconds": round(sum(stats["seconds"] for stats in statements.values()), 3),
+            },
+            "models": models,
+            "tools": tools,
+            "sql": {"statements": statements, "slowest": slowest},
+        }
+
+
+_current_run: contextvars.ContextVar[Optional[RunMetrics]] = contextvars.ContextVar(
+    "instrumentation_run", default=None
+)
+_runs_by_invocation: Dict[str, RunMetrics] = {}
+# Start times of model calls by (invocation, agent) and of tool calls by function call id
+_model_starts: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_tool_starts: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def current_run(invocation_id: Optional[str] = None) -> Optional[RunMetrics]:
+    """The run being measured in this context, if any."""
+    run = _current_run.get()
+    if run is None and invocation_id is not None:
+        run = _runs_by_invocation.get(invocation_id)
+    return run
+
+
+def start_run(name: str, run_id: Optional[str] = None) -> RunMetrics:
+    """Start measuring a run in the current context."""
+    run = RunMetrics(name, run_id)
+    _current_run.set(run)
+    return run
+
+
+def finish_run(run: RunMetrics) -> Dict[str, Any]:
+    """Stop measuring `run`, write its JSON summary and refresh the metrics file."""
+    if _current_run.get() is run:
+        _current_run.set(None)
+    summary = run.summary()
+    with REGISTRY.lock:
+        REGISTRY.runs.inc((run.name,))
+    try:
+        os.makedirs(INSTRUMENTATION_DIR, exist_ok=True)
+        path = os.path.join(
+            INSTRUMENTATION_DIR, f"{run.name}-{run.started_at:%Y%m%dT%H%M%S}-{run.run_id}.json"
+        )
+        with open(path, "w", encoding="utf-8") as stream:
+            json.dump(summary, stream, indent=2)
+        write_metrics_file()
+    except OSError as e:
+        print(f"Failed to write instrumentation summary: {str(e)}")
+        return summary
+    totals = summary["totals"]
+    print(
+        f"Run {run.run_id} took {summary['elapsed_seconds']}s: model {totals['model_seconds']}s, "
+        f"SQL {totals['sql_seconds']}s, {totals['input_tokens']}+{totals['output_tokens']} tokens ({path})"
+    )
+    return summary
+
+
+@contextlib.contextmanager
+def instrumentation_run(name: str) -> Iterator[Optional[RunMetrics]]:
+    """Measure the block as one run; does nothing unless instrumentation is enabled."""
+    if not INSTRUMENTATION_ENABLED or _current_run.get() is not None:
+        yield _current_run.get()
+        return
+    enable_instrumentation()
+    run = start_run(name)
+    try:
+        yield run
+    finally:
+        finish_run(run)
+
+
+def write_metrics_file(path: Optional[str] = None) -> None:
+    """Write the cumulative metrics in Prometheus text format, atomically."""
+    path = path or METRICS_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as stream:
+        stream.write(REGISTRY.render())
+    os.replace(temporary, path)
+
+
+# ADK callbacks
+
+
+def _start_run_callback(callback_context):
+    if _current_run.get() is None:
+        run = start_run(callback_context.agent_name, callback_context.invocation_id[-12:])
+        _runs_by_invocation[callback_context.invocation_id] = run
+    return None
+
+
+def _finish_run_callback(callback_context):
+    run = _runs_by_invocation.pop(callback_context.invocation_id, None)
+    if run is not None:
+        finish_run(run)
+    return None
+
+
+def _before_model(callback_context, llm_request):
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    with _lock:
+        _model_starts[key] = (time.perf_counter(), llm_request.model or "")
+    return None
+
+
+def _end_model_call(callback_context, llm_response, ok: bool) -> None:
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    with _lock:
+        started, model = _model_starts.pop(key, (None, ""))
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    usage = llm_response.usage_metadata if llm_response is not None else None
+    input_tokens = (usage.prompt_token_count or 0) if usage else 0
+    output_tokens = (usage.candidates_token_count or 0) if usage else 0
+    grounding = llm_response.grounding_metadata if llm_response is not None else None
+    queries = len(grounding.web_search_queries or []) if grounding else 0
+    agent = callback_context.agent_name
+
+    with REGISTRY.lock:
+        REGISTRY.model_seconds.observe((agent, model, "ok" if ok else "error"), seconds)
+        REGISTRY.model_tokens.inc((agent, model, "input"), input_tokens)
+        REGISTRY.model_tokens.inc((agent, model, "output"), output_tokens)
+        if queries:
+            REGISTRY.search_queries.inc((agent,), queries)
+    run = current_run(callback_context.invocation_id)
+    if run is not None:
+        run.add_model_call(agent, seconds, input_tokens, output_tokens, queries, ok)
+
+
+def _after_model(callback_context, llm_response):
+    # Streaming calls report partial chunks first; the call ends with the final one
+    if not getattr(llm_response, "partial", False):
+        _end_model_call(callback_context, llm_response, ok=llm_response.error_code is None)
+    return None
+
+
+def _on_model_error(callback_context, llm_request, error):
+    _end_model_call(callback_context, None, ok=False)
+    return None
+
+
+def _before_tool(tool, args, tool_context):
+    with _lock:
+        _tool_starts[tool_context.function_call_id] = time.perf_counter()
+    return None
+
+
+def _end_tool_call(tool, args, tool_context, response, ok: bool) -> None:
+    with _lock:
+        started = _tool_starts.pop(tool_context.function_call_id, None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    args_bytes = _payload_bytes(args)
+    response_bytes = _payload_bytes(response) if response is not None else 0
+
+    with REGISTRY.lock:
+        REGISTRY.tool_seconds.observe((tool_context.agent_name, tool.name, "ok" if ok else "error"), seconds)
+        REGISTRY.tool_bytes.inc((tool.name, "args"), args_bytes)
+        REGISTRY.tool_bytes.inc((tool.name, "response"), response_bytes)
+    run = current_run(tool_context.invocation_id)
+    if run is not None:
+        run.add_tool_call(tool.name, seconds, args_bytes, response_bytes, ok)
+
+
+def _after_tool(tool, args, tool_context, tool_response):
+    _end_tool_call(tool, args, tool_context, tool_response, ok=True)
+    return None
+
+
+def _on_tool_error(tool, args, tool_context, error):
+    _end_tool_call(tool, args, tool_context, None, ok=False)
+    return None
+
+
+def _prepend(callbacks, callback) -> list:
+    # Chains stop at the first callback that returns a value, so measuring
+    # callbacks go first and always return None
+    callbacks = list(callbacks) if isinstance(callbacks, list) else [callbacks] if callbacks else []
+    return callbacks if callback in callbacks else [callback, *callbacks]
+
+
+def instrument_agent(agent, track_runs: bool = True) -> None:
+    """
+    Add the measuring callbacks to `agent` and every agent below it.
+
+    Sub-agents and agents wrapped in AgentTool are included. With
+    `track_runs`, each invocation of `agent` itself is measured as a run.
+    Safe to call more than once.
+    """
+    enable_instrumentation()
+    if track_runs:
+        agent.before_agent_callback = _prepend(agent.before_agent_callback, _start_run_callback)
+        agent.after_agent_callback = _prepend(agent.after_agent_callback, _finish_run_callback)
+
+    seen = set()
+    pending = [agent]
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if hasattr(current, "before_model_callback"):
+            current.before_model_callback = _prepend(current.before_model_callback, _before_model)
+            current.after_model_callback = _prepend(current.after_model_callback, _after_model)
+            current.on_model_error_callback = _prepend(current.on_model_error_callback, _on_model_error)
+            current.before_tool_callback = _prepend(current.before_tool_callback, _before_tool)
+            current.after_tool_callback = _prepend(current.after_tool_callback, _after_tool)
+            current.on_tool_error_callback = _prepend(current.on_tool_error_callback, _on_tool_error)
+        pending.extend(current.sub_agents)
+        pending.extend(
+            tool.agent for tool in getattr(current, "tools", []) if getattr(tool, "agent", None) is not None
+        )
+
+
+# SQL and exporters
+
+_enabled = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrumentation_starts", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("instrumentation_starts")
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    label = statement_label(statement)
+    with REGISTRY.lock:
+        REGISTRY.sql_seconds.observe((label,), seconds)
+    run = _current_run.get()
+    if run is not None:
+        run.add_statement(label, statement, seconds)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("instrumentation_starts"):
+        connection.info["instrumentation_starts"].pop()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve the cumulative metrics at http://localhost:<port>/metrics from a daemon thread."""
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Serving metrics on port {server.server_address[1]}")
+    return server
+
+
+def enable_instrumentation() -> None:
+    """Start timing SQL statements and exporting metrics. Safe to call more than once."""
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+
+    from sqlalchemy import event
+
+    from .database import engine
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    atexit.register(_write_metrics_at_exit)
+
+
+def _write_metrics_at_exit() -> None:
+    try:
+        write_metrics_file()
+    except OSError:
+        pass
@@ -0,0 +1,123 @@
+"""Persistent cache of communities found per search query.
+
+An entry is keyed by the normalized query and a hash of the scraper's
+prompt and model, and holds the validated communities the search returned.
+Asking the same question again, in any casing, word order or phrasing that
+only differs by filler words, is served from the cache without a model
+call or Google Search until the entry expires after
+SEARCH_CACHE_TTL_SECONDS.
+"""
+
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import SearchCacheDB, session_scope
+from .enrichment_cache import CacheUsage, content_hash
+
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Words that do not change what a search finds
+QUERY_STOPWORDS = {
+    "a", "all", "an", "and", "any", "find", "for", "give", "list", "me", "of",
+    "please", "search", "show", "some", "the",
+}
+_QUERY_WORD = re.compile(r"[\w'-]+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercased query words without filler words, in sorted order."""
+    words = {word for word in _QUERY_WORD.findall(query.lower()) if word not in QUERY_STOPWORDS}
+    return " ".join(sorted(words))
+
+
+class SearchCache:
+    """
+    Search result cache stored in the search_cache table.
+
+    Entries expire after `ttl_seconds`. Hit, miss and store counters are
+    kept per instance.
+    """
+
+    def __init__(self, ttl_seconds: int = SEARCH_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.counters = {"hits": 0, "misses": 0, "stores": 0}
+        self.usage = CacheUsage(SearchCacheDB)
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    @staticmethod
+    def _key(query: str, prompt_hash: str) -> str:
+        return content_hash("\x1f".join([normalize_query(query), prompt_hash]))
+
+    def get(self, query: str, prompt_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached communities for a query, or None when missing or expired."""
+        key = self._key(query, prompt_hash)
+        now = datetime.utcnow()
+        try:
+            with session_scope(write=False) as db:
+                entry = db.get(SearchCacheDB, key)
+                if entry is None or entry.created_at < now - timedelta(seconds=self.ttl_seconds):
+                    self._count("misses")
+                    return None
+                results = list(entry.results)
+            self.usage.record(key, now)
+            self._count("hits")
+            return results
+        except SQLAlchemyError as e:
+            print(f"Search cache read failed: {str(e)}")
+            self._count("misses")
+            return None
+
+    def put(self, query: str, prompt_hash: str, results: List[Dict[str, Any]]) -> None:
+        """Store a query's communities, replacing any entry with the same key."""
+        now = datetime.utcnow()
+        try:
+            with session_scope() as db:
+                db.merge(
+                    SearchCacheDB(
+                        cache_key=self._key(query, prompt_hash),
+                        query=normalize_query(query)[:500],
+                        prompt_hash=prompt_hash,
+                        results=results,
+                        hits=0,
+                        created_at=now,
+                        last_used_at=now,
+                    )
+                )
+            self._count("stores")
+        except SQLAlchemyError as e:
+            print(f"Search cache write failed: {str(e)}")
+
+    def evict(self) -> int:
+        """Remove expired entries."""
+        self.usage.flush()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        try:
+            with session_scope() as db:
+                return db.execute(
+                    delete(SearchCacheDB).where(SearchCacheDB.created_at < cutoff)
+                ).rowcount or 0
+        except SQLAlchemyError as e:
+            print(f"Search cache eviction failed: {str(e)}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for this instance plus the number of stored entries."""
+        self.usage.flush()
+        with session_scope(write=False) as db:
+            entries = db.scalar(select(func.count()).select_from(SearchCacheDB))
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": entries,
+        }
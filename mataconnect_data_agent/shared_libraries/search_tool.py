@@ -0,0 +1,299 @@
+"""Search tools for Google ADK agents."""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import BasicCommunityDB, CommunityDB, EnrichmentTaskDB, session_scope
+from .embeddings import Embedder, get_embedder
+from .export import EXPORT_COLUMNS, JSON_EXPORT_COLUMNS
+from .facets import decode_json_value, filter_conditions, facet_counts
+from .fulltext import search_fulltext
+from .handles import (
+    BASIC_HANDLE,
+    COMMUNITY_HANDLE,
+    decode_cursor,
+    encode_cursor,
+    handle_kind,
+    make_handle,
+    parse_handle,
+    summarize_text,
+)
+from .vector_index import get_shared_index
+
+# Upper bound on results returned per search
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+BROWSE_PAGE_SIZE = 20
+# Facets counted on the first browse page when the caller names none
+BROWSE_DEFAULT_FACETS = ["country", "pricing_model", "is_virtual"]
+# Most common values returned per counted facet
+BROWSE_FACET_VALUES = int(os.getenv("BROWSE_FACET_VALUES", "5"))
+# Upper bound on communities returned per get_community_details call
+DETAILS_MAX_COMMUNITIES = int(os.getenv("DETAILS_MAX_COMMUNITIES", "10"))
+
+_query_embedder: Optional[Embedder] = None
+
+
+def search_communities(
+    query: str, filters: Optional[Dict[str, Any]] = None, limit: int = 10
+) -> Dict[str, Any]:
+    """
+    Keyword search over community names, focus areas, tags, topics, descriptions and locations.
+
+    All words must match; end a word with * to match it as a prefix (e.g.
+    "mentor*"). `filters` narrows results by exact country, city, language,
+    is_virtual, pricing_model, audience_type, verified or data_source.
+    Returns up to `limit` communities, best match first, as their handle,
+    name, website, location and a snippet showing the matching text in
+    [brackets].
+    """
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    try:
+        with session_scope(write=False) as db:
+            communities = search_fulltext(db.connection(), query, filters=filters, limit=limit)
+            return {
+                "communities": [
+                    {"handle": make_handle(COMMUNITY_HANDLE, community.pop("id")), **community}
+                    for community in communities
+                ]
+            }
+    except (SQLAlchemyError, ValueError) as e:
+        raise Exception(f"Failed to search communities: {str(e)}")
+
+
+def search_similar_communities(
+    query: Optional[str] = None, community_id: Optional[str] = None, top_k: int = 10
+) -> Dict[str, Any]:
+    """
+    Find communities matching a free-text need, or similar to a given community.
+
+    Pass `query` (e.g. "job support in the UK for recent graduates") or
+    `community_id`, the handle of an enriched community. Uses cosine
+    similarity over the packed vector index, which is brought up to date
+    with communities changed since the last search. Returns up to `top_k`
+    communities with their handle, name, website, focus areas and score.
+    """
+    global _query_embedder
+    top_k = max(1, min(top_k, SEARCH_MAX_RESULTS))
+    index = get_shared_index()
+    if index is None:
+        return {"communities": [], "error": "No community embeddings are indexed yet"}
+
+    exclude_ids = []
+    if query:
+        if _query_embedder is None:
+            _query_embedder = get_embedder()
+        vector = _query_embedder.embed_query(query)
+        if len(vector) != index.dim:
+            return {
+                "communities": [],
+                "error": "The vector index was built with a different embedder",
+            }
+    elif community_id is not None:
+        try:
+            community_id = parse_handle(community_id, COMMUNITY_HANDLE)
+        except ValueError as e:
+            return {"communities": [], "error": str(e)}
+        vector = index.get(community_id)
+        if vector is None:
+            return {"communities": [], "error": f"Community {community_id} has no embedding"}
+        exclude_ids.append(community_id)
+    else:
+        return {"communities": [], "error": "Provide either a query or a community_id"}
+
+    matches = index.search(vector, top_k=top_k, exclude_ids=exclude_ids)
+    try:
+        with session_scope(write=False) as db:
+            rows = {
+                row.id: row
+                for row in db.execute(
+                    select(
+                        CommunityDB.id,
+                        CommunityDB.name,
+                        CommunityDB.website,
+                        CommunityDB.focus_areas,
+                    ).where(CommunityDB.id.in_([id for id, _ in matches]))
+                )
+            }
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to search similar communities: {str(e)}")
+
+    communities = [
+        {
+            "handle": make_handle(COMMUNITY_HANDLE, id),
+            "name": rows[id].name,
+            "website": rows[id].website,
+            "focus_areas": summarize_text(rows[id].focus_areas),
+            "score": round(score, 4),
+        }
+        for id, score in matches
+        if id in rows
+    ]
+    return {"communities": communities}
+
+
+def browse_communities(
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = BROWSE_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    facets: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    List communities matching structured filters, with counts per facet value.
+
+    `filters` may contain country, city, pricing_model, audience_type and
+    language (case-insensitive), is_virtual and verified (true/false), and
+    tags, topics_supported and event_types (a value or list of values that
+    must all be present). Returns up to `limit` communities in id order and
+    a `next_cursor` to pass as `cursor` for the next page. The first page
+    also has the total and the most common values of each facet named in
+    `facets` (any filter key; country, pricing_model and is_virtual when
+    not given, none for an empty list), which later pages of the same
+    filters would only repeat.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    try:
+        state = decode_cursor(cursor)
+        with session_scope(write=False) as db:
+            conditions = filter_conditions(filters)
+            if "after" in state:
+                conditions.append(CommunityDB.id > state["after"])
+            rows = db.execute(
+                select(
+                    CommunityDB.id,
+                    CommunityDB.name,
+                    CommunityDB.website,
+                    CommunityDB.country,
+                    CommunityDB.city,
+                    CommunityDB.pricing_model,
+                    CommunityDB.is_virtual,
+                    CommunityDB.tags,
+                )
+                .where(*conditions)
+                .order_by(CommunityDB.id)
+                .limit(limit)
+            ).mappings().all()
+            counts = {}
+            if not cursor:
+                counts = facet_counts(
+                    db,
+                    filters,
+                    facets=BROWSE_DEFAULT_FACETS if facets is None else facets,
+                    limit=BROWSE_FACET_VALUES,
+                )
+    except (SQLAlchemyError, ValueError) as e:
+        raise Exception(f"Failed to browse communities: {str(e)}")
+
+    communities = [
+        {
+            "handle": make_handle(COMMUNITY_HANDLE, row["id"]),
+            **{key: value for key, value in row.items() if key != "id"},
+        }
+        for row in rows
+    ]
+    if counts:
+        print(f"Found {counts['total']} communities matching {filters or {}}")
+    return {
+        **counts,
+        "communities": communities,
+        "next_cursor": encode_cursor(after=rows[-1]["id"]) if len(rows) == limit else None,
+    }
+
+
+def get_community_details(
+    handles: List[str], fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Fetch the full records behind community handles returned by other tools.
+
+    "c" handles return the stored enriched community, optionally narrowed
+    to `fields`; "b" handles return the basic community with its enrichment
+    status and the handle of its enriched community once there is one. Up
+    to DETAILS_MAX_COMMUNITIES handles per call. Returns the records in the
+    order asked and the handles that were not found.
+    """
+    if len(handles) > DETAILS_MAX_COMMUNITIES:
+        return {
+            "communities": [],
+            "error": f"Ask for at most {DETAILS_MAX_COMMUNITIES} handles per call",
+        }
+    columns = [column for column in fields or EXPORT_COLUMNS if column in EXPORT_COLUMNS]
+    if "id" not in columns:
+        columns.insert(0, "id")
+
+    wanted: Dict[str, Tuple[str, int]] = {}
+    try:
+        for handle in handles:
+            kind = handle_kind(handle) or COMMUNITY_HANDLE
+            wanted[handle] = (kind, parse_handle(handle, kind))
+    except ValueError as e:
+        return {"communities": [], "error": str(e)}
+
+    found: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    try:
+        with session_scope(write=False) as db:
+            community_ids = [id for kind, id in wanted.values() if kind == COMMUNITY_HANDLE]
+            if community_ids:
+                rows = db.execute(
+                    select(*(getattr(CommunityDB, column) for column in columns)).where(
+                        CommunityDB.id.in_(community_ids)
+                    )
+                ).mappings()
+                for row in rows:
+                    record = {
+                        column: decode_json_value(value)
+                        if column in JSON_EXPORT_COLUMNS
+                        else value.isoformat()
+                        if hasattr(value, "isoformat")
+                        else value
+                        for column, value in row.items()
+                    }
+                    id = record.pop("id")
+                    found[(COMMUNITY_HANDLE, id)] = {
+                        "handle": make_handle(COMMUNITY_HANDLE, id),
+                        **record,
+                    }
+
+            basic_ids = [id for kind, id in wanted.values() if kind == BASIC_HANDLE]
+            if basic_ids:
+                rows = db.execute(
+                    select(
+                        BasicCommunityDB.id,
+                        BasicCommunityDB.name,
+                        BasicCommunityDB.url,
+                        BasicCommunityDB.source,
+                        BasicCommunityDB.created_at,
+                        EnrichmentTaskDB.status,
+                        EnrichmentTaskDB.attempts,
+                        EnrichmentTaskDB.last_error,
+                        EnrichmentTaskDB.community_id,
+                    )
+                    .outerjoin(
+                        EnrichmentTaskDB,
+                        EnrichmentTaskDB.basic_community_id == BasicCommunityDB.id,
+                    )
+                    .where(BasicCommunityDB.id.in_(basic_ids))
+                )
+                for row in rows:
+                    found[(BASIC_HANDLE, row.id)] = {
+                        "handle": make_handle(BASIC_HANDLE, row.id),
+                        "name": row.name,
+                        "url": row.url,
+                        "source": row.source,
+                        "created_at": row.created_at.isoformat() if row.created_at else None,
+                        "enrichment_status": row.status,
+                        "enrichment_attempts": row.attempts,
+                        "enrichment_error": row.last_error,
+                        "community": make_handle(COMMUNITY_HANDLE, row.community_id)
+                        if row.community_id
+                        else None,
+                    }
+    except SQLAlchemyError as e:
+        raise Exception(f"Failed to get community details: {str(e)}")
+
+    return {
+        "communities": [found[key] for key in wanted.values() if key in found],
+        "missing": [handle for handle, key in wanted.items() if key not in found],
+    }
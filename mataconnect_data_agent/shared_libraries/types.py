@@ -1,6 +1,6 @@
 """Shared types and data models for the mataconnect data agent."""
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -21,4 +21,50 @@ class CommunityList(BaseModel):
 json_response_config = {
     "response_mime_type": "application/json",
     "response_schema": CommunityList.model_json_schema()
-} 
\ No newline at end of file
+}
+
+
+class SocialLinks(BaseModel):
+    """Social media profiles of a community."""
+
+    facebook: Optional[str] = None
+    linkedin: Optional[str] = None
+    twitter: Optional[str] = None
+    instagram: Optional[str] = None
+    youtube: Optional[str] = None
+    tiktok: Optional[str] = None
+
+
+class CommunityMetrics(BaseModel):
+    """Size and reach of a community, as stated on its website."""
+
+    members: Optional[str] = None
+    countries_covered: Optional[str] = None
+    years_active: Optional[str] = None
+
+
+class EnrichedCommunityResult(BaseModel):
+    """One enriched community in a batched enrichment response."""
+
+    basic_community_id: int = Field(..., description="ID of the community being enriched, as given in the request")
+    name: str = Field(..., description="Official name of the community or organization")
+    website: str = Field(..., description="URL of the community's main website")
+    description: Optional[str] = None
+    tags: List[str] = []
+    focus_areas: List[str] = []
+    country: Optional[str] = None
+    city: Optional[str] = None
+    language: Optional[str] = None
+    contact_email: Optional[str] = None
+    is_virtual: bool = False
+    social_links: Optional[SocialLinks] = None
+    community_info: Optional[CommunityMetrics] = None
+    pricing_model: Optional[str] = Field(None, description="free, paid or freemium")
+    topics_supported: List[str] = []
+    audience_type: Optional[str] = None
+    event_types: List[str] = []
+    year_founded: Optional[int] = None
+
+
+# Response schema of the batched enricher: one result per requested community
+EnrichedCommunityBatch = list[EnrichedCommunityResult]
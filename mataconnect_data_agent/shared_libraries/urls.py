@@ -0,0 +1,143 @@
+"""URL canonicalization used to deduplicate communities."""
+
+import re
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Query parameters that only track the visit and never change the page
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {
+    "gclid",
+    "fbclid",
+    "msclkid",
+    "yclid",
+    "dclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "_ga",
+    "_gl",
+    "si",
+}
+
+# Trailing path segments that are sub-pages of an organization's home page
+LANDING_PAGE_SEGMENTS = {
+    "about",
+    "about-us",
+    "aboutus",
+    "about_us",
+    "who-we-are",
+    "our-story",
+    "mission",
+    "our-mission",
+    "contact",
+    "contact-us",
+    "contactus",
+    "home",
+    "index",
+    "index.html",
+    "index.htm",
+    "index.php",
+    "default.aspx",
+}
+
+# Second-level labels under country-code TLDs that are public suffixes (co.uk, com.au, ...)
+PUBLIC_SECOND_LEVEL_LABELS = {
+    "ac",
+    "co",
+    "com",
+    "edu",
+    "gov",
+    "ltd",
+    "me",
+    "net",
+    "nhs",
+    "org",
+    "plc",
+    "sch",
+}
+
+_WWW_PREFIX = re.compile(r"^www\d*\.")
+_SCHEME = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+_HOST = re.compile(r"[a-z0-9.-]+")
+
+
+def ensure_scheme(url: str) -> str:
+    """Prefix https:// to a URL written without a scheme, e.g. "example.org/about"."""
+    url = url.strip()
+    return url if _SCHEME.match(url) else f"https://{url.lstrip('/')}"
+
+
+# Saving a URL canonicalizes it several times (dedup key, registered domain)
+@lru_cache(maxsize=65536)
+def canonicalize_url(url: Optional[str]) -> Optional[str]:
+    """
+    Return the canonical form of a community URL, or None for an empty URL.
+
+    The scheme is always https, the host is lowercased without `www.` and
+    default ports, tracking query parameters and fragments are removed,
+    remaining query parameters are sorted, and trailing slashes and landing
+    sub-pages such as /about or /contact-us are stripped. Two URLs for the
+    same organization page therefore share one canonical URL.
+    """
+    if not url or not url.strip():
+        return None
+
+    raw = ensure_scheme(url)
+
+    try:
+        parts = urlsplit(raw)
+        host = (parts.hostname or "").rstrip(".")
+        port = parts.port
+    except ValueError:
+        return raw.lower()
+    if not host or not _HOST.fullmatch(host):
+        return raw.lower()
+
+    host = _WWW_PREFIX.sub("", host)
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    segments = [segment for segment in parts.path.split("/") if segment]
+    while segments and segments[-1].lower() in LANDING_PAGE_SEGMENTS:
+        segments.pop()
+    path = "/" + "/".join(segments) if segments else ""
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    query_string = f"?{urlencode(query)}" if query else ""
+
+    return f"https://{host}{path}{query_string}"
+
+
+def registered_domain(url: Optional[str]) -> Optional[str]:
+    """
+    Return the registrable domain of a URL, e.g. `example.org.uk`.
+
+    Uses a small built-in list of country-code second-level suffixes instead
+    of the full public suffix list, which is enough for grouping sites.
+    """
+    canonical = canonicalize_url(url)
+    if not canonical:
+        return None
+
+    try:
+        host = urlsplit(canonical).hostname
+    except ValueError:
+        return None
+    if not host or not _HOST.fullmatch(host):
+        return None
+
+    labels = host.split(".")
+    if len(labels) <= 2 or re.fullmatch(r"[\d.]+", host):
+        return host
+    if len(labels[-1]) == 2 and labels[-2] in PUBLIC_SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
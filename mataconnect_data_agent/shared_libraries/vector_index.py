@@ -0,0 +1,436 @@
+"""Memory-mapped vector index over CommunityDB.embedding.
+
+Embeddings are L2-normalized and packed into one contiguous float32 matrix
+(or int8 with a per-row scale) memory-mapped from disk, with a parallel
+array of community IDs. Cosine top-k is one vectorized matrix product,
+computed in blocks so memory stays bounded for large indexes.
+
+    index = VectorIndex.open()
+    sync_vector_index(index)
+    index.search(query_vector, top_k=10)
+
+Rebuild from scratch with:
+
+    python -m mataconnect_data_agent.shared_libraries.vector_index --full
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, or_, select
+
+from .database import CHANGE_DELETE, CommunityChangeDB, CommunityDB, session_scope
+
+# Index configuration
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./.vector_index")
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")  # float32 or int8
+VECTOR_INDEX_SYNC_SECONDS = int(os.getenv("VECTOR_INDEX_SYNC_SECONDS", "60"))
+SEARCH_BLOCK_ROWS = 65536
+SYNC_BATCH_SIZE = 1000
+INITIAL_CAPACITY = 1024
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.i64"
+VECTORS_FILES = {"float32": "vectors.f32", "int8": "vectors.i8"}
+SCALES_FILE = "scales.f32"
+
+_EMPTY_ID = -1
+
+
+def _decode_embedding(value) -> Optional[np.ndarray]:
+    """Decode a stored embedding (list or JSON string) into a float32 vector."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        return np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """
+    Packed, memory-mapped embedding matrix aligned to community IDs.
+
+    Row i of the matrix holds the normalized embedding of community ids[i];
+    removed rows keep id -1 and are reused by later inserts. Updates write
+    into the memory map in place and grow the files by doubling.
+    """
+
+    def __init__(self, directory: str, dim: int, dtype: str = VECTOR_INDEX_DTYPE):
+        if dtype not in VECTORS_FILES:
+            raise ValueError(f"Unsupported vector index dtype: {dtype}")
+        self.directory = Path(directory)
+        self.dim = dim
+        self.dtype = dtype
+        self.count = 0  # Rows in use, including removed ones
+        self.capacity = 0
+        self.synced_at: Optional[str] = None  # Latest updated_at or embedded_at indexed
+        self.synced_seq: Optional[int] = None  # Last change log entry applied
+        self.ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.vectors: np.ndarray = np.empty((0, dim), dtype=self._storage_dtype)
+        self.scales: Optional[np.ndarray] = None
+        self._rows: Dict[int, int] = {}
+        self._free_rows: List[int] = []
+        self._lock = threading.RLock()
+
+    @property
+    def _storage_dtype(self):
+        return np.int8 if self.dtype == "int8" else np.float32
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @classmethod
+    def open(
+        cls, directory: str = VECTOR_INDEX_DIR, dtype: str = VECTOR_INDEX_DTYPE
+    ) -> Optional["VectorIndex"]:
+        """Open an existing index, or return None if there is none yet."""
+        meta_path = Path(directory) / META_FILE
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        index = cls(directory, meta["dim"], meta["dtype"])
+        index.count = meta["count"]
+        index.synced_at = meta.get("synced_at")
+        index.synced_seq = meta.get("synced_seq")
+        index._map(meta["capacity"])
+        live = index.ids[: index.count]
+        index._rows = {int(id): row for row, id in enumerate(live) if id != _EMPTY_ID}
+        index._free_rows = [int(row) for row in np.flatnonzero(live == _EMPTY_ID)]
+        return index
+
+    def _map(self, capacity: int) -> None:
+        """Memory-map the index files, growing them to `capacity` rows."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        itemsize = np.dtype(self._storage_dtype).itemsize
+        files = [
+            (IDS_FILE, np.int64, (capacity,), 8),
+            (VECTORS_FILES[self.dtype], self._storage_dtype, (capacity, self.dim), itemsize * self.dim),
+        ]
+        if self.dtype == "int8":
+            files.append((SCALES_FILE, np.float32, (capacity,), 4))
+
+        mapped = []
+        for name, dtype, shape, row_bytes in files:
+            path = self.directory / name
+            old_rows = path.stat().st_size // row_bytes if path.exists() else 0
+            with open(path, "ab") as file:
+                file.truncate(capacity * row_bytes)
+            array = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+            if name == IDS_FILE and old_rows < capacity:
+                array[old_rows:] = _EMPTY_ID
+            mapped.append(array)
+
+        self.ids, self.vectors = mapped[0], mapped[1]
+        self.scales = mapped[2] if self.dtype == "int8" else None
+        self.capacity = capacity
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows > self.capacity:
+            capacity = max(INITIAL_CAPACITY, self.capacity)
+            while capacity < rows:
+                capacity *= 2
+            self.flush()
+            self._map(capacity)
+
+    def upsert(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        """Insert or replace the embeddings of the given community IDs."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        vectors = _normalize(vectors)
+
+        with self._lock:
+            new_ids = [int(id) for id in ids if int(id) not in self._rows]
+            reused = min(len(new_ids), len(self._free_rows))
+            self._ensure_capacity(self.count + len(new_ids) - reused)
+
+            rows = []
+            for id in ids:
+                id = int(id)
+                row = self._rows.get(id)
+                if row is None:
+                    row = self._free_rows.pop() if self._free_rows else self._append_row()
+                    self._rows[id] = row
+                    self.ids[row] = id
+                rows.append(row)
+
+            rows = np.asarray(rows)
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                self.vectors[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self.scales[rows] = scales
+            else:
+                self.vectors[rows] = vectors
+
+    def _append_row(self) -> int:
+        row = self.count
+        self.count += 1
+        return row
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Remove the given community IDs; their rows are reused later."""
+        removed = 0
+        with self._lock:
+            for id in ids:
+                row = self._rows.pop(int(id), None)
+                if row is None:
+                    continue
+                self.ids[row] = _EMPTY_ID
+                self.vectors[row] = 0
+                self._free_rows.append(row)
+                removed += 1
+        return removed
+
+    def get(self, community_id: int) -> Optional[np.ndarray]:
+        """Return the stored (normalized) vector of a community."""
+        row = self._rows.get(int(community_id))
+        if row is None:
+            return None
+        vector = np.asarray(self.vectors[row], dtype=np.float32)
+        if self.dtype == "int8":
+            vector = vector * self.scales[row]
+        return vector
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 10,
+        exclude_ids: Iterable[int] = (),
+    ) -> List[Tuple[int, float]]:
+        """Return the `top_k` (community_id, cosine similarity) pairs, best first."""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim or self.count == 0 or top_k <= 0:
+            return []
+        query = query / (np.linalg.norm(query) or 1.0)
+        excluded = {int(id) for id in exclude_ids}
+        wanted = top_k + len(excluded)
+
+        best_ids: List[np.ndarray] = []
+        best_scores: List[np.ndarray] = []
+        with self._lock:
+            for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self.count)
+                block = self.vectors[start:end]
+                if self.dtype == "int8":
+                    scores = (block @ query) * self.scales[start:end]
+                else:
+                    scores = block @ query
+                ids = np.asarray(self.ids[start:end])
+                scores = np.where(ids == _EMPTY_ID, -np.inf, scores)
+
+                if len(scores) > wanted:
+                    keep = np.argpartition(-scores, wanted - 1)[:wanted]
+                    scores, ids = scores[keep], ids[keep]
+                best_ids.append(ids)
+                best_scores.append(scores)
+
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores, kind="stable")
+        results = []
+        for position in order:
+            if not np.isfinite(scores[position]):
+                break
+            id = int(ids[position])
+            if id in excluded:
+                continue
+            results.append((id, float(scores[position])))
+            if len(results) == top_k:
+                break
+        return results
+
+    def flush(self) -> None:
+        """Write the memory maps and metadata to disk."""
+        with self._lock:
+            for array in (self.ids, self.vectors, self.scales):
+                if isinstance(array, np.memmap):
+                    array.flush()
+            meta = {
+                "dim": self.dim,
+                "dtype": self.dtype,
+                "count": self.count,
+                "capacity": self.capacity,
+                "synced_at": self.synced_at,
+                "synced_seq": self.synced_seq,
+            }
+            meta_path = self.directory / META_FILE
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = meta_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(tmp_path, meta_path)
+
+
+def _deleted_ids(db, index: VectorIndex, full: bool, last_seq: int) -> List[int]:
+    """IDs of indexed communities deleted since the index was last synced."""
+    if not full and index.synced_seq is not None:
+        return db.scalars(
+            select(CommunityChangeDB.community_id).where(
+                CommunityChangeDB.seq > index.synced_seq,
+                CommunityChangeDB.seq <= last_seq,
+                CommunityChangeDB.op == CHANGE_DELETE,
+            )
+        ).all()
+    # Full syncs, and indexes synced before deletes were tracked, drop
+    # whatever no longer exists
+    existing = set(db.scalars(select(CommunityDB.id)))
+    return [id for id in index._rows if id not in existing]
+
+
+def sync_vector_index(
+    index: Optional[VectorIndex] = None,
+    directory: str = VECTOR_INDEX_DIR,
+    dtype: str = VECTOR_INDEX_DTYPE,
+    full: bool = False,
+) -> Optional[VectorIndex]:
+    """
+    Bring the index up to date with CommunityDB and return it.
+
+    Only communities updated or embedded since the last sync are read, in
+    keyset-paged batches. Active communities with an embedding are
+    upserted; inactive ones, those without an embedding and those the
+    change log shows deleted are removed. With `full`, every community is
+    re-read. Returns None while no community has an embedding.
+    """
+    if index is None:
+        index = VectorIndex.open(directory, dtype)
+    since = None if full or index is None else index.synced_at
+
+    with session_scope(write=False) as db:
+        # Read in the same snapshot as the rows, so no delete is missed
+        last_seq = db.scalar(select(func.max(CommunityChangeDB.seq))) or 0
+        if index is not None:
+            index.remove(_deleted_ids(db, index, since is None, last_seq))
+
+        last_id = 0
+        latest = since
+        while True:
+            query = (
+                select(
+                    CommunityDB.id,
+                    CommunityDB.embedding,
+                    CommunityDB.is_active,
+                    CommunityDB.updated_at,
+                    CommunityDB.embedded_at,
+                )
+                .where(CommunityDB.id > last_id)
+                .order_by(CommunityDB.id)
+                .limit(SYNC_BATCH_SIZE)
+            )
+            if since:
+                # Rows stamped at the watermark itself are re-read, never skipped
+                watermark = datetime.fromisoformat(since)
+                query = query.where(
+                    or_(CommunityDB.updated_at >= watermark, CommunityDB.embedded_at >= watermark)
+                )
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            upsert_ids, upsert_vectors, remove_ids = [], [], []
+            for row in rows:
+                vector = _decode_embedding(row.embedding) if row.is_active is not False else None
+                if index is None and vector is not None:
+                    index = VectorIndex(directory, dim=len(vector), dtype=dtype)
+                    index._map(INITIAL_CAPACITY)
+                if vector is not None and index is not None and len(vector) == index.dim:
+                    upsert_ids.append(row.id)
+                    upsert_vectors.append(vector)
+                else:
+                    remove_ids.append(row.id)
+                for stamp in (row.updated_at, row.embedded_at):
+                    if stamp and (latest is None or stamp.isoformat() > latest):
+                        latest = stamp.isoformat()
+
+            if index is not None:
+                if upsert_ids:
+                    index.upsert(upsert_ids, np.stack(upsert_vectors))
+                index.remove(remove_ids)
+
+    if index is not None:
+        index.synced_at = latest
+        index.synced_seq = last_seq
+        index.flush()
+    return index
+
+
+# Index shared by tool calls in this process
+_shared_index: Optional[VectorIndex] = None
+_shared_synced = 0.0
+_shared_meta_mtime: Optional[int] = None
+_shared_lock = threading.Lock()
+
+
+def _meta_mtime(directory: str) -> Optional[int]:
+    try:
+        return (Path(directory) / META_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_shared_index() -> Optional[VectorIndex]:
+    """
+    Return the process-wide index, syncing it at most every few seconds.
+
+    The index is reopened from disk first if another process rewrote it,
+    e.g. after a rebuild with a different embedding size.
+    """
+    global _shared_index, _shared_synced, _shared_meta_mtime
+    with _shared_lock:
+        if _shared_index is None or time.monotonic() - _shared_synced > VECTOR_INDEX_SYNC_SECONDS:
+            if _shared_index is not None and _meta_mtime(VECTOR_INDEX_DIR) != _shared_meta_mtime:
+                _shared_index = VectorIndex.open(VECTOR_INDEX_DIR)
+            _shared_index = sync_vector_index(_shared_index, directory=VECTOR_INDEX_DIR)
+            _shared_synced = time.monotonic()
+            _shared_meta_mtime = _meta_mtime(VECTOR_INDEX_DIR)
+        return _shared_index
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or update the community vector index")
+    parser.add_argument("--full", action="store_true", help="Re-read every community")
+    parser.add_argument("--dir", default=VECTOR_INDEX_DIR, help="Index directory")
+    parser.add_argument("--dtype", choices=sorted(VECTORS_FILES), default=VECTOR_INDEX_DTYPE)
+    args = parser.parse_args(argv)
+
+    if args.full:
+        shutil.rmtree(args.dir, ignore_errors=True)
+    started = time.perf_counter()
+    index = sync_vector_index(directory=args.dir, dtype=args.dtype, full=args.full)
+    if index is None:
+        print("No community embeddings to index")
+        return
+    print(
+        f"Indexed {len(index)} communities ({index.dim} dims, {index.dtype}) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main(sys.argv[1:])
@@ -0,0 +1,54 @@
+"""Website tools for Google ADK agents."""
+
+import os
+from typing import Any, Dict, List
+
+from .extraction import extract_page_digest
+from .fetcher import get_shared_fetcher
+
+# Approximate tokens of page text returned per website
+FETCH_TOOL_TOKEN_BUDGET = int(os.getenv("FETCH_TOOL_TOKEN_BUDGET", "1200"))
+# Websites fetched per tool call
+FETCH_TOOL_MAX_URLS = int(os.getenv("FETCH_TOOL_MAX_URLS", "20"))
+
+
+async def fetch_community_websites(urls: List[str]) -> Dict[str, Any]:
+    """
+    Fetch community websites concurrently and return a compact digest of each.
+
+    Pages are fetched over a shared connection pool with per-host politeness
+    and robots.txt checks, and unchanged pages are served from a revalidated
+    disk cache. Each page is reduced to its about, mission and contact text
+    within a token budget, plus the emails, social links and same-site
+    about/contact links found on it.
+    """
+    fetcher = await get_shared_fetcher()
+    results = await fetcher.fetch_many(list(dict.fromkeys(urls))[:FETCH_TOOL_MAX_URLS])
+
+    websites = []
+    for result in results:
+        website = {
+            "url": result.url,
+            "final_url": result.final_url,
+            "status": result.status,
+            "error": result.error,
+        }
+        if result.text:
+            digest = extract_page_digest(
+                result.text,
+                url=result.final_url or result.url,
+                token_budget=FETCH_TOOL_TOKEN_BUDGET,
+            )
+            website.update(
+                title=digest.title,
+                description=digest.description,
+                language=digest.language,
+                content=digest.text,
+                emails=digest.emails,
+                social_links=digest.social_links,
+                links=digest.links,
+            )
+        websites.append(website)
+
+    print(f"Fetched {len(websites)} websites")
+    return {"websites": websites}
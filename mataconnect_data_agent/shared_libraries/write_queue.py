@@ -0,0 +1,161 @@
+"""Single background writer that group-commits save requests.
+
+Tools hand their write as a function of a session to `run_write`. One
+writer thread takes every request queued while it was committing the
+previous group (up to WRITE_BATCH_MAX, optionally waiting up to
+WRITE_BATCH_WINDOW_MS for more), runs each inside its own SAVEPOINT and
+commits them all in one transaction. Each caller gets its own result or
+exception back through a future. Concurrent callers therefore never contend
+for the database lock and share one fsync per group, while a lone caller
+is committed without delay.
+"""
+
+import atexit
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import session_scope
+
+# Writer configuration
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "1") == "1"
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "0"))
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Background thread that applies queued writes in group commits.
+
+    A request that raises only rolls back its own savepoint. If the group
+    commit itself fails, every request of the group is retried in its own
+    transaction so one bad request cannot fail the others.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = WRITE_BATCH_MAX,
+        window_seconds: float = WRITE_BATCH_WINDOW_MS / 1000,
+    ):
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.stats = {"requests": 0, "groups": 0, "failed": 0, "retried_groups": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue `fn(db, *args, **kwargs)` and return a future of its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Writes cannot be queued from inside a queued write")
+        future: Future = Future()
+        # The write runs in the caller's context, so context-scoped state such
+        # as the instrumentation run follows it onto the writer thread
+        self._queue.put((contextvars.copy_context(), fn, args, kwargs, future))
+        return future
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Apply the queued writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _collect(self, first) -> Tuple[List[tuple], bool]:
+        """Gather requests for one group; returns them and whether to stop."""
+        group = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(group) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            group, stop = self._collect(item)
+            self._commit_group(group)
+            if stop:
+                return
+
+    def _commit_group(self, group: List[tuple]) -> None:
+        outcomes: List[Tuple[bool, Any]] = []
+        try:
+            with session_scope() as db:
+                for context, fn, args, kwargs, _ in group:
+                    try:
+                        with db.begin_nested():
+                            outcomes.append((True, context.run(fn, db, *args, **kwargs)))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except SQLAlchemyError as e:
+            print(f"Group commit of {len(group)} writes failed, retrying one by one: {str(e)}")
+            self.stats["retried_groups"] += 1
+            outcomes = [self._run_alone(request) for request in group]
+
+        self.stats["requests"] += len(group)
+        self.stats["groups"] += 1
+        for (ok, value), (*_, future) in zip(outcomes, group):
+            if ok:
+                future.set_result(value)
+            else:
+                self.stats["failed"] += 1
+                future.set_exception(value)
+
+    @staticmethod
+    def _run_alone(request: tuple) -> Tuple[bool, Any]:
+        context, fn, args, kwargs, _ = request
+        try:
+            with session_scope() as db:
+                result = context.run(fn, db, *args, **kwargs)
+            return True, result
+        except Exception as e:
+            return False, e
+
+
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> GroupCommitWriter:
+    """Return the process-wide writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def run_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run `fn(db, *args, **kwargs)` as a committed write and return its result.
+
+    Goes through the group-commit writer unless WRITE_QUEUE_ENABLED is off,
+    in which case it runs in its own transaction. `fn` must not commit and
+    should return plain data, not ORM objects.
+    """
+    if not WRITE_QUEUE_ENABLED:
+        with session_scope() as db:
+            return fn(db, *args, **kwargs)
+    return get_writer().submit(fn, *args, **kwargs).result()
+
+
+def get_write_queue_stats() -> Dict[str, int]:
+    """Requests, groups and failures handled by the writer so far."""
+    return dict(_writer.stats) if _writer is not None else {}
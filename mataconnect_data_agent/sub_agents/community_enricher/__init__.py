@@ -1 +1 @@
-from .agent import community_enricher_agent
+from .agent import community_batch_enricher_agent, community_enricher_agent
@@ -2,8 +2,28 @@
 
 from google.adk.agents import Agent
 from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+
+from ...shared_libraries.types import EnrichedCommunityBatch
+from ...shared_libraries.web_tool import fetch_community_websites
+from .prompts import (
+    get_community_batch_enricher_instruction,
+    get_community_enricher_instruction,
+    get_community_search_instruction,
+)
 
-from .prompts import get_community_enricher_instruction
+
+# Built-in google_search cannot share an agent with function tools, so the
+# enricher reaches it through a dedicated search agent.
+community_search_agent = Agent(
+    model="gemini-2.0-flash",
+    name="community_search_agent",
+    description="Searches Google for information about a specific community or organization",
+    instruction=get_community_search_instruction(),
+    tools=[
+        google_search,
+    ],
+)
 
 
 community_enricher_agent = Agent(
@@ -12,8 +32,22 @@ community_enricher_agent = Agent(
     description="Enriches basic community data with detailed information by scraping websites and using LLM analysis",
     instruction=get_community_enricher_instruction(),
     tools=[
-        google_search,
+        fetch_community_websites,
+        AgentTool(agent=community_search_agent),
     ],
     disallow_transfer_to_parent=False,
     disallow_transfer_to_peers=False,
 )
+
+
+# Enriches several communities per model call from digests the batch runner
+# has already fetched, so it needs no tools and can use a response schema.
+community_batch_enricher_agent = Agent(
+    model="gemini-2.0-flash",
+    name="community_batch_enricher_agent",
+    description="Enriches several basic communities at once from digests of their websites",
+    instruction=get_community_batch_enricher_instruction(),
+    output_schema=EnrichedCommunityBatch,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+)
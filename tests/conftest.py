@@ -0,0 +1,24 @@
+"""Shared fixtures: tests that touch the database run against a temporary SQLite file."""
+
+import os
+import tempfile
+
+# Set before the package is imported, so its engines never open the real database
+_TEST_DIR = tempfile.mkdtemp(prefix="mataconnect-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TEST_DIR}/test.db"
+os.environ["VECTOR_INDEX_DIR"] = os.path.join(_TEST_DIR, "vector_index")
+os.environ["FETCH_CACHE_DIR"] = os.path.join(_TEST_DIR, "fetch_cache")
+os.environ["INSTRUMENTATION_DIR"] = os.path.join(_TEST_DIR, "instrumentation")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """An initialized, empty database for one test."""
+    from mataconnect_data_agent.shared_libraries.database import Base, init_db, write_engine
+
+    init_db()
+    with write_engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
@@ -0,0 +1,88 @@
+"""Tests for the community change log and its cursor."""
+
+from sqlalchemy import delete
+
+from mataconnect_data_agent.shared_libraries.changes import (
+    compact_changes,
+    deactivate_communities,
+    get_community_changes,
+    record_changes,
+)
+from mataconnect_data_agent.shared_libraries.database import (
+    CHANGE_DELETE,
+    CommunityDB,
+    session_scope,
+)
+from mataconnect_data_agent.shared_libraries.database_tool import save_enriched_communities_to_db
+from mataconnect_data_agent.shared_libraries.embeddings import HashingEmbedder, embed_communities
+from mataconnect_data_agent.shared_libraries.handles import COMMUNITY_HANDLE, parse_handle
+
+
+def _save(*names, **fields):
+    saved = save_enriched_communities_to_db(
+        [{"name": name, "website": f"https://{name.lower()}.org", **fields} for name in names]
+    )
+    return [parse_handle(handle, COMMUNITY_HANDLE) for handle in saved["handles"]]
+
+
+def _ops(page):
+    return [(change["community_id"], change["op"]) for change in page["changes"]]
+
+
+def test_cursor_pages_through_changes_once(database):
+    a, b, c = _save("Alpha", "Beta", "Gamma")
+
+    first = get_community_changes(after_seq=0, limit=2)
+    assert _ops(first) == [(a, "upsert"), (b, "upsert")]
+    assert first["has_more"]
+    second = get_community_changes(after_seq=first["next_cursor"], limit=2)
+    assert _ops(second) == [(c, "upsert")]
+    assert not second["has_more"]
+
+    caught_up = get_community_changes(after_seq=second["next_cursor"])
+    assert caught_up["changes"] == []
+    assert caught_up["next_cursor"] == second["next_cursor"]
+
+
+def test_page_returns_latest_change_with_current_data(database):
+    [a] = _save("Alpha")
+    cursor = get_community_changes()["next_cursor"]
+    _save("Alpha", city="Leeds")
+    _save("Alpha", city="York")
+
+    page = get_community_changes(after_seq=cursor)
+    assert _ops(page) == [(a, "upsert")]
+    assert page["changes"][0]["community"]["city"] == "York"
+    assert "community" not in get_community_changes(after_seq=cursor, include_data=False)["changes"][0]
+
+
+def test_deactivations_and_deletes_are_logged(database):
+    a, b = _save("Alpha", "Beta")
+    cursor = get_community_changes()["next_cursor"]
+
+    assert deactivate_communities([a])["deactivated"] == 1
+    with session_scope() as db:
+        db.execute(delete(CommunityDB).where(CommunityDB.id == b))
+        record_changes(db.connection(), [b], CHANGE_DELETE)
+
+    page = get_community_changes(after_seq=cursor)
+    assert _ops(page) == [(a, "deactivate"), (b, "delete")]
+    assert page["changes"][0]["community"]["is_active"] is False
+    assert page["changes"][1]["community"] is None
+
+
+def test_compaction_keeps_a_full_sync_from_zero(database):
+    a, b = _save("Alpha", "Beta")
+    _save("Alpha", city="Leeds")
+    deactivate_communities([b])
+
+    assert compact_changes() == 2
+    assert _ops(get_community_changes(after_seq=0)) == [(a, "upsert"), (b, "deactivate")]
+
+
+def test_embedding_writes_are_not_changes(database):
+    _save("Alpha", description="Mentoring for women in tech")
+    cursor = get_community_changes()["next_cursor"]
+
+    assert embed_communities(HashingEmbedder(), index_dir=None)["embedded"] == 1
+    assert get_community_changes(after_seq=cursor)["changes"] == []
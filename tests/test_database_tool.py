@@ -0,0 +1,66 @@
+"""Tests for the chunked enriched-community upsert."""
+
+from sqlalchemy import func, select
+
+from mataconnect_data_agent.shared_libraries import database_tool
+from mataconnect_data_agent.shared_libraries.database import CommunityDB, session_scope
+from mataconnect_data_agent.shared_libraries.database_tool import save_enriched_communities_to_db
+
+
+def _community(i, **fields):
+    return {"name": f"Community {i}", "website": f"https://community{i}.org", **fields}
+
+
+def _rows():
+    with session_scope(write=False) as db:
+        rows = db.execute(
+            select(CommunityDB.website, CommunityDB.name, CommunityDB.country, CommunityDB.city)
+        )
+        return {row.website: row for row in rows}
+
+
+def test_batch_reports_inserts_and_updates_in_order(database, monkeypatch):
+    monkeypatch.setattr(database_tool, "ENRICHED_UPSERT_CHUNK_SIZE", 2)
+    save_enriched_communities_to_db([_community(1)])
+    saved = save_enriched_communities_to_db([_community(i, country="UK") for i in range(5)])
+    assert (saved["inserted"], saved["updated"], saved["failed"]) == (4, 1, 0)
+    assert all(saved["handles"])
+    assert len(set(saved["handles"])) == 5
+    assert _rows()["https://community1.org"].country == "UK"
+
+
+def test_invalid_records_fail_alone(database):
+    saved = save_enriched_communities_to_db(
+        [_community(1), {"name": "No website"}, _community(2, colour="red")]
+    )
+    assert (saved["inserted"], saved["failed"]) == (1, 2)
+    assert saved["handles"][1] is None and saved["handles"][2] is None
+    assert [failure["index"] for failure in saved["failures"]] == [1, 2]
+
+
+def test_failing_row_falls_back_to_row_by_row(database):
+    # A set is not JSON serializable, so the whole chunk statement fails
+    saved = save_enriched_communities_to_db(
+        [_community(1, tags=["tech"]), _community(2, tags={"tech"}), _community(3, tags=["art"])]
+    )
+    assert (saved["inserted"], saved["failed"]) == (2, 1)
+    assert [failure["index"] for failure in saved["failures"]] == [1]
+    assert set(_rows()) == {"https://community1.org", "https://community3.org"}
+
+
+def test_records_for_one_website_are_reported_as_merged(database):
+    saved = save_enriched_communities_to_db(
+        [
+            _community(1, country="UK"),
+            _community(2),
+            {"name": "Community One", "website": "https://www.community1.org/", "city": "Leeds"},
+        ]
+    )
+    assert (saved["inserted"], saved["updated"], saved["merged"]) == (2, 0, 1)
+    assert saved["merges"] == [{"index": 2, "merged_into": 0}]
+    assert saved["handles"][2] == saved["handles"][0]
+
+    row = _rows()["https://community1.org"]
+    assert (row.name, row.country, row.city) == ("Community 1", "UK", "Leeds")
+    with session_scope(write=False) as db:
+        assert db.scalar(select(func.count()).select_from(CommunityDB)) == 2
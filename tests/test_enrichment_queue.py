@@ -0,0 +1,107 @@
+"""Tests for leasing and claiming enrichment tasks."""
+
+from sqlalchemy import select
+
+from mataconnect_data_agent.shared_libraries.database import (
+    ENRICHMENT_DONE,
+    ENRICHMENT_FAILED,
+    ENRICHMENT_IN_PROGRESS,
+    EnrichmentTaskDB,
+    session_scope,
+)
+from mataconnect_data_agent.shared_libraries.database_tool import save_community_info_to_db
+from mataconnect_data_agent.shared_libraries.enrichment_queue import (
+    claim_enrichment_batch,
+    complete_enrichment,
+    fail_enrichment,
+    get_enrichment_queue_stats,
+)
+
+
+def _seed(count):
+    save_community_info_to_db(
+        {
+            "communities": [
+                {"name": f"Community {i}", "url": f"https://community{i}.org"}
+                for i in range(count)
+            ]
+        }
+    )
+
+
+def _claim(worker_id, **kwargs):
+    with session_scope() as db:
+        return [community.id for community in claim_enrichment_batch(db, worker_id=worker_id, **kwargs)]
+
+
+def _task(basic_community_id):
+    with session_scope(write=False) as db:
+        task = db.get(EnrichmentTaskDB, basic_community_id)
+        return task.status, task.attempts, task.lease_owner, task.last_error
+
+
+def _task_ids():
+    with session_scope(write=False) as db:
+        return db.scalars(
+            select(EnrichmentTaskDB.basic_community_id).order_by(EnrichmentTaskDB.basic_community_id)
+        ).all()
+
+
+def test_runners_never_lease_the_same_task(database):
+    _seed(5)
+    first = _claim("a", limit=3)
+    second = _claim("b", limit=3)
+    assert len(first) == 3
+    assert len(second) == 2
+    assert not set(first) & set(second)
+    assert _claim("c", limit=3) == []
+
+
+def test_claim_pages_after_cursor(database):
+    _seed(4)
+    ids = _task_ids()
+    assert _claim("a", limit=2, after_id=ids[1]) == ids[2:]
+
+
+def test_expired_lease_is_claimed_again_with_a_new_attempt(database):
+    _seed(1)
+    [id] = _claim("a", lease_seconds=-1)
+    assert _claim("b") == [id]
+    assert _task(id)[:3] == (ENRICHMENT_IN_PROGRESS, 2, "b")
+
+
+def test_failed_task_is_retried_until_out_of_attempts(database):
+    _seed(1)
+    [id] = _task_ids()
+    for _ in range(2):
+        assert _claim("a", max_attempts=2) == [id]
+        with session_scope() as db:
+            fail_enrichment(db, id, "timeout")
+    assert _claim("a", max_attempts=2) == []
+    assert _task(id) == (ENRICHMENT_FAILED, 2, None, "timeout")
+
+
+def test_expired_lease_out_of_attempts_is_marked_failed(database):
+    _seed(1)
+    [id] = _claim("a", max_attempts=1, lease_seconds=-1)
+    assert _claim("b", max_attempts=1) == []
+    assert _task(id) == (ENRICHMENT_FAILED, 1, None, "lease expired")
+    with session_scope(write=False) as db:
+        assert get_enrichment_queue_stats(db)[ENRICHMENT_FAILED] == 1
+
+
+def test_reclaiming_own_lease_keeps_attempts(database):
+    _seed(1)
+    [id] = _claim("run-1", max_attempts=1)
+    assert _claim("run-2", max_attempts=1) == []
+    assert _claim("run-1", max_attempts=1, reclaim_own=True) == [id]
+    assert _task(id)[:3] == (ENRICHMENT_IN_PROGRESS, 1, "run-1")
+
+
+def test_completed_task_is_not_claimed_again(database):
+    _seed(1)
+    [id] = _claim("a")
+    with session_scope() as db:
+        complete_enrichment(db, community_id=1, basic_community_id=id)
+    assert _task(id)[0] == ENRICHMENT_DONE
+    assert _claim("b", lease_seconds=-1) == []
@@ -0,0 +1,52 @@
+"""Tests for the page digest extraction."""
+
+import pytest
+
+from mataconnect_data_agent.shared_libraries.extraction import extract_page_digest
+
+CONTENT = " ".join(
+    f"Women in Tech Leeds runs mentoring circle number {i} for career changers and returners."
+    for i in range(10)
+)
+
+
+def _page(wrapper_class: str) -> str:
+    return f"""<html><body>
+<div class="cookie-banner"><p>We use cookies.</p><button>Accept</button></div>
+<div class="{wrapper_class}"><h1>Women in Tech Leeds</h1><p>{CONTENT}</p></div>
+<footer><p>Contact: hello@witu.org</p></footer>
+</body></html>"""
+
+
+@pytest.mark.parametrize(
+    "wrapper_class",
+    [
+        "site-content has-sidebar",
+        "hero-banner",
+        "shared-values",
+        "sponsors-and-partners",
+        "main-menu-open",
+    ],
+)
+def test_content_wrappers_are_kept(wrapper_class):
+    digest = extract_page_digest(_page(wrapper_class))
+    assert "mentoring circle number 9" in digest.text
+    assert "hello@witu.org" in digest.emails
+
+
+def test_short_boilerplate_is_dropped():
+    digest = extract_page_digest(_page("content"))
+    assert "We use cookies" not in digest.text
+    assert "Accept" not in digest.text
+
+
+def test_boilerplate_is_matched_by_whole_class_tokens():
+    html = """<html><body>
+<div class="newsletter-signup"><p>Join our mailing list</p></div>
+<div class="shared-values"><p>We value kindness.</p></div>
+<div class="nav_menu"><p>Home About Events</p></div>
+</body></html>"""
+    digest = extract_page_digest(html)
+    assert "We value kindness." in digest.text
+    assert "mailing list" not in digest.text
+    assert "Home About Events" not in digest.text
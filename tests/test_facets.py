@@ -0,0 +1,82 @@
+"""Tests for facet filters in browse_communities and search_communities."""
+
+import pytest
+
+from mataconnect_data_agent.shared_libraries.database_tool import save_enriched_communities_to_db
+from mataconnect_data_agent.shared_libraries.facets import parse_bool
+from mataconnect_data_agent.shared_libraries.search_tool import (
+    browse_communities,
+    search_communities,
+)
+
+
+@pytest.fixture
+def communities(database):
+    save_enriched_communities_to_db(
+        [
+            {
+                "name": "Women in Tech Leeds",
+                "website": "https://witleeds.org",
+                "country": "United Kingdom",
+                "pricing_model": "free",
+                "is_virtual": False,
+                "tags": ["Tech", "Mentoring"],
+            },
+            {
+                "name": "Remote Women in Tech",
+                "website": "https://remotewit.org",
+                "country": "United Kingdom",
+                "pricing_model": "paid",
+                "is_virtual": True,
+                "tags": ["tech"],
+            },
+            {
+                "name": "Founders Circle",
+                "website": "https://founderscircle.org",
+                "country": "Ireland",
+                "pricing_model": "free",
+                "is_virtual": True,
+                "tags": ["business"],
+            },
+        ]
+    )
+
+
+def _names(result):
+    return sorted(community["name"] for community in result["communities"])
+
+
+@pytest.mark.parametrize("value", [False, "false", "FALSE", "0", 0])
+def test_false_boolean_filter_matches_in_person_communities(communities, value):
+    assert _names(browse_communities({"is_virtual": value})) == ["Women in Tech Leeds"]
+    assert _names(search_communities("tech", {"is_virtual": value})) == ["Women in Tech Leeds"]
+
+
+@pytest.mark.parametrize("value", [True, "true", "True", "1", 1])
+def test_true_boolean_filter_matches_virtual_communities(communities, value):
+    assert _names(browse_communities({"is_virtual": value})) == [
+        "Founders Circle",
+        "Remote Women in Tech",
+    ]
+    assert _names(search_communities("tech", {"is_virtual": value})) == ["Remote Women in Tech"]
+
+
+def test_invalid_boolean_is_rejected():
+    with pytest.raises(ValueError):
+        parse_bool("maybe")
+
+
+def test_scalar_and_list_filters_combine(communities):
+    result = browse_communities({"country": "united kingdom", "tags": ["TECH", "mentoring"]})
+    assert _names(result) == ["Women in Tech Leeds"]
+    assert result["total"] == 1
+
+
+def test_first_page_counts_requested_facets_only(communities):
+    first = browse_communities({"tags": "tech"}, limit=1, facets=["pricing_model"])
+    assert first["facets"] == {
+        "pricing_model": [{"value": "free", "count": 1}, {"value": "paid", "count": 1}]
+    }
+    second = browse_communities({"tags": "tech"}, limit=1, cursor=first["next_cursor"])
+    assert "facets" not in second
+    assert sorted(_names(first) + _names(second)) == ["Remote Women in Tech", "Women in Tech Leeds"]
@@ -0,0 +1,89 @@
+"""Tests for the website fetcher against a local aiohttp server."""
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from mataconnect_data_agent.shared_libraries.fetcher import WebsiteFetcher
+from mataconnect_data_agent.shared_libraries.urls import ensure_scheme
+
+
+def _app(hits):
+    async def robots(request):
+        return web.Response(text="User-agent: *\nDisallow: /private\n")
+
+    async def page(request):
+        hits["page"] += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(
+            body=b"<p>About us</p>", content_type="text/html", headers={"ETag": '"v1"'}
+        )
+
+    async def private(request):
+        hits["private"] += 1
+        return web.Response(text="secret", content_type="text/html")
+
+    async def big(request):
+        return web.Response(body=b"x" * 10_000, content_type="text/html")
+
+    async def bad_charset(request):
+        return web.Response(
+            body=b"<p>caf\xc3\xa9</p>", headers={"Content-Type": "text/html; charset=foobar"}
+        )
+
+    app = web.Application()
+    app.router.add_get("/robots.txt", robots)
+    app.router.add_get("/page", page)
+    app.router.add_get("/private", private)
+    app.router.add_get("/big", big)
+    app.router.add_get("/bad-charset", bad_charset)
+    return app
+
+
+def _fetch(tmp_path, paths, rounds=1):
+    hits = {"page": 0, "private": 0}
+
+    async def run():
+        async with TestServer(_app(hits)) as server:
+            async with WebsiteFetcher(
+                per_host_delay=0, max_bytes=1000, cache_dir=str(tmp_path), cache_fresh_seconds=0
+            ) as fetcher:
+                urls = [str(server.make_url(path)) for path in paths]
+                return [await fetcher.fetch_many(urls) for _ in range(rounds)]
+
+    return asyncio.run(run()), hits
+
+
+def test_cached_page_is_revalidated_with_304(tmp_path):
+    (first, second), hits = _fetch(tmp_path, ["/page"], rounds=2)
+    assert first[0].status == 200 and not first[0].from_cache
+    assert second[0].from_cache
+    assert second[0].text == "<p>About us</p>"
+    assert hits["page"] == 2
+
+
+def test_robots_disallow_is_honored(tmp_path):
+    (results,), hits = _fetch(tmp_path, ["/private"])
+    assert results[0].error == "Disallowed by robots.txt"
+    assert hits["private"] == 0
+
+
+def test_body_is_capped(tmp_path):
+    (results,), _ = _fetch(tmp_path, ["/big"])
+    assert results[0].truncated
+    assert len(results[0].text) == 1000
+
+
+def test_unknown_charset_falls_back_to_utf8(tmp_path):
+    (results,), _ = _fetch(tmp_path, ["/bad-charset", "/page"])
+    assert results[0].error is None
+    assert results[0].text == "<p>café</p>"
+    assert results[1].status == 200
+
+
+def test_scheme_less_urls_get_https():
+    assert ensure_scheme("example.org/about") == "https://example.org/about"
+    assert ensure_scheme("//example.org") == "https://example.org"
+    assert ensure_scheme("http://example.org") == "http://example.org"
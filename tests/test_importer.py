@@ -0,0 +1,70 @@
+"""Tests for the bulk importer and its checkpointed resume."""
+
+import json
+import os
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from mataconnect_data_agent.shared_libraries import importer
+from mataconnect_data_agent.shared_libraries.database import BasicCommunityDB, session_scope
+from mataconnect_data_agent.shared_libraries.importer import import_communities
+
+
+def _write_csv(tmp_path, rows):
+    path = tmp_path / "partners.csv"
+    lines = ["Organisation,Website"] + [f"{name},{url}" for name, url in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _stored():
+    with session_scope(write=False) as db:
+        return db.scalar(select(func.count()).select_from(BasicCommunityDB))
+
+
+def test_import_counts_new_duplicate_and_invalid_records(database, tmp_path):
+    path = _write_csv(
+        tmp_path,
+        [
+            ("Women in Tech Leeds", "https://witleeds.org"),
+            ("WiT Leeds", "http://www.witleeds.org/about"),
+            ("", "https://nameless.org"),
+            ("Founders Circle", "founderscircle.org"),
+        ],
+    )
+    rejects = str(tmp_path / "rejects.ndjson")
+    stats = import_communities(path, source="partner:test", chunk_size=2, rejects_path=rejects)
+
+    assert {key: stats[key] for key in ("records", "inserted", "duplicates", "invalid")} == {
+        "records": 4,
+        "inserted": 2,
+        "duplicates": 1,
+        "invalid": 1,
+    }
+    assert [json.loads(line)["record"] for line in open(rejects, encoding="utf-8")] == [3]
+    assert not os.path.exists(f"{path}.import-checkpoint.json")
+
+
+def test_failed_import_resumes_after_the_last_committed_chunk(database, tmp_path, monkeypatch):
+    path = _write_csv(tmp_path, [(f"Community {i}", f"https://community{i}.org") for i in range(10)])
+    real_insert = importer.insert_basic_communities
+    imported = []
+
+    def insert_failing_second_chunk(db, chunk, source):
+        if len(imported) == 1:
+            imported.append(None)
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        imported.append([community["name"] for community in chunk])
+        return real_insert(db, chunk, source)
+
+    monkeypatch.setattr(importer, "insert_basic_communities", insert_failing_second_chunk)
+    with pytest.raises(Exception, match="after record 3"):
+        import_communities(path, chunk_size=3)
+    assert _stored() == 3
+
+    stats = import_communities(path, chunk_size=3)
+    assert (stats["records"], stats["inserted"], stats["duplicates"]) == (10, 10, 0)
+    assert imported[2][0] == "Community 3"
+    assert _stored() == 10
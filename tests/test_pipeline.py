@@ -0,0 +1,115 @@
+"""Tests for resuming pipeline runs from their checkpoints."""
+
+import asyncio
+import json
+import re
+
+import pytest
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from sqlalchemy import func, select
+
+from mataconnect_data_agent import pipeline
+from mataconnect_data_agent.pipeline import create_run, run_pipeline
+from mataconnect_data_agent.shared_libraries.database import (
+    ENRICHMENT_DONE,
+    CommunityDB,
+    EnrichmentTaskDB,
+    session_scope,
+)
+from mataconnect_data_agent.sub_agents.community_enricher import community_enricher_agent
+from mataconnect_data_agent.sub_agents.google_scraper import google_scraper_agent
+
+COMMUNITIES = [
+    {"name": f"Community {i}", "url": f"https://community{i}.org"} for i in range(3)
+]
+
+
+def _scripted_agent(agent, calls, answer):
+    """Clone `agent` with a model that answers every request with answer(request text)."""
+
+    class ScriptedLlm(BaseLlm):
+        model: str = f"scripted-{agent.name}"
+
+        async def generate_content_async(self, llm_request, stream: bool = False):
+            calls.append(agent.name)
+            request = "\n".join(part.text for part in llm_request.contents[-1].parts if part.text)
+            yield LlmResponse(
+                content=types.Content(role="model", parts=[types.Part(text=answer(request))])
+            )
+
+    return agent.clone(update={"model": ScriptedLlm(), "tools": []})
+
+
+def _enrich(request):
+    name = re.search(r"Name: (.+)", request).group(1)
+    return json.dumps({"name": name, "description": f"{name} runs mentoring circles"})
+
+
+def _run(run_id, calls):
+    return asyncio.run(
+        run_pipeline(
+            run_id,
+            fetch_pages=False,
+            use_cache=False,
+            write_batch_size=100,
+            scraper_agent=_scripted_agent(
+                google_scraper_agent, calls, lambda request: json.dumps({"communities": COMMUNITIES})
+            ),
+            agent=_scripted_agent(community_enricher_agent, calls, _enrich),
+        )
+    )
+
+
+def _saved_state():
+    with session_scope(write=False) as db:
+        communities = db.scalar(select(func.count()).select_from(CommunityDB))
+        tasks = db.scalars(select(EnrichmentTaskDB.status)).all()
+    return communities, tasks
+
+
+def test_run_collects_enriches_and_saves(database):
+    calls = []
+    stats = _run(create_run(["women in tech"]), calls)
+
+    assert stats["model_calls"] == {"collect": 1, "enrich": 3}
+    assert stats["items"] == {"collect": {"saved": 1}, "enrich": {"saved": 3}}
+    assert _saved_state() == (3, [ENRICHMENT_DONE] * 3)
+
+
+def test_resume_saves_checkpointed_enrichments_without_model_calls(database, monkeypatch):
+    def crash(records):
+        raise RuntimeError("container restarted")
+
+    run_id = create_run(["women in tech"])
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline, "save_enriched_communities_to_db", crash)
+        with pytest.raises(RuntimeError):
+            _run(run_id, [])
+    assert _saved_state()[0] == 0
+
+    calls = []
+    stats = _run(run_id, calls)
+    assert calls == []
+    assert stats["items"]["enrich"] == {"saved": 3}
+    assert _saved_state() == (3, [ENRICHMENT_DONE] * 3)
+
+
+def test_resume_saves_checkpointed_collection_without_searching_again(database, monkeypatch):
+    def crash(run_id, item_key, source):
+        raise RuntimeError("container restarted")
+
+    run_id = create_run(["women in tech"])
+    first = []
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline, "save_collected", crash)
+        with pytest.raises(RuntimeError):
+            _run(run_id, first)
+    assert first == [google_scraper_agent.name]
+
+    calls = []
+    stats = _run(run_id, calls)
+    assert calls == [community_enricher_agent.name] * 3
+    assert stats["model_calls"] == {"collect": 0, "enrich": 3}
+    assert _saved_state() == (3, [ENRICHMENT_DONE] * 3)
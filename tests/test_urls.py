@@ -0,0 +1,65 @@
+"""Tests for URL canonicalization and URL-based deduplication."""
+
+import pytest
+
+from mataconnect_data_agent.shared_libraries.database_tool import save_community_info_to_db
+from mataconnect_data_agent.shared_libraries.urls import canonicalize_url, registered_domain
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://witleeds.org",
+        "http://www.witleeds.org/",
+        "HTTPS://WWW.WitLeeds.org:443/about-us/",
+        "witleeds.org/contact",
+        "https://witleeds.org/?utm_source=google&fbclid=abc#join",
+        "  https://www2.witleeds.org/index.html  ",
+    ],
+)
+def test_variants_of_one_site_share_a_canonical_url(url):
+    assert canonicalize_url(url) == "https://witleeds.org"
+
+
+def test_meaningful_path_query_and_port_are_kept():
+    assert canonicalize_url("https://meetup.com/Women-Who-Code/about") == "https://meetup.com/Women-Who-Code"
+    assert canonicalize_url("https://example.org/events?page=2&city=leeds&utm_medium=x") == (
+        "https://example.org/events?city=leeds&page=2"
+    )
+    assert canonicalize_url("http://example.org:8080/") == "https://example.org:8080"
+
+
+@pytest.mark.parametrize("url", [None, "", "   "])
+def test_empty_url_has_no_canonical_form(url):
+    assert canonicalize_url(url) is None
+
+
+@pytest.mark.parametrize(
+    "url, domain",
+    [
+        ("https://leeds.witleeds.org/events", "witleeds.org"),
+        ("https://www.womenintech.co.uk", "womenintech.co.uk"),
+        ("https://chapter.example.org.uk/about", "example.org.uk"),
+        ("https://192.168.0.1/", "192.168.0.1"),
+        (None, None),
+    ],
+)
+def test_registered_domain(url, domain):
+    assert registered_domain(url) == domain
+
+
+def test_saving_url_variants_keeps_one_community(database):
+    saved = save_community_info_to_db(
+        {
+            "communities": [
+                {"name": "Women in Tech Leeds", "url": "https://witleeds.org"},
+                {"name": "WiT Leeds", "url": "http://www.witleeds.org/about?utm_source=x"},
+                {"name": "Founders Circle", "url": "founderscircle.org"},
+            ]
+        }
+    )
+    assert saved == {"inserted": 2, "duplicates": 1}
+    again = save_community_info_to_db(
+        {"communities": [{"name": "Founders Circle", "url": "https://founderscircle.org/"}]}
+    )
+    assert again == {"inserted": 0, "duplicates": 1}
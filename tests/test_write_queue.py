@@ -0,0 +1,86 @@
+"""Tests for the group-commit writer."""
+
+from contextlib import contextmanager
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from mataconnect_data_agent.shared_libraries import write_queue
+from mataconnect_data_agent.shared_libraries.database import (
+    ENRICHMENT_DONE,
+    EnrichmentTaskDB,
+    session_scope,
+)
+from mataconnect_data_agent.shared_libraries.database_tool import (
+    _save_enriched_community,
+    get_communities_to_enrich,
+    save_community_info_to_db,
+)
+from mataconnect_data_agent.shared_libraries.write_queue import GroupCommitWriter
+
+
+def _failing_first_commit(monkeypatch):
+    """Make the writer's next transaction fail as its commit would."""
+    real_session_scope = write_queue.session_scope
+    calls = []
+
+    @contextmanager
+    def session_scope_once_failing(*args, **kwargs):
+        calls.append(1)
+        with real_session_scope(*args, **kwargs) as db:
+            yield db
+            if len(calls) == 1:
+                raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    monkeypatch.setattr(write_queue, "session_scope", session_scope_once_failing)
+
+
+def test_group_results_are_returned_to_each_caller(database):
+    writer = GroupCommitWriter()
+    try:
+        futures = [writer.submit(lambda db, value: value * 2, value) for value in range(5)]
+        assert [future.result() for future in futures] == [0, 2, 4, 6, 8]
+    finally:
+        writer.close()
+
+
+def test_failing_request_only_fails_itself(database):
+    def fail(db):
+        raise ValueError("bad request")
+
+    writer = GroupCommitWriter()
+    try:
+        bad = writer.submit(fail)
+        good = writer.submit(lambda db: "ok")
+        assert good.result() == "ok"
+        assert isinstance(bad.exception(), ValueError)
+    finally:
+        writer.close()
+
+
+def test_retried_save_completes_its_enrichment_task(database, monkeypatch):
+    save_community_info_to_db(
+        {"communities": [{"name": "Women in Tech Leeds", "url": "https://witleeds.org"}]}
+    )
+    handle = get_communities_to_enrich()["communities"][0]["handle"]
+    enriched = {
+        "basic_community_id": handle,
+        "name": "Women in Tech Leeds",
+        "url": "https://witleeds.org",
+        "source": "test",
+    }
+
+    _failing_first_commit(monkeypatch)
+    writer = GroupCommitWriter()
+    try:
+        saved = writer.submit(_save_enriched_community, enriched).result()
+    finally:
+        writer.close()
+
+    assert writer.stats["retried_groups"] == 1
+    assert saved["status"] == "inserted"
+    assert enriched["basic_community_id"] == handle
+    with session_scope(write=False) as db:
+        task = db.scalars(select(EnrichmentTaskDB)).one()
+        assert task.status == ENRICHMENT_DONE
+        assert task.lease_owner is None